@@ -1,16 +1,28 @@
+import time
+
+# Marca de arranque para medir el tiempo de importación y de puesta en marcha
+_STARTED_AT = time.perf_counter()
+
 import os
 import asyncio
 import logging
+import signal
 from datetime import datetime
 from telethon import TelegramClient, events
 from telethon.errors import SessionPasswordNeededError, FloodWaitError
 
-from src.config import BotConfig, setup_logger
+from src.config import BotConfig, setup_logger, shutdown_logging
 from src.handlers import CommandHandler, InfoHandler 
 from src.handlers import CallbackHandler
 from src.handlers import MediaForwardHandler
 from src.telegram_client import TelegramMessenger
+from src.utils.file_manager import FileManager
+from src.utils.job_tracker import JobTracker
+from src.utils.loop_watchdog import LoopWatchdog
+from src.utils.metrics import start_metrics_server
+from src.utils.tracing import configure_tracing
 
+IMPORT_SECONDS = time.perf_counter() - _STARTED_AT
 
 
 class pequenoBot:
@@ -21,21 +33,46 @@ class pequenoBot:
         # Crear cliente de Telethon usando la configuración
         self.client = TelegramClient('pequeno_bot_session', self.config.api_id, self.config.api_hash)
         
-        # inicializar commend
-        self.command_handler = CommandHandler(self.client, self.config)
+        # Configurar logger y exportación de trazas
+        self.logger = setup_logger('pequeno_bot')
+        configure_tracing(self.config.traces_file)
 
-        # Inicializar handlers
-        self.info_handler = InfoHandler(self.client, self.config)
-        self.media_forward_handler = MediaForwardHandler(self.client, self.config)
+        # Repartir los procesos de ffmpeg entre los carriles de prioridad
+        FileManager.configure_limits(
+            self.config.ffmpeg_concurrency,
+            shares=self.config.lane_shares,
+            bulk_niceness=self.config.bulk_niceness
+        )
 
-        # inicializar callback
-        self.callback_handler = CallbackHandler(self.client, self.config, self.media_forward_handler)
-        
-        # Inicializar cliente de mensajería
+        # Inicializar cliente de mensajería (compartido por todos los handlers)
         self.messenger = TelegramMessenger(self.client, self.config)
         
-        # Configurar logger
-        self.logger = setup_logger('pequeno_bot')
+        # Trabajos en curso de todos los handlers (para el apagado ordenado)
+        self.jobs = JobTracker()
+
+        # Inicializar handlers
+        self.info_handler = InfoHandler(self.client, self.config, messenger=self.messenger)
+        self.media_forward_handler = MediaForwardHandler(
+            self.client, self.config, messenger=self.messenger, jobs=self.jobs
+        )
+
+        # inicializar commend
+        self.command_handler = CommandHandler(
+            self.client, self.config, self.media_forward_handler, messenger=self.messenger
+        )
+
+        # inicializar callback
+        self.callback_handler = CallbackHandler(
+            self.client, self.config, self.media_forward_handler, messenger=self.messenger, jobs=self.jobs
+        )
+
+        # Señal de disponibilidad: se activa cuando el bot ya atiende comandos
+        # (la esperan las pruebas de arranque y los benchmarks)
+        self.ready = asyncio.Event()
+        self.metrics_server = None
+        self.loop_watchdog_task = None
+        self.cache_sweeper_task = None
+        self.shutdown_task = None
         
     async def start(self):
         """Iniciar el bot"""
@@ -50,14 +87,26 @@ class pequenoBot:
                 await self.client.start(bot_token=self.config.bot_token)
                 self.logger.info("Bot iniciado correctamente después de esperar")
             
+            # Precargar entidades de los chats configurados y el usuario del bot
+            await self.messenger.prefetch_entities()
+
             # Obtener información del bot
-            me = await self.client.get_me()
+            me = await self.messenger.get_me()
             self.logger.info(f"Bot conectado como: @{me.username}")
             self.logger.info(f"ID del bot: {me.id}")
 
             # Configuración de grupos objetivo
             self.logger.info(self.config.get_group_info())
             
+            # Apagado ordenado al recibir SIGTERM (docker stop) o SIGINT
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(sig, self.request_shutdown, sig)
+                except NotImplementedError:
+                    # Windows no admite manejadores de señales en el bucle
+                    pass
+
             # Registrar handlers de eventos
             self.media_forward_handler.register_handlers()
             self.command_handler.register_commands()
@@ -65,6 +114,48 @@ class pequenoBot:
             self.callback_handler.register_handlers()  # Ensure callback handler is registered
             self.logger.info("✅ Todos los handlers registrados correctamente")
 
+            # Reanudar los trabajos pendientes o interrumpidos por el último apagado
+            await self.media_forward_handler.job_scheduler.start()
+
+            # Publicar las métricas en un puerto HTTP local
+            if self.config.metrics_port:
+                try:
+                    self.metrics_server = await start_metrics_server(
+                        self.config.metrics_host, self.config.metrics_port
+                    )
+                except OSError as e:
+                    self.logger.error(f"No se pudo abrir el puerto de métricas {self.config.metrics_port}: {e}")
+
+            # Proxy local para que ffmpeg lea los videos de Telegram por rangos
+            if self.media_forward_handler.media_proxy:
+                try:
+                    await self.media_forward_handler.media_proxy.start()
+                except OSError as e:
+                    self.logger.error(f"No se pudo abrir el proxy de medios: {e}")
+
+            # Vigilar el retraso del bucle de eventos y los handlers que lo bloquean
+            if self.config.loop_lag_threshold_ms:
+                self.loop_watchdog = LoopWatchdog(
+                    threshold=self.config.loop_lag_threshold_ms / 1000,
+                    notify=self.messenger.send_notification_to_me if self.config.loop_lag_notify else None
+                )
+                self.loop_watchdog_task = asyncio.create_task(self.loop_watchdog.run())
+
+            # Barrido periódico de la caché de medios descargados
+            self.cache_sweeper_task = asyncio.create_task(
+                self.media_forward_handler.media_cache.run_sweeper(self.config.media_cache_sweep_interval)
+            )
+
+            self.ready.set()
+            self.logger.info(
+                f"✅ Bot listo en {time.perf_counter() - _STARTED_AT:.2f}s "
+                f"(importaciones: {IMPORT_SECONDS:.2f}s)"
+            )
+
+            # Cargar el modelo de análisis de imágenes en segundo plano
+            if self.media_forward_handler.inference_service:
+                self.media_forward_handler.inference_service.warm_up()
+
             # Mantener el bot corriendo
             self.logger.info("🚀 pequeno Bot en funcionamiento...")
             await self.client.run_until_disconnected()
@@ -72,6 +163,60 @@ class pequenoBot:
         except Exception as e:
             self.logger.error(f"Error al iniciar pequeno Bot: {e}")
             raise
+
+        # Si la desconexión vino de una señal, esperar a que termine el apagado
+        if self.shutdown_task:
+            await self.shutdown_task
+
+    def request_shutdown(self, sig=None):
+        """Iniciar el apagado ordenado (una sola vez)"""
+        if self.shutdown_task:
+            return
+        name = signal.Signals(sig).name if sig else 'solicitud'
+        self.logger.info(f"🛑 Señal {name} recibida: iniciando apagado ordenado")
+        self.shutdown_task = asyncio.create_task(self.shutdown())
+
+    async def shutdown(self):
+        """
+        Apagar el bot sin abandonar el trabajo en curso
+
+        1. Deja de aceptar medios y pulsaciones nuevas.
+        2. Entrega los álbumes en espera y espera a los trabajos en curso hasta
+           SHUTDOWN_TIMEOUT; los que no terminan se cancelan, sus descargas
+           quedan en archivos .part y la cola de trabajos los reanuda desde
+           su última etapa tras el reinicio.
+        3. Termina los procesos de ffmpeg que sigan vivos.
+        4. Detiene los servicios de fondo, se desconecta de Telegram y vacía
+           la cola de logs.
+        """
+        started = time.perf_counter()
+        self.jobs.stop_accepting()
+        self.media_forward_handler.job_scheduler.stop()
+        self.media_forward_handler.album_collector.flush_all()
+        # Dejar arrancar las tareas de los álbumes recién entregados
+        await asyncio.sleep(0)
+
+        cancelled = await self.jobs.drain(self.config.shutdown_timeout)
+        await FileManager.terminate_processes()
+
+        for task in (self.cache_sweeper_task, self.loop_watchdog_task):
+            if task:
+                task.cancel()
+        if self.media_forward_handler.inference_service:
+            await self.media_forward_handler.inference_service.stop()
+        if self.metrics_server:
+            self.metrics_server.close()
+        if self.media_forward_handler.media_proxy:
+            self.media_forward_handler.media_proxy.close()
+        if self.messenger.chunk_cache:
+            self.messenger.chunk_cache.close()
+
+        self.logger.info(
+            f"✅ Apagado completado en {time.perf_counter() - started:.1f}s "
+            f"({cancelled} trabajos cancelados)"
+        )
+        await self.client.disconnect()
+        shutdown_logging()
     
 async def main():
     bot = pequenoBot()
@@ -3,6 +3,6 @@ Módulo de configuración del bot
 """
 
 from .bot_config import BotConfig
-from .logger import setup_logger, get_logger
+from .logger import setup_logger, get_logger, configure_logging, shutdown_logging
 
-__all__ = ['BotConfig', 'setup_logger', 'get_logger']
\ No newline at end of file
+__all__ = ['BotConfig', 'setup_logger', 'get_logger', 'configure_logging', 'shutdown_logging']
\ No newline at end of file
@@ -27,6 +27,8 @@ class BotConfig:
         self.chat_me = self._get_optional_env('CHAT_ME', int)
         self.chat_target = self._get_optional_env('CHAT_TARGET', int)
         self.max_file_size_mb = self._get_optional_env('MAX_FILE_SIZE_MB', int, 20)
+        # Ventana (ms) para agrupar los mensajes de un álbum antes de procesarlo
+        self.album_group_window_ms = self._get_optional_env('ALBUM_GROUP_WINDOW_MS', int, 1500)
         
         # Configuración de base de datos
         self.database_url = os.getenv('DATABASE_URL', 'sqlite:///data/bot_data.db')
@@ -36,8 +38,80 @@ class BotConfig:
         self.data_dir = os.getenv('DATA_DIR', 'data')
         self.logs_dir = os.getenv('LOGS_DIR', 'logs')
         self.downloads_dir = os.getenv('DOWNLOADS_DIR', 'downloads')
+        # Control de admisión de descargas por espacio en disco
+        self.downloads_budget_mb = self._get_optional_env('DOWNLOADS_BUDGET_MB', int, 0)
+        self.downloads_min_free_mb = self._get_optional_env('DOWNLOADS_MIN_FREE_MB', int, 512)
+        self.download_admission_timeout = self._get_optional_env('DOWNLOAD_ADMISSION_TIMEOUT', int, 600)
+        self.downloads_evict_min_age_hours = self._get_optional_env('DOWNLOADS_EVICT_MIN_AGE_HOURS', int, 24)
+        # Política de retención de la caché de medios descargados
+        self.media_cache_max_mb = self._get_optional_env('MEDIA_CACHE_MAX_MB', int, 10240)
+        self.media_cache_max_age_hours = self._get_optional_env('MEDIA_CACHE_MAX_AGE_HOURS', int, 168)
+        self.media_cache_sweep_interval = self._get_optional_env('MEDIA_CACHE_SWEEP_INTERVAL', int, 600)
+        # Horas sin continuarse tras las que se borra una descarga incompleta (.part)
+        self.partial_downloads_max_age_hours = self._get_optional_env('PARTIAL_DOWNLOADS_MAX_AGE_HOURS', int, 48)
         # Activar/desactivar tratamiento de imágenes
         self.image_processing_enabled = os.getenv('IMAGE_PROCESSING_ENABLED', 'true').lower() == 'true'
+        # Detección de casi-duplicados por hash perceptual
+        self.duplicate_detection_enabled = os.getenv('DUPLICATE_DETECTION_ENABLED', 'true').lower() == 'true'
+        self.duplicate_max_distance = self._get_optional_env('DUPLICATE_MAX_DISTANCE', int, 6)
+        # Acción ante un duplicado: 'flag' (avisar) o 'discard' (descartar)
+        self.duplicate_action = os.getenv('DUPLICATE_ACTION', 'flag').lower()
+        # Vista previa de videos largos (hoja de contactos antes de descargar)
+        self.long_video_preview_enabled = os.getenv('LONG_VIDEO_PREVIEW_ENABLED', 'true').lower() == 'true'
+        self.preview_head_mb = self._get_optional_env('PREVIEW_HEAD_MB', int, 8)
+        self.preview_frames = self._get_optional_env('PREVIEW_FRAMES', int, 6)
+        self.long_video_auto_download = os.getenv('LONG_VIDEO_AUTO_DOWNLOAD', 'false').lower() == 'true'
+        # Crear los clips automáticos descargando solo sus rangos (sin buscar duplicados)
+        self.streaming_clips_enabled = os.getenv('STREAMING_CLIPS_ENABLED', 'false').lower() == 'true'
+        # Proxy HTTP local (127.0.0.1) para que ffmpeg lea los videos de Telegram por rangos
+        self.media_proxy_enabled = os.getenv('MEDIA_PROXY_ENABLED', 'false').lower() == 'true'
+        self.media_proxy_port = self._get_optional_env('MEDIA_PROXY_PORT', int, 0)
+        # Caché en disco de bloques de documentos de Telegram (0 = desactivada)
+        self.chunk_cache_mb = self._get_optional_env('CHUNK_CACHE_MB', int, 256)
+        
+        # Análisis de imágenes con un modelo local de Hugging Face
+        self.image_analysis_enabled = os.getenv('IMAGE_ANALYSIS_ENABLED', 'false').lower() == 'true'
+        self.hf_model = os.getenv('HF_MODEL', 'facebook/detr-resnet-50')
+        self.hf_task = os.getenv('HF_TASK', 'object-detection')
+        self.hf_token = self._get_optional_env('HF_TOKEN')
+        self.inference_batch_size = self._get_optional_env('INFERENCE_BATCH_SIZE', int, 8)
+        self.inference_batch_wait_ms = self._get_optional_env('INFERENCE_BATCH_WAIT_MS', int, 50)
+        self.inference_workers = self._get_optional_env('INFERENCE_WORKERS', int, 1)
+        self.inference_min_score = self._get_optional_env('INFERENCE_MIN_SCORE', float, 0.5)
+        self.detections_dir = os.getenv('DETECTIONS_DIR', 'detections')
+        # Métricas en formato Prometheus (puerto 0 = desactivado)
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self.metrics_port = self._get_optional_env('METRICS_PORT', int, 9464)
+        
+        # Vigilancia del bucle de eventos (umbral 0 = desactivada)
+        self.loop_lag_threshold_ms = self._get_optional_env('LOOP_LAG_THRESHOLD_MS', int, 500)
+        self.loop_lag_notify = os.getenv('LOOP_LAG_NOTIFY', 'false').lower() == 'true'
+        
+        # Segundos máximos de espera a los trabajos en curso al apagar el bot
+        self.shutdown_timeout = self._get_optional_env('SHUTDOWN_TIMEOUT', float, 25.0)
+        
+        # Cola persistente de trabajos pesados (descargar y crear clips)
+        self.jobs_concurrency = self._get_optional_env('JOBS_CONCURRENCY', int, 2)
+        self.job_max_attempts = self._get_optional_env('JOB_MAX_ATTEMPTS', int, 5)
+        self.job_retry_base_seconds = self._get_optional_env('JOB_RETRY_BASE_SECONDS', float, 30.0)
+        
+        # Carriles de prioridad: huecos de API y de ffmpeg y parte de ellos que
+        # puede ocupar cada carril (interactivo > normal > masivo)
+        self.api_concurrency = self._get_optional_env('API_CONCURRENCY', int, 4)
+        self.ffmpeg_concurrency = self._get_optional_env('FFMPEG_CONCURRENCY', int, 2)
+        self.lane_shares = {
+            'interactive': self._get_optional_env('LANE_SHARE_INTERACTIVE', float, 1.0),
+            'normal': self._get_optional_env('LANE_SHARE_NORMAL', float, 0.75),
+            'bulk': self._get_optional_env('LANE_SHARE_BULK', float, 0.5)
+        }
+        self.bulk_niceness = self._get_optional_env('BULK_NICENESS', int, 10)
+        
+        # Directorio de los perfiles de /profile
+        self.profile_dir = os.getenv('PROFILE_DIR', 'logs')
+        
+        # Trazas por trabajo exportadas como JSON lines (vacío = sin exportar)
+        self.traces_file = os.getenv('TRACES_FILE', 'logs/traces.jsonl')
+        
         # Configuración de logging
         self.log_level = os.getenv('LOG_LEVEL', 'INFO')
         self.log_file = os.getenv('LOG_FILE', 'logs/bot.log')
@@ -1,78 +1,242 @@
 """
 Sistema de logging para el bot
+
+La configuración se hace una sola vez en el logger raíz: todos los loggers
+con nombre propagan hacia él y encolan los registros en un ``QueueHandler``.
+Un único ``QueueListener`` en segundo plano los escribe en un archivo
+rotativo (un solo descriptor abierto) y en la consola, así la E/S del
+logging nunca se hace en el hilo del bucle de eventos.
+
+Variables de entorno:
+    LOG_LEVEL: Nivel global (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+    LOG_LEVELS: Niveles por módulo, p. ej. ``telethon=WARNING,database_manager=DEBUG``
+    LOG_FORMAT: ``text`` (por defecto) o ``json`` (una línea JSON por registro)
+    LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT: Archivo y rotación por tamaño
+
+Los procesos hijos (el pool de inferencia) envían sus registros por una cola
+de ``multiprocessing`` (``worker_log_queue``) que escribe el proceso
+principal con los mismos handlers; en el hijo se instala con
+``configure_worker_logging``.
 """
 
+import atexit
+import json
 import logging
 import os
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Any, Dict, Optional
 
-def setup_logger(name: str = "pequenoBot", level: str = None) -> logging.Logger:
+# Formato del log con información adicional
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d - %(funcName)s] - %(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Niveles por módulo si no se define LOG_LEVELS
+DEFAULT_LOG_LEVELS = 'telethon=WARNING'
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_module_levels: Dict[str, str] = {}
+# Cola y escritor de los registros de los procesos hijos (se crean bajo demanda)
+_worker_queue: Optional[Any] = None
+_worker_listener: Optional[QueueListener] = None
+
+
+class _LocalQueueHandler(QueueHandler):
     """
-    Configurar el sistema de logging
-    
+    QueueHandler para un listener del mismo proceso
+
+    No formatea el registro al encolarlo: el mensaje (``msg % args``) se
+    construye en el hilo del listener, fuera del bucle de eventos.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatear cada registro como una línea JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'line': record.lineno,
+            'function': record.funcName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _parse_module_levels(value: str) -> Dict[str, str]:
+    """Interpretar ``modulo=NIVEL,otro=NIVEL`` ignorando entradas no válidas"""
+    levels = {}
+    for item in value.split(','):
+        name, _, level = item.partition('=')
+        name, level = name.strip(), level.strip().upper()
+        if name and isinstance(logging.getLevelName(level), int):
+            levels[name] = level
+    return levels
+
+
+def configure_logging(level: str = None) -> QueueHandler:
+    """
+    Configurar (una sola vez) el logger raíz con la cola y el escritor en segundo plano
+
     Args:
-        name: Nombre del logger
-        level: Nivel de logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-               Si es None, se usa la variable de entorno LOG_LEVEL
-    
+        level: Nivel global; si es None se usa la variable de entorno LOG_LEVEL
+
     Returns:
-        Logger configurado
+        El QueueHandler compartido
     """
-    
-    # Usar variable de entorno si no se especifica nivel
+    global _queue_handler, _listener, _module_levels
+    if _queue_handler is not None:
+        return _queue_handler
+
     if level is None:
-        level = os.getenv('LOG_LEVEL', 'INFO').upper()
-    
-    # Crear directorio de logs si no existe
-    logs_dir = os.getenv('LOGS_DIR', 'logs')
-    log_dir = Path(logs_dir)
-    log_dir.mkdir(exist_ok=True)
-    
-    # Configurar el logger
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, level.upper()))
-    
-    # Evitar duplicar handlers si ya están configurados
-    if logger.handlers:
-        return logger
-    
-    # Formato del log con información adicional
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d - %(funcName)s] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # Handler para archivo - usar variable de entorno LOG_FILE
-    log_file_path = 'logs/bot.log'
-    log_file = Path(log_file_path)
-    
-    # Crear directorio del archivo de log si no existe
+        level = os.getenv('LOG_LEVEL', 'INFO')
+
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+
+    # Handler para archivo con rotación por tamaño - usar variable de entorno LOG_FILE
+    log_file = Path(os.getenv('LOG_FILE', 'logs/bot.log'))
     log_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024)),
+        backupCount=int(os.getenv('LOG_BACKUP_COUNT', 5)),
+        encoding='utf-8'
+    )
     file_handler.setFormatter(formatter)
-    
+
     # Handler para consola
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(getattr(logging, level.upper()))
     console_handler.setFormatter(formatter)
-    
-    # Agregar handlers al logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = _LocalQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, level.upper()))
+    root.addHandler(_queue_handler)
+
+    # Niveles por módulo (también para librerías como telethon)
+    _module_levels = _parse_module_levels(os.getenv('LOG_LEVELS') or DEFAULT_LOG_LEVELS)
+    for name, module_level in _module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    return _queue_handler
+
+
+def shutdown_logging() -> None:
+    """
+    Vaciar la cola de logs y detener el escritor en segundo plano
+
+    Los handlers pasan a colgar directamente del logger raíz, así los
+    registros posteriores (al salir del intérprete) se escriben en el acto en
+    lugar de quedarse en una cola que ya nadie lee.
+    """
+    global _listener, _worker_listener
+    if _worker_listener is not None:
+        _worker_listener.stop()
+        _worker_listener = None
+    if _listener is not None:
+        _listener.stop()
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            root.addHandler(handler)
+        _listener = None
+
+
+def worker_log_queue(context) -> Any:
+    """
+    Cola para los registros de los procesos hijos
+
+    Args:
+        context: Contexto de ``multiprocessing`` con el que se crean los procesos
+
+    Returns:
+        Cola que hay que pasar a ``configure_worker_logging`` en cada hijo
+    """
+    global _worker_queue, _worker_listener
+    configure_logging()
+    if _worker_queue is None and _listener is not None:
+        _worker_queue = context.Queue()
+        _worker_listener = QueueListener(_worker_queue, *_listener.handlers, respect_handler_level=True)
+        _worker_listener.start()
+    return _worker_queue
+
+
+def configure_worker_logging(log_queue: Any, level: int, module_levels: Dict[str, str]) -> None:
+    """
+    Configurar el logging en un proceso hijo para que escriba por la cola del principal
+
+    Args:
+        log_queue: Cola devuelta por ``worker_log_queue`` (None = sin logging)
+        level: Nivel del logger raíz del proceso principal
+        module_levels: Niveles por módulo del proceso principal
+    """
+    global _queue_handler, _module_levels
+    if log_queue is None:
+        return
+    root = logging.getLogger()
+    root.handlers = []
+    _queue_handler = QueueHandler(log_queue)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    _module_levels = dict(module_levels)
+    for name, module_level in _module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def worker_logging_args(context) -> tuple:
+    """Argumentos de ``configure_worker_logging`` para los procesos creados con ``context``"""
+    return worker_log_queue(context), logging.getLogger().level, dict(_module_levels)
+
+
+def setup_logger(name: str = "pequenoBot", level: str = None) -> logging.Logger:
+    """
+    Configurar el sistema de logging
+
+    Args:
+        name: Nombre del logger
+        level: Nivel de logging (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+               Si es None, se usa el de LOG_LEVELS o el nivel global
+
+    Returns:
+        Logger configurado
+    """
+    configure_logging()
+
+    # El logger no tiene handlers propios: propaga al raíz
+    logger = logging.getLogger(name)
+    if level is not None:
+        logger.setLevel(getattr(logging, level.upper()))
+    elif name in _module_levels:
+        logger.setLevel(_module_levels[name])
+
     return logger
 
 def get_logger(name: str = "pequenoBot") -> logging.Logger:
     """
     Obtener una instancia del logger
-    
+
     Args:
         name: Nombre del logger
-    
+
     Returns:
         Logger existente o nuevo
     """
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
@@ -2,7 +2,7 @@
 Módulo de gestión de base de datos para el bot de Telegram
 """
 
-from .models import Message, User, Chat
+from .models import Message, User, Chat, MediaFile, MediaHash, Detection, Job
 from .manager import DatabaseManager
 
-__all__ = ['Message', 'User', 'Chat', 'DatabaseManager']
\ No newline at end of file
+__all__ = ['Message', 'User', 'Chat', 'MediaFile', 'MediaHash', 'Detection', 'Job', 'DatabaseManager']
\ No newline at end of file
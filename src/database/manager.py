@@ -9,8 +9,9 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from contextlib import contextmanager
 
-from .models import Message, User, Chat
+from .models import Message, User, Chat, MediaFile, MediaHash, Detection, Job
 from ..config import setup_logger
+from ..utils.metrics import DB_QUERY_SECONDS, db_outcome, timed
 
 
 class DatabaseManager:
@@ -103,16 +104,75 @@ class DatabaseManager:
                 )
             """)
             
+            # Tabla de archivos descargados (caché de medios)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS media_files (
+                    file_path TEXT PRIMARY KEY,
+                    size INTEGER DEFAULT 0,
+                    pinned BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_access TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Tabla de hashes perceptuales (detección de duplicados)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS media_hashes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hash_value TEXT NOT NULL,
+                    kind TEXT DEFAULT 'image',
+                    chat_id INTEGER,
+                    message_id INTEGER,
+                    file_path TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Tabla de detecciones del análisis de imágenes
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS detections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_path TEXT NOT NULL,
+                    label TEXT,
+                    score REAL,
+                    box TEXT,
+                    model TEXT,
+                    chat_id INTEGER,
+                    message_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Tabla de trabajos persistentes (sobreviven a los reinicios)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT,
+                    state TEXT DEFAULT 'pending',
+                    stage TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    next_run_at TIMESTAMP,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
             # Índices para mejorar rendimiento
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_id ON messages (chat_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages (user_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages (created_at)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_message_type ON messages (message_type)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_files_last_access ON media_files (last_access)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_label ON detections (label)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)")
             
             conn.commit()
             self.logger.info("Tablas de base de datos creadas correctamente")
     
     # MÉTODOS PARA USUARIOS
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def save_user(self, user: User) -> bool:
         """
         Guardar o actualizar un usuario
@@ -163,6 +223,7 @@ class DatabaseManager:
             self.logger.error(f"Error guardando usuario {user.user_id}: {e}")
             return False
     
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def get_user(self, user_id: int) -> Optional[User]:
         """Obtener un usuario por ID"""
         try:
@@ -180,6 +241,7 @@ class DatabaseManager:
             return None
     
     # MÉTODOS PARA CHATS
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def save_chat(self, chat: Chat) -> bool:
         """
         Guardar o actualizar un chat
@@ -230,6 +292,7 @@ class DatabaseManager:
             self.logger.error(f"Error guardando chat {chat.chat_id}: {e}")
             return False
     
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def get_chat(self, chat_id: int) -> Optional[Chat]:
         """Obtener un chat por ID"""
         try:
@@ -247,6 +310,7 @@ class DatabaseManager:
             return None
     
     # MÉTODOS PARA MENSAJES
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def save_message(self, message: Message) -> bool:
         """
         Guardar un mensaje
@@ -280,9 +344,10 @@ class DatabaseManager:
                 return True
                 
         except Exception as e:
-            self.logger.error(f"Error guardando mensaje {message.message_id}: {e}")
+            self.logger.error("Error guardando mensaje %s: %s", message.message_id, e)
             return False
     
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def get_messages_by_chat(self, chat_id: int, limit: int = 100, offset: int = 0) -> List[Message]:
         """Obtener mensajes de un chat específico"""
         try:
@@ -302,6 +367,7 @@ class DatabaseManager:
             self.logger.error(f"Error obteniendo mensajes del chat {chat_id}: {e}")
             return []
     
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def get_message(self, message_id: int, chat_id: int) -> Optional[Message]:
         """
         Obtener un mensaje específico por ID y chat
@@ -327,6 +393,303 @@ class DatabaseManager:
             self.logger.error(f"Error obteniendo mensaje {message_id} en chat {chat_id}: {e}")
             return None
     
+    # MÉTODOS PARA ARCHIVOS DESCARGADOS
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def save_media_file(self, media_file: MediaFile) -> bool:
+        """
+        Guardar o actualizar un archivo descargado
+        
+        Args:
+            media_file: Instancia de MediaFile
+            
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                now = datetime.now()
+                cursor.execute("""
+                    INSERT INTO media_files (file_path, size, pinned, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(file_path) DO UPDATE SET
+                        size = excluded.size,
+                        pinned = excluded.pinned,
+                        last_access = excluded.last_access
+                """, (
+                    media_file.file_path, media_file.size, media_file.pinned,
+                    media_file.created_at or now, media_file.last_access or now
+                ))
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error guardando archivo {media_file.file_path}: {e}")
+            return False
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def touch_media_file(self, file_path: str) -> bool:
+        """Actualizar la fecha de último acceso de un archivo descargado"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE media_files SET last_access = ? WHERE file_path = ?",
+                    (datetime.now(), file_path)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+                
+        except Exception as e:
+            self.logger.error(f"Error actualizando acceso de {file_path}: {e}")
+            return False
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def set_media_file_pinned(self, file_path: str, pinned: bool) -> bool:
+        """Fijar o liberar un archivo descargado frente a la eviction"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE media_files SET pinned = ? WHERE file_path = ?",
+                    (pinned, file_path)
+                )
+                conn.commit()
+                return cursor.rowcount > 0
+                
+        except Exception as e:
+            self.logger.error(f"Error cambiando fijación de {file_path}: {e}")
+            return False
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def get_media_files(self) -> List[MediaFile]:
+        """Obtener los archivos descargados, del menos al más recientemente usado"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM media_files ORDER BY last_access ASC")
+                return [MediaFile.from_dict(dict(row)) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Error obteniendo archivos descargados: {e}")
+            return []
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def delete_media_file(self, file_path: str) -> bool:
+        """Eliminar el registro de un archivo descargado"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM media_files WHERE file_path = ?", (file_path,))
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error eliminando registro de {file_path}: {e}")
+            return False
+    
+    # MÉTODOS PARA HASHES PERCEPTUALES
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def save_media_hash(self, media_hash: MediaHash) -> bool:
+        """
+        Guardar el hash perceptual de una imagen o fotograma
+        
+        Args:
+            media_hash: Instancia de MediaHash
+            
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO media_hashes (hash_value, kind, chat_id, message_id, file_path, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    media_hash.hash_value, media_hash.kind, media_hash.chat_id,
+                    media_hash.message_id, media_hash.file_path,
+                    media_hash.created_at or datetime.now()
+                ))
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error guardando hash {media_hash.hash_value}: {e}")
+            return False
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def get_media_hashes(self) -> List[MediaHash]:
+        """Obtener todos los hashes perceptuales guardados"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT hash_value, kind, chat_id, message_id, file_path, created_at FROM media_hashes"
+                )
+                return [MediaHash.from_dict(dict(row)) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Error obteniendo hashes perceptuales: {e}")
+            return []
+    
+    # MÉTODOS PARA DETECCIONES
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def save_detections(self, detections: List[Detection]) -> bool:
+        """
+        Guardar las detecciones de una imagen
+        
+        Args:
+            detections: Lista de instancias de Detection
+            
+        Returns:
+            True si se guardaron correctamente
+        """
+        if not detections:
+            return True
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                now = datetime.now()
+                cursor.executemany("""
+                    INSERT INTO detections (
+                        file_path, label, score, box, model, chat_id, message_id, created_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (
+                        d.file_path, d.label, d.score,
+                        json.dumps(d.box) if d.box else None,
+                        d.model, d.chat_id, d.message_id, d.created_at or now
+                    )
+                    for d in detections
+                ])
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error guardando detecciones: {e}")
+            return False
+    
+    # MÉTODOS PARA TRABAJOS
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def create_job(self, job: Job) -> Optional[int]:
+        """
+        Crear un trabajo persistente
+        
+        Args:
+            job: Instancia de Job (sin id)
+            
+        Returns:
+            ID del trabajo creado o None si falló
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                now = datetime.now()
+                cursor.execute("""
+                    INSERT INTO jobs (
+                        kind, payload, state, stage, attempts, last_error,
+                        next_run_at, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    job.kind, json.dumps(job.payload) if job.payload else None,
+                    job.state, job.stage, job.attempts, job.last_error,
+                    job.next_run_at, job.created_at or now, now
+                ))
+                conn.commit()
+                job.id = cursor.lastrowid
+                job.created_at = job.created_at or now
+                job.updated_at = now
+                return job.id
+                
+        except Exception as e:
+            self.logger.error(f"Error creando trabajo {job.kind}: {e}")
+            return None
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def update_job(self, job: Job) -> bool:
+        """
+        Guardar el estado, la etapa y el payload de un trabajo
+        
+        Args:
+            job: Instancia de Job con id
+            
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                job.updated_at = datetime.now()
+                cursor.execute("""
+                    UPDATE jobs SET payload = ?, state = ?, stage = ?, attempts = ?,
+                        last_error = ?, next_run_at = ?, updated_at = ?
+                    WHERE id = ?
+                """, (
+                    json.dumps(job.payload) if job.payload else None,
+                    job.state, job.stage, job.attempts, job.last_error,
+                    job.next_run_at, job.updated_at, job.id
+                ))
+                conn.commit()
+                return True
+                
+        except Exception as e:
+            self.logger.error(f"Error actualizando trabajo {job.id}: {e}")
+            return False
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def get_job(self, job_id: int) -> Optional[Job]:
+        """Obtener un trabajo por ID"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+                row = cursor.fetchone()
+                return Job.from_dict(dict(row)) if row else None
+                
+        except Exception as e:
+            self.logger.error(f"Error obteniendo trabajo {job_id}: {e}")
+            return None
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def get_pending_jobs(self) -> List[Job]:
+        """Obtener los trabajos pendientes en orden de creación"""
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT * FROM jobs WHERE state = 'pending' ORDER BY id")
+                return [Job.from_dict(dict(row)) for row in cursor.fetchall()]
+                
+        except Exception as e:
+            self.logger.error(f"Error obteniendo trabajos pendientes: {e}")
+            return []
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
+    def requeue_running_jobs(self) -> int:
+        """
+        Volver a poner en cola los trabajos que quedaron a medias
+        
+        Al arrancar, un trabajo en estado 'running' es uno que se interrumpió
+        (apagado o caída del proceso): se reanuda desde su última etapa.
+        
+        Returns:
+            Número de trabajos recuperados
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "UPDATE jobs SET state = 'pending', updated_at = ? WHERE state = 'running'",
+                    (datetime.now(),)
+                )
+                conn.commit()
+                return cursor.rowcount
+                
+        except Exception as e:
+            self.logger.error(f"Error recuperando trabajos interrumpidos: {e}")
+            return 0
+    
+    @timed(DB_QUERY_SECONDS, label='operation', outcome=db_outcome)
     def get_message_stats(self) -> Dict[str, Any]:
         """Obtener estadísticas de mensajes"""
         try:
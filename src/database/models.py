@@ -2,7 +2,7 @@
 Modelos de datos para la base de datos del bot
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Any
 from datetime import datetime
 import json
@@ -195,4 +195,168 @@ class Message:
             edit_date=message.edit_date,
             created_at=message.date,
             raw_data=raw_data
-        )
\ No newline at end of file
+        )
+
+
+@dataclass
+class MediaFile:
+    """Modelo para representar un archivo descargado gestionado por la caché"""
+    file_path: str
+    size: int = 0
+    pinned: bool = False  # Referenciado por un mensaje con botones activo
+    created_at: Optional[datetime] = None
+    last_access: Optional[datetime] = None
+    
+    def to_dict(self) -> dict:
+        """Convertir a diccionario para almacenamiento"""
+        return {
+            'file_path': self.file_path,
+            'size': self.size,
+            'pinned': self.pinned,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_access': self.last_access.isoformat() if self.last_access else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MediaFile':
+        """Crear instancia desde diccionario"""
+        created_at = datetime.fromisoformat(data['created_at']) if data.get('created_at') else None
+        last_access = datetime.fromisoformat(data['last_access']) if data.get('last_access') else None
+        
+        return cls(
+            file_path=data['file_path'],
+            size=data.get('size') or 0,
+            pinned=bool(data.get('pinned', False)),
+            created_at=created_at,
+            last_access=last_access
+        )
+
+
+@dataclass
+class MediaHash:
+    """Modelo para representar el hash perceptual de una imagen o fotograma"""
+    hash_value: str  # Hash de 64 bits en hexadecimal
+    kind: str = 'image'  # 'image' o 'video'
+    chat_id: Optional[int] = None
+    message_id: Optional[int] = None
+    file_path: Optional[str] = None
+    created_at: Optional[datetime] = None
+    
+    def to_dict(self) -> dict:
+        """Convertir a diccionario para almacenamiento"""
+        return {
+            'hash_value': self.hash_value,
+            'kind': self.kind,
+            'chat_id': self.chat_id,
+            'message_id': self.message_id,
+            'file_path': self.file_path,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'MediaHash':
+        """Crear instancia desde diccionario"""
+        created_at = datetime.fromisoformat(data['created_at']) if data.get('created_at') else None
+        
+        return cls(
+            hash_value=data['hash_value'],
+            kind=data.get('kind', 'image'),
+            chat_id=data.get('chat_id'),
+            message_id=data.get('message_id'),
+            file_path=data.get('file_path'),
+            created_at=created_at
+        )
+
+
+@dataclass
+class Detection:
+    """Modelo para representar una detección del modelo de análisis de imágenes"""
+    file_path: str
+    label: str
+    score: float
+    box: Optional[dict] = None  # {'xmin', 'ymin', 'xmax', 'ymax'} si el modelo lo da
+    model: Optional[str] = None
+    chat_id: Optional[int] = None
+    message_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    
+    def to_dict(self) -> dict:
+        """Convertir a diccionario para almacenamiento"""
+        return {
+            'file_path': self.file_path,
+            'label': self.label,
+            'score': self.score,
+            'box': json.dumps(self.box) if self.box else None,
+            'model': self.model,
+            'chat_id': self.chat_id,
+            'message_id': self.message_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Detection':
+        """Crear instancia desde diccionario"""
+        created_at = datetime.fromisoformat(data['created_at']) if data.get('created_at') else None
+        box = json.loads(data['box']) if data.get('box') else None
+        
+        return cls(
+            file_path=data['file_path'],
+            label=data['label'],
+            score=data.get('score', 0.0),
+            box=box,
+            model=data.get('model'),
+            chat_id=data.get('chat_id'),
+            message_id=data.get('message_id'),
+            created_at=created_at
+        )
+
+
+@dataclass
+class Job:
+    """Modelo para representar un trabajo persistente (descarga, clips...)"""
+    kind: str
+    payload: dict = field(default_factory=dict)
+    state: str = 'pending'  # 'pending', 'running', 'done', 'failed', 'cancelled'
+    stage: Optional[str] = None  # Última etapa completada
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_run_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    id: Optional[int] = None
+    
+    def to_dict(self) -> dict:
+        """Convertir a diccionario para almacenamiento"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': json.dumps(self.payload) if self.payload else None,
+            'state': self.state,
+            'stage': self.stage,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Job':
+        """Crear instancia desde diccionario"""
+        def parse_date(value):
+            if not value:
+                return None
+            return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+        
+        return cls(
+            id=data.get('id'),
+            kind=data['kind'],
+            payload=json.loads(data['payload']) if data.get('payload') else {},
+            state=data.get('state', 'pending'),
+            stage=data.get('stage'),
+            attempts=data.get('attempts', 0),
+            last_error=data.get('last_error'),
+            next_run_at=parse_date(data.get('next_run_at')),
+            created_at=parse_date(data.get('created_at')),
+            updated_at=parse_date(data.get('updated_at'))
+        )
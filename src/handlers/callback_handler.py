@@ -1,50 +1,134 @@
 from telethon import events
+from telethon.tl.types import MessageMediaPhoto
 from src.config import setup_logger
 from src.database.manager import DatabaseManager
 from src.database.models import Message
+from src.telegram_client import TelegramMessenger
+from src.utils.job_tracker import CANCEL_PREFIX, JobTracker, message_key
+from src.utils.media_reference import document_to_dict
+from src.utils.metrics import STAGE_SECONDS
+from src.utils.priority import BULK, INTERACTIVE, priority_lane, run_in_lane
+from types import SimpleNamespace
+import asyncio
 import os
+import time
 
 class CallbackHandler:
-    def __init__(self, client, config, media_forward_handler=None):
+    def __init__(self, client, config, media_forward_handler=None, messenger=None, jobs=None):
         self.client = client
         self.config = config
         self.logger = setup_logger('CallbackHandler')
         self.db_manager = DatabaseManager()
         self.media_forward_handler = media_forward_handler
+        self.messenger = messenger or TelegramMessenger(client, config)
+        self.jobs = jobs or JobTracker()
+
+    @property
+    def media_cache(self):
+        """Caché de medios del manejador de reenvío (si está disponible)"""
+        return self.media_forward_handler.media_cache if self.media_forward_handler else None
+
+    def _release_files(self, message):
+        """Liberar en la caché los archivos de un mensaje con botones ya borrado"""
+        if not self.media_cache:
+            return
+        message_obj = self.db_manager.get_message(message.id, message.chat_id)
+        if message_obj and message_obj.media_info:
+            file_paths = message_obj.media_info.get('file_paths') or [message_obj.media_info.get('file_path')]
+            self.media_cache.unpin(file_paths)
+
+    @staticmethod
+    def _kept_source(message, media_info):
+        """Mensaje original conservado para una vista previa (None si es el propio mensaje con botones)"""
+        source = media_info.get('source')
+        if source and (source['chat_id'], source['message_id']) != (message.chat_id, message.id):
+            return source
+        return None
+
+    async def _source_message(self, message):
+        """
+        Obtener el mensaje con el archivo original asociado a un mensaje con botones.
+
+        Si el mensaje con botones es una vista previa, el documento se vuelve a
+        obtener del mensaje original conservado (la referencia de archivo
+        guardada caduca); la guardada solo se usa si ese mensaje ya no existe.
+        """
+        message_obj = self.db_manager.get_message(message.id, message.chat_id)
+        media_info = message_obj.media_info if message_obj and message_obj.media_info else {}
+        source = self._kept_source(message, media_info)
+        if source or (media_info.get('document') and not message.media):
+            media = await self.messenger.refresh_media(source, media_info.get('document'))
+            return SimpleNamespace(
+                id=message.id,
+                chat_id=message.chat_id,
+                date=message.date,
+                media=media
+            ), media_info
+        return message, media_info
+
+    async def _delete_kept_source(self, message, media_info):
+        """Borrar el mensaje original que se conservaba mientras el usuario decidía"""
+        source = self._kept_source(message, media_info)
+        if source:
+            await self.messenger.delete_message(source['message_id'], source['chat_id'])
 
     def register_handlers(self):
         @self.client.on(events.CallbackQuery())
+        @self.jobs.wrap
+        @run_in_lane(INTERACTIVE)
         async def handle_callback(event):
             """Handle button callbacks."""
+            # Durante el apagado no se empiezan trabajos nuevos
+            if not self.jobs.accepting:
+                await event.answer("⏳ El bot se está reiniciando, inténtalo de nuevo en unos segundos.")
+                return
+
+            started = time.perf_counter()
+            action, outcome = 'unknown', 'ok'
             try:
-                self.logger.info(f"Callback data received: {event.data}")
+                self.logger.info("Callback data received: %s", event.data)
 
                 # Ensure we fetch the original message
                 original_message = await event.get_message()
                 data = event.data.decode("utf-8")
+                action = data
 
 
                 if data == "send_to_target":
                     self.logger.info("User chose to send video to target chat.")
                     # Forward the video to the target chat
-                    await self.client.send_file(
-                        self.config.chat_target,
-                        original_message.media,
-                        parse_mode='markdown',
-                        supports_streaming=True,
-                        spoiler=True
-                      )
+                    source_message, media_info = await self._source_message(original_message)
+                    if not source_message.media:
+                        await event.answer("❌ El video original ya no está disponible.")
+                        return
+                    async with self.messenger.api_limiter.slot():
+                        await self.client.send_file(
+                            self.messenger.resolve_chat(self.config.chat_target),
+                            source_message.media,
+                            parse_mode='markdown',
+                            supports_streaming=True,
+                            spoiler=True
+                        )
                     # Borrar el video del chat del usuario
-                    await original_message.delete()  # Delete after sending
+                    await self.messenger.delete_message(original_message.id, original_message.chat_id)
+                    await self._delete_kept_source(original_message, media_info)
+                    self._release_files(original_message)
                 elif data == "discard":
+                    # Detener la descarga o los clips que sigan en curso para este video
+                    self.jobs.cancel(message_key(original_message.chat_id, original_message.id))
                     # Delete the video from the user's chat
-                    await original_message.delete()  # Use the fetched message
+                    await self.messenger.delete_message(original_message.id, original_message.chat_id)
+                    message_obj = self.db_manager.get_message(original_message.id, original_message.chat_id)
+                    if message_obj and message_obj.media_info:
+                        await self._delete_kept_source(original_message, message_obj.media_info)
+                    self._release_files(original_message)
                     await event.answer("Video descartado y eliminado.")
                 elif data == "delete_file":
                     # Answer the callback first
                     await event.answer("Procesando eliminación...")
                     
                     self.logger.info("User chose to delete the file from filesystem.")
+                    self.jobs.cancel(message_key(original_message.chat_id, original_message.id))
                     # Get the message from database to find file path
                     message_obj = self.db_manager.get_message(original_message.id, original_message.chat_id)
                     if message_obj and message_obj.media_info and 'file_path' in message_obj.media_info:
@@ -52,6 +136,8 @@ class CallbackHandler:
                         self.logger.debug(f"Attempting to delete file at path: {file_path}")
                         if os.path.exists(file_path):
                             os.remove(file_path)
+                            if self.media_cache:
+                                self.media_cache.forget(file_path)
                             self.logger.info(f"Archivo {file_path} eliminado del sistema de archivos")
                             await event.answer("Archivo eliminado correctamente.")
                         else:
@@ -60,7 +146,7 @@ class CallbackHandler:
                         await event.answer("Información del archivo no disponible.")
                     
                     # Delete the message from chat
-                    await original_message.delete()
+                    await self.messenger.delete_message(original_message.id, original_message.chat_id)
                 elif data == "create_new_clips":
                     # Answer the callback first
                     await event.answer("Creando nuevos clips...")
@@ -69,16 +155,32 @@ class CallbackHandler:
                     
                     # Get the message from database to find file path
                     message_obj = self.db_manager.get_message(original_message.id, original_message.chat_id)
-                    if message_obj and message_obj.media_info and 'file_path' in message_obj.media_info:
-                        file_path = message_obj.media_info['file_path']
+                    media_info = message_obj.media_info if message_obj and message_obj.media_info else {}
+                    file_path = media_info.get('file_path')
+                    if (not file_path or not os.path.exists(file_path)) and media_info.get('document') \
+                            and self.media_forward_handler:
+                        # La caché de medios ya borró el archivo (o no se llegó a descargar):
+                        # se vuelve a descargar en un trabajo a partir del documento guardado
+                        self.logger.info("File no longer on disk, submitting a clips job from the stored document.")
+                        source = media_info.get('source') or {
+                            'chat_id': original_message.chat_id, 'message_id': original_message.id
+                        }
+                        job = await self.media_forward_handler.submit_clips_job(
+                            original_message, media_info['document'], "Creando nuevos clips", source=source
+                        )
+                        if not job:
+                            await event.answer("❌ Error al procesar el video.")
+                    elif file_path:
                         self.logger.debug(f"Creating new clips from file: {file_path}")
                         
                         if os.path.exists(file_path) and self.media_forward_handler:
+                            self.media_cache.touch(file_path)
                             try:
-                                # Create new clips
-                                lClip_path, clips_creados = await self.media_forward_handler.create_clips(
-                                    file_path, num_clips=3, clip_duration=10
-                                )
+                                # Los clips son trabajo pesado: no deben quitar huecos a otros botones
+                                with priority_lane(BULK):
+                                    lClip_path, clips_creados = await self.media_forward_handler.create_clips(
+                                        file_path, num_clips=3, clip_duration=10
+                                    )
                                 
                                 # Clean up temporary files
                                 await self.media_forward_handler.file_manager.cleanup_files(lClip_path)
@@ -93,53 +195,152 @@ class CallbackHandler:
                     else:
                         await event.answer("❌ Información del archivo no disponible.")
                 elif data == "download_and_create_clips":
-                    # Answer the callback first
-                    await event.answer("Descargando y creando clips...")
-                    
                     self.logger.info("User chose to download and create clips from short video.")
                     
                     if self.media_forward_handler:
-                        try:
-                            # Get file info
-                            file_info = self.media_forward_handler._get_file_info(original_message)
-                            
-                            # Download the video
-                            downloaded_path = await self.media_forward_handler._download_with_progress(
-                                original_message, file_info, "Procesando video corto como largo"
-                            )
-                            
-                            if not downloaded_path:
-                                await event.answer("❌ Error al descargar el video.")
-                                return
-                            
-                            # Save to database
-                            message_obj = Message(
-                                message_id=original_message.id,
-                                chat_id=original_message.chat_id,
-                                user_id=self.config.chat_me,
-                                message_type='document',
-                                media_info={'file_path': downloaded_path},
-                                created_at=original_message.date
-                            )
-                            self.db_manager.save_message(message_obj)
-                            
-                            # Create clips
-                            lClip_path, clips_creados = await self.media_forward_handler.create_clips(
-                                downloaded_path, num_clips=3, clip_duration=10
-                            )
-                            
-                            # Clean up temporary files
-                            await self.media_forward_handler.file_manager.cleanup_files(lClip_path)
-                            
-                            await event.answer(f"✅ {clips_creados} clips creados y enviados.")
-                            self.logger.info(f"Downloaded and created {clips_creados} clips from short video")
-                            
-                        except Exception as e:
-                            self.logger.error(f"Error downloading and creating clips: {e}")
+                        # La descarga y los clips se hacen en un trabajo persistente
+                        source_message, media_info = await self._source_message(original_message)
+                        document = (
+                            document_to_dict(source_message.media) if source_message.media
+                            else media_info.get('document')
+                        )
+                        source = media_info.get('source') or {
+                            'chat_id': original_message.chat_id, 'message_id': original_message.id
+                        }
+                        # Al descargarlo entero se buscan casi-duplicados y se registra en la caché
+                        job = await self.media_forward_handler.submit_clips_job(
+                            original_message, document, "Procesando video corto como largo",
+                            check_duplicates=True, source=source
+                        )
+                        if job:
+                            await event.answer("Descargando y creando clips...")
+                        else:
                             await event.answer("❌ Error al procesar el video.")
                     else:
                         await event.answer("❌ Servicio no disponible.")
+                elif data == "download_original":
+                    # Answer the callback first
+                    await event.answer("Descargando imagen original...")
+                    
+                    self.logger.info("User chose to download the full-size image.")
+                    downloaded_path = await self.messenger.download_media_from_message(original_message)
+                    if not downloaded_path:
+                        await self.messenger.send_notification_to_me("❌ Error al descargar la imagen original.")
+                        return
+                    
+                    message_obj = self.db_manager.get_message(original_message.id, original_message.chat_id)
+                    media_info = message_obj.media_info if message_obj and message_obj.media_info else {}
+                    self.db_manager.save_message(Message(
+                        message_id=original_message.id,
+                        chat_id=original_message.chat_id,
+                        user_id=self.config.chat_me,
+                        message_type='photo',
+                        media_info={**media_info, 'file_path': downloaded_path},
+                        created_at=original_message.date
+                    ))
+                    if self.media_cache:
+                        self.media_cache.register(downloaded_path)
+                    await self.messenger.send_notification_to_me(f"📥 Imagen original descargada: {downloaded_path}")
+                elif data in ("album_send_to_target", "album_discard", "album_delete_files",
+                              "album_download_originals"):
+                    await self._handle_album_callback(event, original_message, data)
+                elif data.startswith(CANCEL_PREFIX):
+                    action = 'cancel'
+                    if self.jobs.cancel(data[len(CANCEL_PREFIX):]):
+                        await event.answer("🛑 Cancelando...")
+                    else:
+                        await event.answer("El trabajo ya había terminado.")
                 else:
+                    action = 'unknown'
                     await event.answer("Acción desconocida.")
             except Exception as e:
-                self.logger.error(f"Error handling callback: {e}")
\ No newline at end of file
+                outcome = 'error'
+                self.logger.error(f"Error handling callback: {e}")
+            finally:
+                STAGE_SECONDS.observe(
+                    time.perf_counter() - started, handler='callback', stage=action, outcome=outcome
+                )
+
+    async def _handle_album_callback(self, event, buttons_message, data):
+        """
+        Gestionar los botones compartidos de un álbum.
+
+        El mensaje de botones guarda en la base de datos los IDs de los
+        mensajes del álbum y las rutas de los archivos descargados.
+        """
+        message_obj = self.db_manager.get_message(buttons_message.id, buttons_message.chat_id)
+        if not message_obj or not message_obj.media_info:
+            await event.answer("Información del álbum no disponible.")
+            return
+
+        album_ids = message_obj.media_info.get('album_message_ids', [])
+
+        if data == "album_download_originals":
+            await self._download_album_originals(event, buttons_message, message_obj)
+            return
+
+        if data == "album_send_to_target":
+            self.logger.info(f"User chose to send album ({len(album_ids)} items) to target chat.")
+            async with self.messenger.api_limiter.slot():
+                album_messages = await self.client.get_messages(buttons_message.chat_id, ids=album_ids)
+            media = [m.media for m in album_messages if m and m.media]
+            if not media:
+                await event.answer("❌ No se encontraron los elementos del álbum.")
+                return
+            async with self.messenger.api_limiter.slot():
+                await self.client.send_file(
+                    self.messenger.resolve_chat(self.config.chat_target),
+                    media,
+                    supports_streaming=True
+                )
+        elif data == "album_delete_files":
+            self.logger.info("User chose to delete the album files from filesystem.")
+            deleted = 0
+            for file_path in message_obj.media_info.get('file_paths', []):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    deleted += 1
+                if self.media_cache:
+                    self.media_cache.forget(file_path)
+            self.logger.info(f"{deleted} archivos del álbum eliminados del sistema de archivos")
+
+        # Borrar el álbum y el mensaje de botones con una sola llamada
+        await self.messenger.delete_messages(album_ids + [buttons_message.id], buttons_message.chat_id)
+        if self.media_cache and data != "album_delete_files":
+            self.media_cache.unpin(message_obj.media_info.get('file_paths', []))
+        await event.answer("Álbum procesado.")
+
+    async def _download_album_originals(self, event, buttons_message, message_obj):
+        """Descargar a tamaño completo las fotos de un álbum (solo se analizaron sus variantes)"""
+        await event.answer("Descargando originales...")
+        self.logger.info("User chose to download the full-size album photos.")
+        media_info = message_obj.media_info
+        async with self.messenger.api_limiter.slot():
+            album_messages = await self.client.get_messages(
+                buttons_message.chat_id, ids=media_info.get('album_message_ids', [])
+            )
+        photos = [m for m in album_messages if m and isinstance(m.media, MessageMediaPhoto)]
+        results = await asyncio.gather(
+            *(self.messenger.download_media_from_message(m) for m in photos),
+            return_exceptions=True
+        )
+        downloaded = [path for path in results if path and not isinstance(path, BaseException)]
+        if not downloaded:
+            await self.messenger.send_notification_to_me("❌ Error al descargar las fotos originales del álbum.")
+            return
+
+        file_paths = [path for path in media_info.get('file_paths', []) if path not in downloaded]
+        self.db_manager.save_message(Message(
+            message_id=buttons_message.id,
+            chat_id=buttons_message.chat_id,
+            user_id=self.config.chat_me,
+            message_type='album',
+            media_info={**media_info, 'file_paths': file_paths + downloaded},
+            created_at=message_obj.created_at
+        ))
+        if self.media_cache:
+            for path in downloaded:
+                self.media_cache.register(path)
+        await self.messenger.send_notification_to_me(
+            f"📥 {len(downloaded)} fotos originales del álbum descargadas"
+        )
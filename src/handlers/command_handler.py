@@ -6,51 +6,63 @@ from telethon import events
 from src.config import setup_logger
 from src.database import DatabaseManager
 from src.telegram_client import TelegramMessenger
+from src.utils.metrics import format_summary
+from src.utils.profiler import RuntimeProfiler
+from src.utils.priority import INTERACTIVE, run_in_lane
 
 
 class CommandHandler:
-    def __init__(self, client, config):
+    def __init__(self, client, config, media_forward_handler=None, messenger=None):
         """
         Inicializar el manejador de comandos
         
         Args:
             client: Cliente de Telethon
             config: Configuración del bot
+            media_forward_handler: Manejador de medios (para el estado del modelo)
+            messenger: TelegramMessenger compartido (se crea uno si no se pasa)
         """
         self.client = client
         self.config = config
+        self.media_forward_handler = media_forward_handler
         self.logger = setup_logger('command_handler')
         self.db_manager = DatabaseManager()
-        self.messenger = TelegramMessenger(client, config)
+        self.messenger = messenger or TelegramMessenger(client, config)
+        self.profiler = RuntimeProfiler(config.profile_dir)
     
     def register_commands(self):
         """Registrar todos los comandos del bot"""
         
         @self.client.on(events.NewMessage(pattern=r'/start'))
+        @run_in_lane(INTERACTIVE)
         async def start_command(event):
             """Comando /start"""
             try:
                 await self.messenger.reply_to_message(
                     "🤖 ¡Hola! Soy el pequeno Bot. Estoy procesando mensajes correctamente.",
-                    event.message.id
+                    event.message.id,
+                    event=event
                 )
                 self.logger.info(f"Comando /start ejecutado por usuario {event.sender_id}")
             except Exception as e:
                 self.logger.error(f"Error en comando /start: {e}")
         
         @self.client.on(events.NewMessage(pattern=r'/ping'))
+        @run_in_lane(INTERACTIVE)
         async def ping_command(event):
             """Comando /ping"""
             try:
-                await self.messenger.reply_to_message(
-                    "🏓 Pong! El bot está funcionando correctamente.",
-                    event.message.id
-                )
+                text = "🏓 Pong! El bot está funcionando correctamente."
+                inference_service = getattr(self.media_forward_handler, 'inference_service', None)
+                if inference_service:
+                    text += f"\n🧠 Modelo de análisis: {inference_service.status}"
+                await self.messenger.reply_to_message(text, event.message.id, event=event)
                 self.logger.info(f"Comando /ping ejecutado por usuario {event.sender_id}")
             except Exception as e:
                 self.logger.error(f"Error en comando /ping: {e}")
         
         @self.client.on(events.NewMessage(pattern=r'/help'))
+        @run_in_lane(INTERACTIVE)
         async def help_command(event):
             """Comando /help"""
             try:
@@ -63,6 +75,8 @@ class CommandHandler:
 • /help - Mostrar esta ayuda
 • /status - Ver el estado del bot
 • /stats - Ver estadísticas de mensajes guardados
+• /metrics - Ver latencias de cada etapa (solo en chat_me)
+• /profile start|stop - Perfilar el proceso en caliente (solo en chat_me)
 
 🆔 **Comandos de información:**
 • /id - Obtener información completa de IDs (mensaje, chat, usuario)
@@ -79,17 +93,18 @@ class CommandHandler:
 • Mensajes editados
 • Guarda todo en la base de datos
                 """
-                await self.messenger.reply_to_message(help_text, event.message.id)
+                await self.messenger.reply_to_message(help_text, event.message.id, event=event)
                 self.logger.info(f"Comando /help ejecutado por usuario {event.sender_id}")
             except Exception as e:
                 self.logger.error(f"Error en comando /help: {e}")
         
         @self.client.on(events.NewMessage(pattern=r'/status'))
+        @run_in_lane(INTERACTIVE)
         async def status_command(event):
             """Comando /status"""
             try:
                 # Información básica del bot
-                me = await self.client.get_me()
+                me = await self.messenger.get_me()
                 status_text = f"""
 🤖 **Estado del pequeno Bot:**
 
@@ -98,12 +113,13 @@ class CommandHandler:
 🆔 **ID:** {me.id}
 📊 **Configuración:** {self.config.get_group_info()}
                 """
-                await self.messenger.reply_to_message(status_text, event.message.id)
+                await self.messenger.reply_to_message(status_text, event.message.id, event=event)
                 self.logger.info(f"Comando /status ejecutado por usuario {event.sender_id}")
             except Exception as e:
                 self.logger.error(f"Error en comando /status: {e}")
         
         @self.client.on(events.NewMessage(pattern=r'/stats'))
+        @run_in_lane(INTERACTIVE)
         async def stats_command(event):
             """Comando /stats - Mostrar estadísticas de la base de datos"""
             try:
@@ -112,7 +128,8 @@ class CommandHandler:
                 if not stats:
                     await self.messenger.reply_to_message(
                         "❌ Error obteniendo estadísticas de la base de datos",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                     return
                 
@@ -148,17 +165,73 @@ class CommandHandler:
                         count = day.get('count', 0)
                         stats_text += f"• {date}: {count} mensajes\n"
                 
-                await self.messenger.reply_to_message(stats_text, event.message.id)
+                await self.messenger.reply_to_message(stats_text, event.message.id, event=event)
                 self.logger.info(f"Comando /stats ejecutado por usuario {event.sender_id}")
                 
             except Exception as e:
                 self.logger.error(f"Error en comando /stats: {e}")
                 await self.messenger.reply_to_message(
                     "❌ Error obteniendo estadísticas",
-                    event.message.id
+                    event.message.id,
+                    event=event
                 )
         
+        @self.client.on(events.NewMessage(pattern=r'/metrics'))
+        @run_in_lane(INTERACTIVE)
+        async def metrics_command(event):
+            """Comando /metrics - Resumen de latencias (solo en chat_me)"""
+            try:
+                if event.chat_id != self.config.chat_me:
+                    self.logger.warning(f"Comando /metrics rechazado en el chat {event.chat_id}")
+                    return
+                
+                await self.messenger.reply_to_message(format_summary(), event.message.id, event=event)
+                self.logger.info(f"Comando /metrics ejecutado por usuario {event.sender_id}")
+                
+            except Exception as e:
+                self.logger.error(f"Error en comando /metrics: {e}")
+        
+        @self.client.on(events.NewMessage(pattern=r'/profile'))
+        @run_in_lane(INTERACTIVE)
+        async def profile_command(event):
+            """Comando /profile start|stop - Perfilado con cProfile (solo en chat_me)"""
+            try:
+                if event.chat_id != self.config.chat_me:
+                    self.logger.warning(f"Comando /profile rechazado en el chat {event.chat_id}")
+                    return
+                
+                parts = event.raw_text.split()
+                action = parts[1].lower() if len(parts) > 1 else ''
+                
+                if action == 'start':
+                    if self.profiler.start():
+                        text = "🔬 Perfilado iniciado. Usa `/profile stop` para ver el resultado."
+                    elif self.profiler.running:
+                        text = "⚠️ El perfilado ya está activo."
+                    else:
+                        text = "❌ No se pudo iniciar el perfilado."
+                elif action == 'stop':
+                    if not self.profiler.running:
+                        text = "⚠️ El perfilado no está activo."
+                    else:
+                        result = await self.profiler.stop()
+                        if result:
+                            path, summary = result
+                            text = f"🔬 **Perfil guardado en** `{path}`\n\n```\n{summary[-3500:]}```"
+                        else:
+                            text = "❌ Error guardando el perfil."
+                else:
+                    estado = "activo" if self.profiler.running else "inactivo"
+                    text = f"Uso: `/profile start|stop` (perfilado {estado})"
+                
+                await self.messenger.reply_to_message(text, event.message.id, event=event)
+                self.logger.info(f"Comando /profile {action} ejecutado por usuario {event.sender_id}")
+                
+            except Exception as e:
+                self.logger.error(f"Error en comando /profile: {e}")
+        
         @self.client.on(events.NewMessage(pattern=r'/test_messenger'))
+        @run_in_lane(INTERACTIVE)
         async def test_messenger_command(event):
             """Comando /test_messenger - Probar el cliente de mensajería"""
             try:
@@ -177,24 +250,27 @@ class CommandHandler:
 • /send_notification - Enviar notificación personal
                 """
                 
-                await self.messenger.reply_to_message(test_text, event.message.id)
+                await self.messenger.reply_to_message(test_text, event.message.id, event=event)
                 self.logger.info(f"Comando /test_messenger ejecutado por usuario {event.sender_id}")
                 
             except Exception as e:
                 self.logger.error(f"Error en comando /test_messenger: {e}")
                 await self.messenger.reply_to_message(
                     "❌ Error probando cliente de mensajería",
-                    event.message.id
+                    event.message.id,
+                    event=event
                 )
         
         @self.client.on(events.NewMessage(pattern=r'/send_test'))
+        @run_in_lane(INTERACTIVE)
         async def send_test_command(event):
             """Comando /send_test - Enviar mensaje de prueba al chat target"""
             try:
                 if not self.config.chat_target:
                     await self.messenger.reply_to_message(
                         "❌ CHAT_TARGET no configurado",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                     return
                 
@@ -211,12 +287,14 @@ Usuario: {event.sender_id}
                 if result:
                     await self.messenger.reply_to_message(
                         "✅ Mensaje de prueba enviado correctamente",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                 else:
                     await self.messenger.reply_to_message(
                         "❌ Error enviando mensaje de prueba",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                 
                 self.logger.info(f"Comando /send_test ejecutado por usuario {event.sender_id}")
@@ -225,17 +303,20 @@ Usuario: {event.sender_id}
                 self.logger.error(f"Error en comando /send_test: {e}")
                 await self.messenger.reply_to_message(
                     "❌ Error en comando de prueba",
-                    event.message.id
+                    event.message.id,
+                    event=event
                 )
         
         @self.client.on(events.NewMessage(pattern=r'/send_notification'))
+        @run_in_lane(INTERACTIVE)
         async def send_notification_command(event):
             """Comando /send_notification - Enviar notificación personal"""
             try:
                 if not self.config.chat_me:
                     await self.messenger.reply_to_message(
                         "❌ CHAT_ME no configurado",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                     return
                 
@@ -251,12 +332,14 @@ Hora: {event.date}
                 if result:
                     await self.messenger.reply_to_message(
                         "✅ Notificación enviada",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                 else:
                     await self.messenger.reply_to_message(
                         "❌ Error enviando notificación",
-                        event.message.id
+                        event.message.id,
+                        event=event
                     )
                 
                 self.logger.info(f"Comando /send_notification ejecutado por usuario {event.sender_id}")
@@ -265,5 +348,6 @@ Hora: {event.date}
                 self.logger.error(f"Error en comando /send_notification: {e}")
                 await self.messenger.reply_to_message(
                     "❌ Error enviando notificación",
-                    event.message.id
+                    event.message.id,
+                    event=event
                 )
@@ -8,21 +8,23 @@ from telethon import events
 from telethon.tl.types import User, Chat, Channel
 from src.config import setup_logger
 from src.telegram_client import TelegramMessenger
+from src.utils.priority import INTERACTIVE, run_in_lane
 
 
 class InfoHandler:
     """Clase para manejar comandos de información del bot"""
     
-    def __init__(self, client, config):
+    def __init__(self, client, config, messenger=None):
         self.client = client
         self.config = config
         self.logger = setup_logger('InfoHandler')
-        self.messenger = TelegramMessenger(client, config)
+        self.messenger = messenger or TelegramMessenger(client, config)
     
     def register_commands(self):
         """Registrar todos los comandos de información"""
         
         @self.client.on(events.NewMessage(pattern=r'/id'))
+        @run_in_lane(INTERACTIVE)
         async def cmd_id(event):
             """Comando /id - Muestra información completa de IDs"""
             try:
@@ -34,6 +36,7 @@ class InfoHandler:
                 )
         
         @self.client.on(events.NewMessage(pattern=r'/info'))
+        @run_in_lane(INTERACTIVE)
         async def cmd_info(event):
             """Comando /info - Información del bot"""
             try:
@@ -158,7 +161,7 @@ class InfoHandler:
         
         # Información del bot
         response += "🤖 **INFORMACIÓN DEL BOT**\n"
-        me = await self.client.get_me()
+        me = await self.messenger.get_me()
         response += f"👤 **Nombre**: {me.first_name}\n"
         response += f"🆔 **ID**: `{me.id}`\n"
         response += f"📛 **Username**: @{me.username}\n\n"
@@ -1,37 +1,114 @@
 import os
+import asyncio
+from types import SimpleNamespace
 from telethon import events
 from telethon.tl.custom import Button
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageMediaWebPage
 from src.config import setup_logger
 from src.telegram_client import TelegramMessenger
 from src.utils.file_manager import FileManager
+from src.utils.album_collector import AlbumCollector
+from src.utils.job_scheduler import JobScheduler
+from src.utils.job_tracker import CANCEL_PREFIX, JobTracker, cancelled_by_user, message_key
+from src.utils.media_cache import MediaCache
+from src.utils.media_reference import document_to_dict
+from src.utils.media_proxy import MediaProxy
+from src.utils.mp4_index import Mp4IndexError, load_mp4_index
+from src.utils.photo_sizes import TASK_MIN_SIDE
+from src.utils.metrics import STAGE_SECONDS, exception_outcome, timed
+from src.utils.tracing import format_breakdown, span, start_trace, traced
+from src.utils.image_hash import PerceptualHashIndex, phash
+from src.utils.model_hf import InferenceService
 from src.database.manager import DatabaseManager
 from src.database.models import Message
 
+# Tipo de trabajo persistente: descargar un video y crear sus clips
+CLIPS_JOB = 'download_and_create_clips'
+# Videos de los que se pueden crear clips descargando solo sus rangos
+STREAMABLE_MIME_TYPES = ('video/mp4', 'video/quicktime')
+
 
 class MediaForwardHandler:
-    def __init__(self, client, config):
+    def __init__(self, client, config, messenger=None, jobs=None):
         self.client = client
         self.config = config
         self.logger = setup_logger('MediaForwardHandler')
-        self.messenger = TelegramMessenger(client, config)
+        self.messenger = messenger or TelegramMessenger(client, config)
+        # Trabajos en curso (compartido con el resto de handlers para el apagado)
+        self.jobs = jobs or JobTracker()
         self.file_manager = FileManager()
         self.db_manager = DatabaseManager()
+        self.media_cache = MediaCache(
+            self.db_manager,
+            max_bytes=getattr(config, 'media_cache_max_mb', 0) * 1024 * 1024,
+            max_age_hours=getattr(config, 'media_cache_max_age_hours', 0),
+            partial_dirs=[self.messenger.download_dir],
+            partial_max_age_hours=getattr(config, 'partial_downloads_max_age_hours', 0)
+        )
+        # Las descargas hacen sitio expulsando archivos no fijados de la caché
+        self.messenger.admission_controller.set_evictor(self.media_cache.make_room)
+        self.hash_index = None
+        if getattr(config, 'duplicate_detection_enabled', False):
+            self.hash_index = PerceptualHashIndex(
+                self.db_manager,
+                max_distance=getattr(config, 'duplicate_max_distance', 6)
+            )
+        self.inference_service = None
+        if getattr(config, 'image_analysis_enabled', False):
+            self.inference_service = InferenceService(
+                config.hf_model,
+                task=config.hf_task,
+                token=config.hf_token,
+                batch_size=config.inference_batch_size,
+                batch_wait_ms=config.inference_batch_wait_ms,
+                workers=config.inference_workers,
+                min_score=config.inference_min_score,
+                detections_dir=config.detections_dir,
+                db_manager=self.db_manager
+            )
+        # Trabajos pesados persistentes que se reanudan tras un reinicio
+        self.job_scheduler = JobScheduler(
+            self.db_manager,
+            jobs=self.jobs,
+            concurrency=getattr(config, 'jobs_concurrency', 2),
+            max_attempts=getattr(config, 'job_max_attempts', 5),
+            retry_base=getattr(config, 'job_retry_base_seconds', 30.0)
+        )
+        self.job_scheduler.register(CLIPS_JOB, self._run_clips_job)
+        # Proxy HTTP local para que ffmpeg lea los videos de Telegram sin descargarlos
+        self.media_proxy = None
+        if getattr(config, 'media_proxy_enabled', False):
+            self.media_proxy = MediaProxy(self.messenger, port=config.media_proxy_port)
+        self.album_collector = AlbumCollector(
+            self.jobs.wrap(self._process_album),
+            window=getattr(config, 'album_group_window_ms', 1500) / 1000
+        )
       
 
     def register_handlers(self):
 
         @self.client.on(events.NewMessage(incoming=True))
+        @self.jobs.wrap
         async def handle_incoming_message(event):
             """
             Trazar de donde vienen los mensajes id, id del chat, tipo de mensaje, origen, renviado o no#
             """
-            message_info = {
-                'message_id': event.message.id,
-                'chat_id': event.message.chat_id,
-                'is_forwarded': event.message.fwd_from is not None
-            }
-            self.logger.info(f"Mensaje recibido: {message_info}")
+            # Durante el apagado no se aceptan medios nuevos
+            if not self.jobs.accepting:
+                self.logger.info("Mensaje %s ignorado: el bot se está apagando", event.message.id)
+                return
+
+            # Formato perezoso: el texto se compone en el hilo del logging
+            self.logger.info(
+                "Mensaje recibido: {'message_id': %s, 'chat_id': %s, 'is_forwarded': %s}",
+                event.message.id, event.message.chat_id, event.message.fwd_from is not None
+            )
+            self.messenger.remember_event(event)
+
+            # Los mensajes de un álbum se acumulan y se procesan juntos
+            if event.message.grouped_id:
+                self.album_collector.add(event.message)
+                return
 
             """Handle incoming messages and forward them if necessary."""
             try:
@@ -57,48 +134,72 @@ class MediaForwardHandler:
             except Exception as e:
                 self.logger.error(f"Error handling message: {e}")
 
+    @timed(STAGE_SECONDS, handler='media_forward', stage='video', outcome=exception_outcome)
     async def _process_video(self, message):
         """Process video messages."""
         file_info = self._get_file_info(message)
         long_video, reason = await self._should_download_file(file_info)
 
+        keep_source = False
         if long_video:
             # Call the VideoProcessor for long videos
-            await self._process_long_video(message, file_info, reason)
+            with start_trace('long_video', chat_id=message.chat_id, message_id=message.id) as trace:
+                keep_source = await self._process_long_video(message, file_info, reason)
+            await self.send_trace_breakdown(trace)
         else:
             await self._process_short_video(message)
 
-        # Delete the video from the original chat
-        await self.messenger.delete_message(message.id,message.chat_id)
+        # Delete the video from the original chat (salvo que sea la única copia del documento)
+        if not keep_source:
+            await self.messenger.delete_message(message.id,message.chat_id)
 
+    @timed(STAGE_SECONDS, handler='media_forward', stage='image', outcome=exception_outcome)
     async def _process_image(self, message):
         """Process image messages."""
-        file_info = self._get_file_info(message)
-        
-        # Send image with initial caption to the user's chat
-        sent_message = await self._replay_with_buttons(message, caption="🖼️ Procesando imagen...")
+        downloaded_path = None
+        if isinstance(message.media, MessageMediaPhoto):
+            # Las fotos traen varias resoluciones: basta con la menor que sirva para analizarla
+            analysis_path = await self._download_photo_for_analysis(message)
+        else:
+            file_info = self._get_file_info(message)
 
-        # Download the image
-        file_name = file_info.get('file_name') if file_info else None
-        downloaded_path = await self.messenger.download_media_from_message(message, file_name=file_name)
-        
-        if not downloaded_path:
-            self.logger.error("Error al descargar la imagen")
+            # Download the image
+            file_name = file_info.get('file_name') if file_info else None
+            downloaded_path = await self.messenger.download_media_from_message(message, file_name=file_name)
+            
+            if not downloaded_path:
+                self.logger.error("Error al descargar la imagen")
+                return
+            
+            self.logger.info(f"Imagen descargada: {downloaded_path}")
+            analysis_path = downloaded_path
+
+        # Detectar casi-duplicados y analizar la imagen antes de reenviarla
+        hashes, detections = await asyncio.gather(
+            self._compute_image_hashes(analysis_path),
+            self._analyze_image(analysis_path, message, downloaded_path)
+        )
+        temp_files = [analysis_path] if analysis_path and analysis_path != downloaded_path else []
+        duplicate = self._find_duplicate(hashes)
+        if duplicate and self._discard_duplicates():
+            await self.file_manager.cleanup_files(temp_files + ([downloaded_path] if downloaded_path else []))
+            await self.messenger.delete_message(message.id, message.chat_id)
+            await self.messenger.send_notification_to_me(self._duplicate_text(duplicate, 'Imagen'))
             return
-        
-        self.logger.info(f"Imagen descargada: {downloaded_path}")
 
-        # Edit message to indicate processing is complete
-        try:
-            await self.client.edit_message(
-                sent_message.chat_id,
-                sent_message.id,
-                text="🖼️ Imagen procesada",
-                buttons=sent_message.buttons
-            )
-            self.logger.info("Mensaje actualizado")
-        except Exception as e:
-            self.logger.error(f"Error editando mensaje: {e}")
+        caption = "🖼️ Imagen procesada"
+        if duplicate:
+            caption += "\n" + self._duplicate_text(duplicate, 'Imagen')
+        if detections:
+            caption += "\n" + self._detections_text(detections)
+
+        # Send image with buttons to the user's chat
+        if downloaded_path:
+            sent_message = await self._replay_with_buttons(message, caption=caption)
+        else:
+            sent_message = await self._replay_photo_with_buttons(message, caption=caption)
+        if self.hash_index and hashes:
+            self.hash_index.add(hashes, 'image', sent_message.chat_id, sent_message.id, downloaded_path)
 
         # Save the file path to the sent message in database
         message_obj = Message(
@@ -106,14 +207,35 @@ class MediaForwardHandler:
             chat_id=sent_message.chat_id,
             user_id=self.config.chat_me,
             message_type='photo',
-            media_info={'file_path': downloaded_path},
+            media_info={'file_path': downloaded_path} if downloaded_path else {},
             created_at=sent_message.date
         )
         self.db_manager.save_message(message_obj)
+        self.media_cache.register(downloaded_path)
+        await self.file_manager.cleanup_files(temp_files)
 
         # Delete the image from the original chat
         await self.messenger.delete_message(message.id, message.chat_id)
 
+    async def _download_photo_for_analysis(self, message):
+        """
+        Descargar la variante más pequeña de la foto que sirva para analizarla
+
+        Returns:
+            Ruta de la variante en el directorio temporal o None si no hay
+            ningún análisis activo (en ese caso no se descarga nada)
+        """
+        if self.inference_service:
+            min_side = TASK_MIN_SIDE['classification']
+        elif self.hash_index:
+            min_side = TASK_MIN_SIDE['hash']
+        else:
+            return None
+
+        variant_path = os.path.join(self.config.temp_dir, f"photo_{message.chat_id}_{message.id}.jpg")
+        return await self.messenger.download_photo_variant(message, min_side, variant_path)
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='sticker', outcome=exception_outcome)
     async def _process_sticker(self, message):
         """Process sticker messages."""
         try:
@@ -144,6 +266,7 @@ class MediaForwardHandler:
                 created_at=sent_message.date
             )
             self.db_manager.save_message(message_obj)
+            self.media_cache.register(downloaded_path)
             
             # Delete the sticker from the original chat
             await self.messenger.delete_message(message.id, message.chat_id)
@@ -152,42 +275,519 @@ class MediaForwardHandler:
             self.logger.error(f"Error processing sticker: {e}")
             await self.messenger.send_notification_to_me(f"❌ Error procesando sticker: {str(e)}", parse_mode='md')
 
-    async def _process_long_video(self, message, file_info, reason):
+    @timed(STAGE_SECONDS, handler='media_forward', stage='album', outcome=exception_outcome)
+    async def _process_album(self, messages):
+        """
+        Procesar un álbum completo como una única tarea.
 
-        
-        # Send video with buttons to the user's chat
-        sent_message = await self._replay_long_video_with_buttons(message, caption=f"**⚠️ Video largo detectado ⚠️ **\n🎬 tiempo: {file_info['file_size'] / (1024 * 1024):.2f} MB")
+        Los elementos agrupables (imágenes y videos cortos) se reenvían con un
+        solo álbum y un único mensaje de botones, las imágenes se analizan en
+        paralelo y los originales se borran con una sola llamada.
+        Cada video largo sigue su flujo individual en su propio trabajo, sin
+        retrasar el resto del álbum.
+        """
+        grouped = []
+        for message in messages:
+            message_type = self._determine_message_type(message)
+            if message_type in ['video', 'animation']:
+                long_video, _ = await self._should_download_file(self._get_file_info(message))
+                if long_video:
+                    self.jobs.spawn(self._process_album_video, message)
+                    continue
+            elif message_type != 'image':
+                self.logger.info(f"Elemento de álbum ignorado (tipo {message_type}): {message.id}")
+                continue
+            grouped.append((message, message_type))
 
-        # Descargar el video con mensajes de progreso
-        downloaded_path = await self._download_with_progress(message, file_info, reason)
-        
-        if not downloaded_path:
-            self.logger.error("Error al descargar el video largo")
+        if not grouped:
             return
-        
-        self.logger.info(f"Video descargado exitosamente: {downloaded_path}")
 
-        # Save the file path to the sent message in database
+        if len(grouped) == 1:
+            # Un único elemento no necesita tratamiento de álbum
+            message, message_type = grouped[0]
+            if message_type in ['video', 'animation']:
+                await self._process_video(message)
+            elif getattr(self.config, 'image_processing_enabled', True):
+                await self._process_image(message)
+            return
+
+        album_messages = [message for message, _ in grouped]
+        chat_id = album_messages[0].chat_id
+
+        # Reenviar el álbum completo a chat_me sin volver a subir los archivos
+        sent_album = await self.messenger.send_album(
+            [message.media for message in album_messages],
+            chat_id=self.config.chat_me
+        )
+        if not sent_album:
+            self.logger.error("Error reenviando el álbum")
+            return
+
+        # Los álbumes no admiten botones: se envían en un mensaje aparte
+        has_photos = any(isinstance(message.media, MessageMediaPhoto) for message in album_messages)
+        buttons_message = await self.messenger.send_text_message(
+            f"📚 Álbum recibido: {len(sent_album)} elementos",
+            chat_id=self.config.chat_me,
+            reply_to=sent_album[0].id,
+            buttons=self._album_buttons(has_photos)
+        )
+        if not buttons_message:
+            self.logger.error("Error enviando los botones del álbum")
+            return
+
+        # Analizar (y descargar, si son documentos) las imágenes del álbum en paralelo
+        file_paths = []
+        if getattr(self.config, 'image_processing_enabled', True):
+            images = [
+                (message, sent) for (message, message_type), sent in zip(grouped, sent_album)
+                if message_type == 'image'
+            ]
+            results = await asyncio.gather(
+                *(self._process_album_image(message, sent) for message, sent in images),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    self.logger.error(f"Error procesando imagen del álbum: {result}")
+                elif result:
+                    file_paths.append(result)
+
+        # Guardar la relación entre el mensaje de botones y el álbum
         message_obj = Message(
+            message_id=buttons_message.id,
+            chat_id=buttons_message.chat_id,
+            user_id=self.config.chat_me,
+            message_type='album',
+            media_info={
+                'album_message_ids': [m.id for m in sent_album],
+                'file_paths': file_paths
+            },
+            created_at=buttons_message.date
+        )
+        self.db_manager.save_message(message_obj)
+        for file_path in file_paths:
+            self.media_cache.register(file_path)
+
+        # Borrar los originales con una sola llamada
+        await self.messenger.delete_messages([m.id for m in album_messages], chat_id)
+
+    async def _process_album_video(self, message):
+        """Procesar un video largo de un álbum como un trabajo independiente"""
+        try:
+            await self._process_video(message)
+        except Exception as e:
+            self.logger.error(f"Error procesando video largo del álbum {message.id}: {e}")
+
+    async def _process_album_image(self, message, sent_message):
+        """
+        Analizar una imagen de un álbum igual que ``_process_image``
+
+        Las fotos se analizan con su variante más pequeña y el original solo
+        se descarga con el botón "Descargar originales"; las imágenes enviadas
+        como documento se descargan enteras.
+
+        Returns:
+            Ruta del archivo descargado o None si no se descargó el original
+        """
+        downloaded_path = None
+        if isinstance(message.media, MessageMediaPhoto):
+            analysis_path = await self._download_photo_for_analysis(message)
+        else:
+            downloaded_path = await self.messenger.download_media_from_message(
+                message, file_name=(self._get_file_info(message) or {}).get('file_name')
+            )
+            analysis_path = downloaded_path
+        if not analysis_path:
+            return downloaded_path
+
+        hashes, _ = await asyncio.gather(
+            self._compute_image_hashes(analysis_path),
+            self._analyze_image(analysis_path, message, downloaded_path)
+        )
+        if self.hash_index and hashes:
+            self.hash_index.add(hashes, 'image', sent_message.chat_id, sent_message.id, downloaded_path)
+        if analysis_path != downloaded_path:
+            await self.file_manager.cleanup_files([analysis_path])
+        return downloaded_path
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='long_video', outcome=exception_outcome)
+    async def _process_long_video(self, message, file_info, reason):
+        """
+        Enviar a chat_me la vista previa (o el video) de un video largo con botones
+
+        Si se envía una vista previa, el único mensaje que conserva el
+        documento es el original: no se borra hasta que el usuario lo envíe
+        al chat destino o lo descarte, y se guarda su posición para volver a
+        obtenerlo (las referencias de archivo caducan).
+
+        Returns:
+            True si hay que conservar el mensaje original
+        """
+        caption = f"**⚠️ Video largo detectado ⚠️ **\n🎬 tiempo: {file_info['file_size'] / (1024 * 1024):.2f} MB"
+        document = document_to_dict(message.media)
+
+        # Enviar una vista previa en lugar del video completo cuando sea posible
+        preview_path = await self._build_video_preview(message)
+        if preview_path:
+            sent_message = await self._replay_preview_with_buttons(preview_path, caption=caption)
+            await self.file_manager.cleanup_files([preview_path])
+            source = {'chat_id': message.chat_id, 'message_id': message.id}
+        else:
+            # Send video with buttons to the user's chat
+            sent_message = await self._replay_long_video_with_buttons(message, caption=caption)
+            source = {'chat_id': sent_message.chat_id, 'message_id': sent_message.id}
+
+        # Guardar el mensaje que conserva el documento (y su referencia de reserva)
+        # para los botones y para la cola de trabajos
+        self.db_manager.save_message(Message(
             message_id=sent_message.id,
             chat_id=sent_message.chat_id,
             user_id=self.config.chat_me,
             message_type='document',
-            media_info={'file_path': downloaded_path},
+            media_info={'document': document, 'source': source},
             created_at=sent_message.date
+        ))
+
+        if not getattr(self.config, 'long_video_auto_download', False):
+            # El usuario decide con los botones si descargar o reenviar el original. Los
+            # casi-duplicados y la caché de medios solo se aplican si elige descargarlo
+            return bool(preview_path)
+
+        # La descarga y los clips se hacen en un trabajo persistente que sobrevive a reinicios.
+        # En modo por rangos el video no se descarga entero (ni se buscan duplicados)
+        streaming = getattr(self.config, 'streaming_clips_enabled', False)
+        await self.submit_clips_job(
+            sent_message, document, reason, check_duplicates=not streaming, streaming=streaming, source=source
         )
-        self.db_manager.save_message(message_obj)
+        return bool(preview_path)
 
-        # Crear 3 clips de 10 segundos aleatorios
-        lClip_path, clips_creados = await self.create_clips(downloaded_path, num_clips=3, clip_duration=10)
+    async def submit_clips_job(self, buttons_message, document, reason, check_duplicates=False, streaming=False,
+                               source=None):
+        """
+        Encolar la descarga de un video y la creación de sus clips
 
+        Args:
+            buttons_message: Mensaje con botones al que se asocia el archivo descargado
+            document: Referencia serializada del documento (``document_to_dict``)
+            reason: Razón de la descarga (se muestra en el progreso)
+            check_duplicates: Comprobar casi-duplicados antes de crear los clips
+            streaming: Intentar crear los clips descargando solo sus rangos
+            source: {'chat_id', 'message_id'} del mensaje que conserva el documento;
+                se vuelve a obtener en cada intento porque la referencia caduca
 
-        # Limpiar archivos temporales
-        await self.file_manager.cleanup_files(lClip_path)
+        Returns:
+            El trabajo creado o None si no se pudo encolar
+        """
+        if not document:
+            self.logger.error("No hay referencia del documento para encolar el trabajo")
+            return None
+        return await self.job_scheduler.submit(CLIPS_JOB, {
+            'chat_id': buttons_message.chat_id,
+            'message_id': buttons_message.id,
+            'document': document,
+            'reason': reason,
+            'check_duplicates': check_duplicates,
+            'streaming': streaming,
+            'source': source
+        })
 
-            
+    async def _run_clips_job(self, job):
+        """
+        Ejecutar un trabajo de descarga y creación de clips por etapas
+
+        Cada etapa completada se guarda en el trabajo, así que un reintento o
+        un reinicio continúa desde la siguiente:
+        ``downloaded`` (ruta del archivo) → ``registered`` (base de datos y
+        caché) → ``clips``.
+
+        Los botones "Descartar" y "Borrar archivo" del mensaje asociado
+        cancelan el trabajo; si el archivo descargado aún no se había
+        registrado, se borra.
+
+        Returns:
+            True si el trabajo terminó, False para reintentarlo
+        """
+        with self.jobs.cancellable(message_key(job.payload['chat_id'], job.payload['message_id'])):
+            try:
+                return await self._run_clips_stages(job)
+            except asyncio.CancelledError as e:
+                if cancelled_by_user(e) and job.stage == 'downloaded':
+                    await self.file_manager.cleanup_files([job.payload['file_path']])
+                raise
+
+    async def _run_clips_stages(self, job):
+        """Ejecutar las etapas pendientes de un trabajo de clips"""
+        payload = job.payload
+        chat_id, message_id = payload['chat_id'], payload['message_id']
+        file_path = payload.get('file_path')
+        needs_media = job.stage is None or not (file_path and os.path.exists(file_path))
+        source = None
+        if needs_media:
+            # Referencia de archivo vigente: la guardada caduca entre reintentos y reinicios
+            media = await self.messenger.refresh_media(payload.get('source'), payload.get('document'))
+            if media is None:
+                self.logger.error(f"Trabajo {job.id}: el documento ya no está disponible")
+                return False
+            source = SimpleNamespace(id=message_id, chat_id=chat_id, date=None, media=media)
+        with start_trace(CLIPS_JOB, chat_id=chat_id, message_id=message_id, job_id=job.id) as trace:
+            if job.stage is None and payload.get('streaming'):
+                # Solo hacen falta clips: descargar únicamente sus rangos
+                streamed = await self._create_streamed_clips(source, num_clips=3, clip_duration=10)
+                if streamed and streamed[1]:
+                    lClip_path, clips_creados = streamed
+                    await self.file_manager.cleanup_files(lClip_path)
+                    await self.job_scheduler.checkpoint(job, 'clips', clips=clips_creados, streamed=True)
+                    self.logger.info(f"Trabajo {job.id}: {clips_creados} clips creados por rangos")
+                    await self.send_trace_breakdown(trace)
+                    return True
+
+            if needs_media:
+                file_path = await self._download_with_progress(
+                    source, self._get_file_info(source), payload.get('reason', '')
+                )
+                if not file_path:
+                    return False
+                await self.job_scheduler.checkpoint(job, 'downloaded', file_path=file_path)
+
+            if job.stage == 'downloaded':
+                if payload.get('check_duplicates') and not await self._check_clip_duplicates(file_path, chat_id, message_id):
+                    # El original conservado para la vista previa también sobra
+                    kept = payload.get('source')
+                    if kept and (kept['chat_id'], kept['message_id']) != (chat_id, message_id):
+                        await self.messenger.delete_message(kept['message_id'], kept['chat_id'])
+                    await self.job_scheduler.checkpoint(job, 'discarded')
+                    return True
+
+                existing = self.db_manager.get_message(message_id, chat_id)
+                media_info = existing.media_info if existing and existing.media_info else {}
+                self.db_manager.save_message(Message(
+                    message_id=message_id,
+                    chat_id=chat_id,
+                    user_id=self.config.chat_me,
+                    message_type='document',
+                    media_info={**media_info, 'document': document_to_dict(source.media) if source else payload['document'],
+                                'file_path': file_path},
+                    created_at=existing.created_at if existing else None
+                ))
+                self.media_cache.register(file_path)
+                await self.job_scheduler.checkpoint(job, 'registered')
+
+            if job.stage == 'registered':
+                lClip_path, clips_creados = await self.create_clips(file_path, num_clips=3, clip_duration=10)
+                await self.file_manager.cleanup_files(lClip_path)
+                await self.job_scheduler.checkpoint(job, 'clips', clips=clips_creados)
+                self.logger.info(f"Trabajo {job.id}: {clips_creados} clips creados de {file_path}")
+
+        await self.send_trace_breakdown(trace)
+        return True
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='streamed_clips', outcome=exception_outcome)
+    async def _create_streamed_clips(self, source, num_clips=3, clip_duration=10):
+        """
+        Crear clips descargando solo los rangos del video que necesitan
+
+        Se lee el índice ``moov`` del MP4 con peticiones por rango, se eligen
+        los instantes de los clips y se descargan sus muestras (y las
+        cabeceras) en un archivo disperso del que ffmpeg corta los clips.
+
+        Args:
+            source: Mensaje o fuente con el documento del video
+            num_clips: Número de clips
+            clip_duration: Duración de cada clip en segundos
+
+        Si el video no es un MP4 con índice utilizable (otro contenedor, MP4
+        fragmentado...) se prueba con el proxy de medios.
+
+        Returns:
+            (rutas de los clips, clips creados) o None si no se pudo y hay
+            que descargar el video entero
+        """
+        file_info = self._get_file_info(source)
+        if not file_info:
+            return None
+
+        index = None
+        if file_info.get('mime_type') in STREAMABLE_MIME_TYPES:
+            try:
+                index = await load_mp4_index(
+                    lambda offset, length: self.messenger.download_range(source, offset, length),
+                    file_info['file_size']
+                )
+            except Mp4IndexError as e:
+                self.logger.info(f"Clips por rangos no disponibles: {e}")
+            except Exception as e:
+                self.logger.warning(f"Error leyendo el índice del video: {e}")
+        if index is None:
+            return await self._create_proxied_clips(source, num_clips, clip_duration)
+
+        starts = [
+            self.file_manager.calculate_random_start_time(index.duration, clip_duration)
+            for _ in range(num_clips)
+        ]
+        ranges = index.clip_ranges(starts, clip_duration)
+        sparse_path = os.path.join(self.config.temp_dir, f"stream_{source.chat_id}_{source.id}.mp4")
+        try:
+            fetched = await self.messenger.download_ranges(source, sparse_path, ranges)
+            if fetched is None:
+                return None
+            self.logger.info(
+                f"🎯 Clips por rangos: {fetched / (1024 * 1024):.1f}MB descargados "
+                f"de {index.file_size / (1024 * 1024):.1f}MB"
+            )
+            return await self.create_clips(sparse_path, clip_duration=clip_duration, starts=starts)
+        finally:
+            await self.file_manager.cleanup_files([sparse_path])
+
+    async def _create_proxied_clips(self, source, num_clips=3, clip_duration=10):
+        """
+        Crear clips con ffmpeg leyendo el video a través del proxy de medios
+
+        ffmpeg salta por el video con peticiones por rango, así que sirve
+        para cualquier contenedor que admita búsquedas.
+
+        Returns:
+            (rutas de los clips, clips creados) o None si el proxy no está
+            disponible o no se pudo leer el video
+        """
+        url = self.media_proxy.url_for(source) if self.media_proxy else None
+        if not url:
+            return None
+
+        duration = await self.file_manager.get_video_duration(url)
+        if not duration:
+            return None
+        starts = [
+            self.file_manager.calculate_random_start_time(duration, clip_duration)
+            for _ in range(num_clips)
+        ]
+        clip_base = os.path.join(self.config.temp_dir, f"stream_{source.chat_id}_{source.id}.mp4")
+        return await self.create_clips(url, clip_duration=clip_duration, starts=starts, clip_base=clip_base)
+
+    async def _check_clip_duplicates(self, file_path, chat_id, message_id):
+        """
+        Detectar casi-duplicados de un video descargado a partir de sus fotogramas clave
+
+        Returns:
+            False si el video es un duplicado descartado, True para continuar
+        """
+        hashes = await self._compute_video_hashes(file_path)
+        duplicate = self._find_duplicate(hashes)
+        if duplicate:
+            await self.messenger.send_notification_to_me(self._duplicate_text(duplicate, 'Video'))
+            if self._discard_duplicates():
+                await self.file_manager.cleanup_files([file_path])
+                await self.messenger.delete_message(message_id, chat_id)
+                return False
+        if self.hash_index and hashes:
+            self.hash_index.add(hashes, 'video', chat_id, message_id, file_path)
+        return True
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='preview')
+    @traced('preview')
+    async def _build_video_preview(self, message):
+        """
+        Crear la vista previa de un video largo sin descargarlo entero
+
+        Primero se intenta una hoja de contactos leyendo el video por el
+        proxy de medios (si está activo) o a partir de sus primeros MB; si no
+        es posible (índice al final del archivo, ffmpeg no disponible...) se
+        usa la miniatura que proporciona Telegram.
+
+        Returns:
+            Ruta de la imagen de vista previa o None
+        """
+        if not getattr(self.config, 'long_video_preview_enabled', False):
+            return None
+
+        temp_dir = self.config.temp_dir
+        base_name = f"preview_{message.chat_id}_{message.id}"
+        head_path = os.path.join(temp_dir, f"{base_name}.part")
+        sheet_path = os.path.join(temp_dir, f"{base_name}.jpg")
+
+        # Por el proxy ffmpeg puede saltar al índice aunque esté al final
+        url = self.media_proxy.url_for(message) if self.media_proxy else None
+        if url and await self.file_manager.create_contact_sheet(url, sheet_path, frames=self.config.preview_frames):
+            return sheet_path
 
+        head = await self.messenger.download_head(
+            message, head_path, self.config.preview_head_mb * 1024 * 1024
+        )
+        if head:
+            created = await self.file_manager.create_contact_sheet(
+                head, sheet_path, frames=self.config.preview_frames
+            )
+            await self.file_manager.cleanup_files([head])
+            if created:
+                return sheet_path
 
+        return await self.messenger.download_thumbnail(message, sheet_path)
+
+    async def send_trace_breakdown(self, trace):
+        """Enviar a chat_me el desglose de tiempos de un trabajo con descarga (completa o por rangos)"""
+        if not any(item.name in ('download_media_from_message', 'download_ranges') for item in trace.spans):
+            return
+        await self.messenger.send_notification_to_me(format_breakdown(trace), parse_mode='md')
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='hash', outcome=exception_outcome)
+    async def _compute_image_hashes(self, image_path):
+        """Calcular el hash perceptual de una imagen fuera del bucle de eventos"""
+        if not self.hash_index or not image_path:
+            return []
+        try:
+            return [await asyncio.to_thread(phash, image_path)]
+        except Exception as e:
+            self.logger.warning(f"No se pudo calcular el hash de {image_path}: {e}")
+            return []
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='hash', outcome=exception_outcome)
+    @traced('hash')
+    async def _compute_video_hashes(self, video_path):
+        """Calcular los hashes perceptuales de los fotogramas clave de un video"""
+        if not self.hash_index:
+            return []
+        frames = await self.file_manager.extract_keyframes(
+            video_path, getattr(self.config, 'temp_dir', 'temp')
+        )
+        hashes = []
+        for frame in frames:
+            hashes.extend(await self._compute_image_hashes(frame))
+        await self.file_manager.cleanup_files(frames)
+        return hashes
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='inference', outcome=exception_outcome)
+    async def _analyze_image(self, image_path, message, media_path=None):
+        """Analizar la imagen con el modelo local si está disponible"""
+        if not self.inference_service or not image_path:
+            return None
+        return await self.inference_service.analyze(image_path, message.chat_id, message.id, media_path)
+
+    def _detections_text(self, detections, limit=5):
+        """Resumir las detecciones más probables para el pie de la imagen"""
+        best = {}
+        for detection in detections:
+            label = detection['label']
+            best[label] = max(best.get(label, 0.0), detection['score'])
+        labels = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return "🔍 " + ", ".join(f"{label} ({score:.0%})" for label, score in labels)
+
+    def _find_duplicate(self, hashes):
+        """Buscar un elemento ya procesado que coincida con los hashes"""
+        if not self.hash_index or not hashes:
+            return None
+        return self.hash_index.find_duplicate(hashes)
+
+    def _discard_duplicates(self):
+        """Indica si los duplicados se descartan automáticamente"""
+        return getattr(self.config, 'duplicate_action', 'flag') == 'discard'
+
+    def _duplicate_text(self, duplicate, label):
+        """Texto de aviso para un casi-duplicado"""
+        media_hash, distance = duplicate
+        action = "descartado" if self._discard_duplicates() else "posible duplicado"
+        return (f"🔁 {label} {action} (distancia {distance}) "
+                f"de un elemento del {media_hash.created_at or 'pasado'}")
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='short_video', outcome=exception_outcome)
     async def _process_short_video(self, message):
         # Send video with buttons to the user's chat
         await self._replay_with_buttons(message)
@@ -279,6 +879,7 @@ class MediaForwardHandler:
         return False, f"Tipo {file_info['file_type']} - pendiente de definir"
 
 
+    @timed(STAGE_SECONDS, handler='media_forward', stage='download')
     async def _download_with_progress(self, message, file_info, reason):
         """
         Descarga un archivo con mensajes de progreso en tiempo real.
@@ -291,41 +892,17 @@ class MediaForwardHandler:
         Returns:
             str: Ruta del archivo descargado o None si falló
         """
-        # Enviar mensaje inicial de descarga
-        progress_message = await self.messenger.send_notification_to_me(
-            f"📥 Iniciando descarga...\n📊 Tamaño: {file_info['file_size'] / (1024*1024):.1f}MB\n📝 {reason}\n🔗 Origen: Mensaje {message.id} en chat {message.chat_id}", 
-            parse_mode='md'
-        )
-        
-        # Crear callback de progreso
-        async def progress_callback(current, total):
-            if total > 0:
-                percentage = (current / total) * 100
-                self.logger.debug(f"Progreso de descarga: {percentage:.1f}% ({current}/{total} bytes)")
-                if self._send_notif_process(percentage):
-                    self.logger.info(f"Progreso de descarga: {percentage:.1f}% ({current}/{total} bytes)")
-                    try:
-                        await self.messenger.edit_message(
-                            progress_message.id,
-                            f"📥 Descargando...\n📊 Progreso: {percentage:.1f}%\n📏 {current/(1024*1024):.1f}MB / {total/(1024*1024):.1f}MB\n📝 {reason}\n🔗 Origen: Mensaje {message.id} en chat {message.chat_id}",
-                            chat_id=self.config.chat_me,
-                            parse_mode='md'
-                        )
-                        
-                    except Exception as e:
-                        # Silenciar errores de edición de mensaje (pueden ocurrir por límites de tiempo o permisos)
-                        self.logger.debug(f"No se pudo actualizar progreso: {e}")
-                        pass
-        
-        # Descargar el archivo con callback de progreso
-        self.logger.info(f"Descargando archivo: {reason}")
-        self.logger.info(f"info del archivo: {file_info}")
-        file_name = file_info.get('file_name') if file_info else None
-        downloaded_path = await self.messenger.download_media_from_message(
-            message, 
-            progress_callback=progress_callback,
-            file_name=file_name
-        )
+        # Enviar mensaje inicial de descarga con el botón para cancelarla
+        with self.jobs.cancellable() as cancel_key:
+            cancel_buttons = self._cancel_buttons(cancel_key)
+            progress_message = await self.messenger.send_notification_to_me(
+                f"📥 Iniciando descarga...\n📊 Tamaño: {file_info['file_size'] / (1024*1024):.1f}MB\n📝 {reason}\n🔗 Origen: Mensaje {message.id} en chat {message.chat_id}", 
+                parse_mode='md',
+                buttons=cancel_buttons
+            )
+            downloaded_path = await self._download_cancellable(
+                message, file_info, reason, progress_message, cancel_buttons
+            )
         
         if not downloaded_path:
             # Actualizar mensaje de error
@@ -361,7 +938,60 @@ class MediaForwardHandler:
             pass
 
         return downloaded_path
+
+    async def _download_cancellable(self, message, file_info, reason, progress_message, cancel_buttons):
+        """
+        Descargar el archivo actualizando el progreso con el botón de cancelar
+
+        Si el usuario cancela, la descarga se detiene, su archivo parcial se
+        borra y el mensaje de progreso lo indica.
+
+        Returns:
+            str: Ruta del archivo descargado o None si falló
+        """
+        # Crear callback de progreso
+        async def progress_callback(current, total):
+            if total > 0:
+                percentage = (current / total) * 100
+                self.logger.debug("Progreso de descarga: %.1f%% (%d/%d bytes)", percentage, current, total)
+                if self._send_notif_process(percentage):
+                    self.logger.info("Progreso de descarga: %.1f%% (%d/%d bytes)", percentage, current, total)
+                    try:
+                        await self.messenger.edit_message(
+                            progress_message.id,
+                            f"📥 Descargando...\n📊 Progreso: {percentage:.1f}%\n📏 {current/(1024*1024):.1f}MB / {total/(1024*1024):.1f}MB\n📝 {reason}\n🔗 Origen: Mensaje {message.id} en chat {message.chat_id}",
+                            chat_id=self.config.chat_me,
+                            parse_mode='md',
+                            buttons=cancel_buttons
+                        )
+                        
+                    except Exception as e:
+                        # Silenciar errores de edición de mensaje (pueden ocurrir por límites de tiempo o permisos)
+                        self.logger.debug(f"No se pudo actualizar progreso: {e}")
+                        pass
+        
+        # Descargar el archivo con callback de progreso
+        self.logger.info(f"Descargando archivo: {reason}")
+        self.logger.info(f"info del archivo: {file_info}")
+        file_name = file_info.get('file_name') if file_info else None
+        try:
+            return await self.messenger.download_media_from_message(
+                message, 
+                progress_callback=progress_callback,
+                file_name=file_name
+            )
+        except asyncio.CancelledError as e:
+            if cancelled_by_user(e) and progress_message:
+                await self.messenger.edit_message(
+                    progress_message.id,
+                    f"🛑 Descarga cancelada\n📝 {reason}\n🔗 Origen: Mensaje {message.id} en chat {message.chat_id}",
+                    chat_id=self.config.chat_me,
+                    parse_mode='md'
+                )
+            raise
     
+    @timed(STAGE_SECONDS, handler='media_forward', stage='upload')
+    @traced('upload')
     async def _replay_with_buttons(self, message, caption=None):
         # Send video with buttons to the user's chat
         buttons = [
@@ -375,15 +1005,42 @@ class MediaForwardHandler:
             ]
         ]
 
-        sent_message = await self.client.send_file(
-            self.config.chat_me, 
-            file=message.media, 
-            caption=caption,
-            buttons=buttons
-        )
+        async with self.messenger.api_limiter.slot():
+            sent_message = await self.client.send_file(
+                self.messenger.resolve_chat(self.config.chat_me),
+                file=message.media, 
+                caption=caption,
+                buttons=buttons
+            )
         
         return sent_message
     
+    @timed(STAGE_SECONDS, handler='media_forward', stage='upload')
+    @traced('upload')
+    async def _replay_photo_with_buttons(self, message, caption=None):
+        # Send photo with buttons; the full resolution is only downloaded on demand
+        buttons = [
+            [
+                Button.inline("Enviar al chat destino", b"send_to_target"),
+                Button.inline("Descartar", b"discard")
+            ],
+            [
+                Button.inline("Descargar original", b"download_original")
+            ]
+        ]
+
+        async with self.messenger.api_limiter.slot():
+            sent_message = await self.client.send_file(
+                self.messenger.resolve_chat(self.config.chat_me),
+                file=message.media, 
+                caption=caption,
+                buttons=buttons
+            )
+        
+        return sent_message
+    
+    @timed(STAGE_SECONDS, handler='media_forward', stage='upload')
+    @traced('upload')
     async def _replay_long_video_with_buttons(self, message, caption=None):
         # Send long video with additional button for creating new clips
         buttons = [
@@ -397,15 +1054,62 @@ class MediaForwardHandler:
             ]
         ]
 
-        sent_message = await self.client.send_file(
-            self.config.chat_me, 
-            file=message.media, 
-            caption=caption,
-            buttons=buttons
-        )
+        async with self.messenger.api_limiter.slot():
+            sent_message = await self.client.send_file(
+                self.messenger.resolve_chat(self.config.chat_me),
+                file=message.media, 
+                caption=caption,
+                buttons=buttons
+            )
         
         return sent_message
     
+    @timed(STAGE_SECONDS, handler='media_forward', stage='upload')
+    @traced('upload')
+    async def _replay_preview_with_buttons(self, preview_path, caption=None):
+        # Send the preview image of a long video; nothing is downloaded until a button is used
+        buttons = [
+            [
+                Button.inline("Enviar al chat destino", b"send_to_target"),
+                Button.inline("Descartar", b"discard")
+            ],
+            [
+                Button.inline("Descargar y crear clips", b"download_and_create_clips")
+            ]
+        ]
+
+        async with self.messenger.api_limiter.slot():
+            sent_message = await self.client.send_file(
+                self.messenger.resolve_chat(self.config.chat_me),
+                file=preview_path,
+                caption=caption,
+                buttons=buttons
+            )
+        
+        return sent_message
+    
+    def _cancel_buttons(self, cancel_key):
+        """Botón para cancelar un trabajo en curso desde su mensaje de progreso"""
+        return [[Button.inline("❌ Cancelar", f"{CANCEL_PREFIX}{cancel_key}".encode())]]
+
+    def _album_buttons(self, has_photos=False):
+        """Botones compartidos por todos los elementos de un álbum."""
+        buttons = [
+            [
+                Button.inline("Enviar al chat destino", b"album_send_to_target"),
+                Button.inline("Descartar", b"album_discard")
+            ],
+            [
+                Button.inline("Borrar archivos", b"album_delete_files")
+            ]
+        ]
+        if has_photos:
+            # Las fotos del álbum solo se descargan a tamaño completo si se piden
+            buttons[1].append(Button.inline("Descargar originales", b"album_download_originals"))
+        return buttons
+
+    @timed(STAGE_SECONDS, handler='media_forward', stage='upload')
+    @traced('upload')
     async def _replay_sticker_with_buttons(self, message, file_path):
         """Send sticker with buttons to the user's chat."""
         buttons = [
@@ -418,100 +1122,129 @@ class MediaForwardHandler:
             ]
         ]
 
-        sent_message = await self.client.send_file(
-            self.config.chat_me, 
-            file=file_path,
-            caption="🎭 Sticker recibido",
-            buttons=buttons
-        )
+        async with self.messenger.api_limiter.slot():
+            sent_message = await self.client.send_file(
+                self.messenger.resolve_chat(self.config.chat_me),
+                file=file_path,
+                caption="🎭 Sticker recibido",
+                buttons=buttons
+            )
         
         return sent_message
     
-    async def create_clips(self, downloaded_path,num_clips=3, clip_duration=10):
+    @timed(STAGE_SECONDS, handler='media_forward', stage='clips', outcome=exception_outcome)
+    @traced('create_clips')
+    async def create_clips(self, downloaded_path,num_clips=3, clip_duration=10, starts=None, clip_base=None):
+        # starts: instantes de inicio fijos (archivo disperso); si no, aleatorios
+        # clip_base: ruta de la que se derivan los nombres de los clips (por defecto la del video)
+        if starts is not None:
+            num_clips = len(starts)
         lClip_path = []
         clips_creados = 0
+        clip_path = None
         
-
-
-        for i in range(num_clips):
-            self.logger.info(f"Creando clip {i+1}/{num_clips} de {clip_duration} segundos...")
-            # Enviar mensaje de progreso
-            progress_message = await self.client.send_message(
-                self.config.chat_me, 
-                f"Creando clip {i+1}/{num_clips}..."
-            )            
-            # Crear nombre único para el clip
-            base_name = os.path.splitext(downloaded_path)[0]  # Nombre sin extensión
-            extension = os.path.splitext(downloaded_path)[1]   # Extensión con punto
-            clip_path = f"{base_name}_clip_{i:02d}{extension}"
-            success, result = await self.file_manager.create_random_video_clip(
-                input_path=downloaded_path,
-                output_path=clip_path,
-                clip_duration=clip_duration
-            )
-            
-            if success:
-                lClip_path.append(result)
-                clips_creados += 1
-                self.logger.info(f"Clip {i+1}/3 creado exitosamente: {result}")
-
-                # Enviar el clip como respuesta al mensaje de progreso
-                try:
-                    buttons = [
-                        [
-                            Button.inline("Enviar al chat destino", b"send_to_target"),
-                            Button.inline("Descartar", b"discard")
-                        ]
-                    ]
-
-                    sent_message = await self.client.send_file(
-                        self.config.chat_me,
-                        file=result,
-                        reply_to=progress_message.id,
-                        caption="🎬 Clip generado automáticamente",
-                        parse_mode='markdown',
-                        buttons=buttons
-                    )
-                    
-                    # Editar el mensaje de progreso para confirmar
-                    await self.client.edit_message(
-                        progress_message.chat_id,
-                        progress_message.id,
-                        text=f"✅ Clip {i+1}/{num_clips} creado y enviado."
+        # Si el usuario cancela, se matan ffmpeg y la subida en curso y se borran los clips
+        with self.jobs.cancellable() as cancel_key:
+            try:
+                for i in range(num_clips):
+                    self.logger.info(f"Creando clip {i+1}/{num_clips} de {clip_duration} segundos...")
+                    # Enviar mensaje de progreso
+                    progress_message = await self.messenger.send_text_message(
+                        f"Creando clip {i+1}/{num_clips}...",
+                        chat_id=self.config.chat_me,
+                        buttons=self._cancel_buttons(cancel_key)
                     )
+                    if not progress_message:
+                        self.logger.error(f"Error enviando el progreso del clip {i+1}/{num_clips}")
+                        continue
+                    # Crear nombre único para el clip
+                    base_name = os.path.splitext(clip_base or downloaded_path)[0]  # Nombre sin extensión
+                    extension = os.path.splitext(clip_base or downloaded_path)[1]   # Extensión con punto
+                    clip_path = f"{base_name}_clip_{i:02d}{extension}"
+                    if starts is not None:
+                        success, result = await self.file_manager.create_video_clip(
+                            input_path=downloaded_path,
+                            output_path=clip_path,
+                            start_offset=starts[i],
+                            clip_duration=clip_duration
+                        )
+                    else:
+                        success, result = await self.file_manager.create_random_video_clip(
+                            input_path=downloaded_path,
+                            output_path=clip_path,
+                            clip_duration=clip_duration
+                        )
                     
-                    # Save message with file path to database
-                    message_obj = Message(
-                        message_id=sent_message.id,
-                        chat_id=sent_message.chat_id,
-                        user_id=self.config.chat_me,
-                        message_type='document',
-                        media_info={'file_path': result},
-                        created_at=sent_message.date
-                    )
-                    self.db_manager.save_message(message_obj)
+                    if success:
+                        lClip_path.append(result)
+                        clips_creados += 1
+                        self.logger.info(f"Clip {i+1}/3 creado exitosamente: {result}")
 
-                    ## borrar mensaje de progreso después de enviar el clip
-                    try:
-                        await self.messenger.delete_message(progress_message.id, progress_message.chat_id)
-                    except Exception as e:
-                        self.logger.error(f"Error borrando mensaje de progreso para clip {i+1}/3: {e}")
+                        # Enviar el clip como respuesta al mensaje de progreso
+                        try:
+                            buttons = [
+                                [
+                                    Button.inline("Enviar al chat destino", b"send_to_target"),
+                                    Button.inline("Descartar", b"discard")
+                                ]
+                            ]
 
-                    self.logger.info(f"Clip {i+1}/3 enviado exitosamente a chat_me")
-                except Exception as e:
-                    self.logger.error(f"Error enviando clip {i+1}/3 a chat_me: {e}")
-                    # Editar mensaje de progreso en caso de error
-                    try:
-                        await self.client.edit_message(
-                            progress_message.chat_id,
-                            progress_message.id,
-                            text=f"❌ Error enviando clip {i+1}/{num_clips}."
-                        )
-                    except:
-                        pass    
+                            with span('upload', bytes=os.path.getsize(result)):
+                                async with self.messenger.api_limiter.slot():
+                                    sent_message = await self.client.send_file(
+                                        self.messenger.resolve_chat(self.config.chat_me),
+                                        file=result,
+                                        reply_to=progress_message.id,
+                                        caption="🎬 Clip generado automáticamente",
+                                        parse_mode='markdown',
+                                        buttons=buttons
+                                    )
+                            
+                            # Editar el mensaje de progreso para confirmar
+                            await self.messenger.edit_message(
+                                progress_message.id,
+                                f"✅ Clip {i+1}/{num_clips} creado y enviado.",
+                                chat_id=progress_message.chat_id
+                            )
+                            
+                            # Save message with file path to database
+                            message_obj = Message(
+                                message_id=sent_message.id,
+                                chat_id=sent_message.chat_id,
+                                user_id=self.config.chat_me,
+                                message_type='document',
+                                media_info={'file_path': result},
+                                created_at=sent_message.date
+                            )
+                            self.db_manager.save_message(message_obj)
 
-            else:
-                self.logger.error(f"Error creando clip {i+1}/3: {result}")
+                            ## borrar mensaje de progreso después de enviar el clip
+                            try:
+                                await self.messenger.delete_message(progress_message.id, progress_message.chat_id)
+                            except Exception as e:
+                                self.logger.error(f"Error borrando mensaje de progreso para clip {i+1}/3: {e}")
+
+                            self.logger.info(f"Clip {i+1}/3 enviado exitosamente a chat_me")
+                        except Exception as e:
+                            self.logger.error(f"Error enviando clip {i+1}/3 a chat_me: {e}")
+                            # Editar mensaje de progreso en caso de error
+                            await self.messenger.edit_message(
+                                progress_message.id,
+                                f"❌ Error enviando clip {i+1}/{num_clips}.",
+                                chat_id=progress_message.chat_id
+                            )
+
+                    else:
+                        self.logger.error(f"Error creando clip {i+1}/3: {result}")
+            except asyncio.CancelledError as e:
+                if cancelled_by_user(e):
+                    # ffmpeg ya se ha matado: borrar el clip a medias y los ya creados
+                    partial = [clip_path] if clip_path and clip_path not in lClip_path else []
+                    await self.file_manager.cleanup_files(lClip_path + partial)
+                    await self.messenger.send_notification_to_me(
+                        f"🛑 Creación de clips cancelada ({clips_creados}/{num_clips} enviados)"
+                    )
+                raise
         return lClip_path, clips_creados
     
 
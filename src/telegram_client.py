@@ -4,17 +4,65 @@ Cliente de Telegram para envío de mensajes y contenido multimedia
 
 import os
 import asyncio
-from typing import List, Optional, Union, Any, Dict
+import functools
+import inspect
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union, Any, Dict
 from pathlib import Path
 from telethon import TelegramClient
 from telethon.errors import FloodWaitError, MessageNotModifiedError
 from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto
 from src.config import setup_logger
+from src.utils.chunk_cache import ChunkCache
+from src.utils.entity_cache import EntityCache
+from src.utils.job_tracker import cancelled_by_user
+from src.utils.media_cache import PART_SUFFIX
+from src.utils.media_reference import document_from_dict
+from src.utils.download_admission import DownloadAdmissionController, InsufficientSpaceError, Reservation
+from src.utils.photo_sizes import photo_size_bytes, select_photo_size
+from src.utils.metrics import BYTES_DOWNLOADED, TELEGRAM_API_SECONDS, timed
+from src.utils.priority import PriorityLimiter
+from src.utils.tracing import add_to_span, traced
+
+
+# Número máximo de entradas en la caché mensaje -> chat
+MESSAGE_CHAT_CACHE_SIZE = 2048
+
+# Directorio de descargas si la configuración no indica ninguno (volumen montado en el contenedor)
+DEFAULT_DOWNLOAD_DIR = '/app/downloads'
+# Tamaño de cada petición en las descargas reanudables (divide 1MB y es múltiplo de 4KB)
+DOWNLOAD_REQUEST_SIZE = 512 * 1024
+# Bloques del comienzo y del final (cabeceras e índice) que una descarga completa guarda en la caché
+CACHED_EDGE_BLOCKS = 4
+
+
+def _api_slot(func):
+    """Ocupar un hueco de la API en el carril de prioridad actual durante la llamada"""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        async with self.api_limiter.slot():
+            return await func(self, *args, **kwargs)
+    return wrapper
 
 
 class TelegramMessenger:
     """Clase para gestionar el envío de mensajes y contenido multimedia en Telegram"""
     
+    # Caché compartida entre instancias: ID de mensaje -> ID de chat
+    _message_chat_cache: "OrderedDict[int, int]" = OrderedDict()
+    
+    # Caché de entidades compartida entre instancias (se crea con la primera)
+    _entity_cache: Optional[EntityCache] = None
+    
+    # Control de admisión de descargas compartido entre instancias
+    _admission_controller: Optional[DownloadAdmissionController] = None
+    
+    # Huecos de llamadas a la API repartidos por carril de prioridad
+    _api_limiter: Optional[PriorityLimiter] = None
+    
+    # Caché en disco de bloques de documentos compartida (None = desactivada)
+    _chunk_cache: Optional[ChunkCache] = None
+    
     def __init__(self, client: TelegramClient, config):
         """
         Inicializar el cliente de mensajería
@@ -27,18 +75,51 @@ class TelegramMessenger:
         self.config = config
         self.logger = setup_logger('telegram_messenger')
         
+        if TelegramMessenger._entity_cache is None:
+            data_dir = getattr(config, 'data_dir', 'data')
+            TelegramMessenger._entity_cache = EntityCache(client, Path(data_dir) / 'entity_cache.json')
+        
+        if TelegramMessenger._admission_controller is None:
+            mb = 1024 * 1024
+            TelegramMessenger._admission_controller = DownloadAdmissionController(
+                self.download_dir,
+                budget_bytes=getattr(config, 'downloads_budget_mb', 0) * mb,
+                min_free_bytes=getattr(config, 'downloads_min_free_mb', 512) * mb,
+                wait_timeout=getattr(config, 'download_admission_timeout', 600),
+                evict_min_age=getattr(config, 'downloads_evict_min_age_hours', 24) * 3600
+            )
+        
+        if TelegramMessenger._api_limiter is None:
+            TelegramMessenger._api_limiter = PriorityLimiter(
+                'telegram_api',
+                slots=getattr(config, 'api_concurrency', 4),
+                shares=getattr(config, 'lane_shares', None)
+            )
+        
+        cache_mb = getattr(config, 'chunk_cache_mb', 0)
+        if TelegramMessenger._chunk_cache is None and cache_mb > 0:
+            TelegramMessenger._chunk_cache = ChunkCache(
+                Path(getattr(config, 'temp_dir', 'temp')) / 'chunk_cache.bin',
+                max_bytes=cache_mb * 1024 * 1024,
+                chunk_size=DOWNLOAD_REQUEST_SIZE
+            )
+        
         # Verificar configuración de chats
         if not config.chat_me:
             self.logger.warning("CHAT_ME no configurado - algunas funciones pueden no funcionar")
         if not config.chat_target:
             self.logger.warning("CHAT_TARGET no configurado - algunas funciones pueden no funcionar")
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_text_message(
         self, 
         text: str, 
         chat_id: Optional[int] = None,
         parse_mode: str = 'md',
-        reply_to: Optional[int] = None
+        reply_to: Optional[int] = None,
+        buttons: Optional[Any] = None
     ) -> Optional[Any]:
         """
         Enviar mensaje de texto
@@ -48,6 +129,7 @@ class TelegramMessenger:
             chat_id: ID del chat (usa chat_target por defecto)
             parse_mode: Modo de parseo ('md', 'html', None)
             reply_to: ID del mensaje al que responder
+            buttons: Botones inline opcionales
             
         Returns:
             Mensaje enviado o None si falló
@@ -59,10 +141,11 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_message(
-                target_chat,
+                self.resolve_chat(target_chat),
                 text,
                 parse_mode=parse_mode,
-                reply_to=reply_to
+                reply_to=reply_to,
+                buttons=buttons
             )
             
             self.logger.info(f"✅ Mensaje de texto enviado a {target_chat}")
@@ -70,18 +153,104 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
-            return await self.send_text_message(text, chat_id, parse_mode, reply_to)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
+            return await self.send_text_message(text, chat_id, parse_mode, reply_to, buttons)
         except Exception as e:
             self.logger.error(f"❌ Error enviando mensaje de texto: {e}")
             return None
     
+    async def _sleep_flood_wait(self, seconds: int) -> None:
+        """Esperar un FloodWait sin ocupar el hueco de la API (se recupera para el reintento)"""
+        async with self.api_limiter.released():
+            await asyncio.sleep(seconds)
+    
+    @property
+    def api_limiter(self) -> PriorityLimiter:
+        """Limitador de llamadas a la API compartido"""
+        return TelegramMessenger._api_limiter
+    
+    @property
+    def download_dir(self) -> Path:
+        """Directorio de descargas por defecto (DOWNLOADS_DIR)"""
+        return Path(getattr(self.config, 'downloads_dir', None) or DEFAULT_DOWNLOAD_DIR)
+    
+    @property
+    def admission_controller(self) -> DownloadAdmissionController:
+        """Control de admisión de descargas compartido"""
+        return TelegramMessenger._admission_controller
+    
+    @property
+    def entity_cache(self) -> EntityCache:
+        """Caché de entidades compartida"""
+        return TelegramMessenger._entity_cache
+    
+    @property
+    def chunk_cache(self) -> Optional[ChunkCache]:
+        """Caché de bloques de documentos compartida (None si está desactivada)"""
+        return TelegramMessenger._chunk_cache
+    
+    def resolve_chat(self, chat_id):
+        """
+        Obtener la entidad de entrada cacheada de un chat
+        
+        Args:
+            chat_id: ID del chat
+            
+        Returns:
+            InputPeer cacheada o el propio ID si no está en la caché
+        """
+        return self.entity_cache.resolve(chat_id)
+    
+    async def prefetch_entities(self) -> None:
+        """Precargar las entidades de CHAT_ME y CHAT_TARGET y el usuario del bot"""
+        await self.entity_cache.prefetch([self.config.chat_me, self.config.chat_target])
+        await self.entity_cache.get_me()
+    
+    async def get_me(self) -> Any:
+        """Obtener el usuario del bot (memorizado tras la primera llamada)"""
+        return await self.entity_cache.get_me()
+    
+    def remember_message_chat(self, message_id: int, chat_id: int) -> None:
+        """
+        Registrar en la caché el chat al que pertenece un mensaje
+        
+        Args:
+            message_id: ID del mensaje
+            chat_id: ID del chat del mensaje
+        """
+        if message_id is None or chat_id is None:
+            return
+        cache = TelegramMessenger._message_chat_cache
+        cache[message_id] = chat_id
+        cache.move_to_end(message_id)
+        while len(cache) > MESSAGE_CHAT_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    def remember_event(self, event: Any) -> None:
+        """Registrar en la caché el mensaje de un evento entrante"""
+        message = getattr(event, 'message', None)
+        if message is not None:
+            self.remember_message_chat(message.id, getattr(event, 'chat_id', None))
+    
+    def get_cached_chat(self, message_id: int) -> Optional[int]:
+        """Obtener el chat de un mensaje desde la caché, sin llamadas a la API"""
+        cache = TelegramMessenger._message_chat_cache
+        chat_id = cache.get(message_id)
+        if chat_id is not None:
+            cache.move_to_end(message_id)
+        return chat_id
+    
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def reply_to_message(
         self,
         text: str,
         original_message_id: int,
         chat_id: Optional[int] = None,
-        parse_mode: str = 'md'
+        parse_mode: str = 'md',
+        event: Optional[Any] = None
     ) -> Optional[Any]:
         """
         Responder a un mensaje específico
@@ -91,11 +260,21 @@ class TelegramMessenger:
             original_message_id: ID del mensaje al que responder
             chat_id: ID del chat específico (si no se especifica, usa el chat del mensaje original)
             parse_mode: Modo de parseo ('md', 'html', None)
+            event: Evento de origen; su chat se usa directamente sin buscar el mensaje
             
         Returns:
             Mensaje enviado o None si falló
         """
         try:
+            # El evento de origen ya indica el chat del mensaje
+            if chat_id is None and event is not None:
+                chat_id = getattr(event, 'chat_id', None)
+                self.remember_event(event)
+            
+            # Consultar la caché antes de recurrir a la API
+            if chat_id is None:
+                chat_id = self.get_cached_chat(original_message_id)
+            
             # Si no se especifica chat_id, buscar el chat del mensaje original
             if chat_id is None:
                 # Buscar el mensaje original para obtener su chat
@@ -135,7 +314,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_message(
-                target_chat,
+                self.resolve_chat(target_chat),
                 text,
                 parse_mode=parse_mode,
                 reply_to=original_message_id
@@ -146,19 +325,24 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
-            return await self.reply_to_message(text, original_message_id, chat_id, parse_mode)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
+            return await self.reply_to_message(text, original_message_id, target_chat, parse_mode)
         except Exception as e:
             self.logger.error(f"❌ Error enviando respuesta: {e}")
             await self.send_notification_to_me(text, parse_mode=parse_mode)
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def edit_message(
         self,
         message_id: int,
         new_text: str,
         chat_id: Optional[int] = None,
-        parse_mode: str = 'md'
+        parse_mode: str = 'md',
+        buttons: Optional[Any] = None
     ) -> bool:
         """
         Editar un mensaje existente
@@ -168,6 +352,7 @@ class TelegramMessenger:
             new_text: Nuevo texto
             chat_id: ID del chat (usa chat_target por defecto)
             parse_mode: Modo de parseo
+            buttons: Botones inline (sin ellos, Telegram quita los que hubiera)
             
         Returns:
             True si se editó correctamente
@@ -179,13 +364,14 @@ class TelegramMessenger:
                 return False
             
             await self.client.edit_message(
-                target_chat,
+                self.resolve_chat(target_chat),
                 message_id,
                 new_text,
-                parse_mode=parse_mode
+                parse_mode=parse_mode,
+                buttons=buttons
             )
             
-            self.logger.debug(f"✅ Mensaje {message_id} editado en {target_chat}")
+            self.logger.debug("✅ Mensaje %s editado en %s", message_id, target_chat)
             return True
             
         except MessageNotModifiedError:
@@ -193,12 +379,16 @@ class TelegramMessenger:
             return True
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
-            return await self.edit_message(message_id, new_text, chat_id, parse_mode)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
+            return await self.edit_message(message_id, new_text, chat_id, parse_mode, buttons)
         except Exception as e:
             self.logger.error(f"❌ Error editando mensaje: {e}")
             return False
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_photo(
         self,
         photo_path: Union[str, Path],
@@ -231,7 +421,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 photo_path,
                 caption=caption,
                 parse_mode=parse_mode,
@@ -243,12 +433,16 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_photo(photo_path, caption, chat_id, parse_mode, reply_to)
         except Exception as e:
             self.logger.error(f"❌ Error enviando imagen: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_video(
         self,
         video_path: Union[str, Path],
@@ -289,7 +483,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 video_path,
                 caption=caption,
                 parse_mode=parse_mode,
@@ -301,12 +495,16 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_video(video_path, caption, chat_id, parse_mode, reply_to, duration, width, height, supports_streaming)
         except Exception as e:
             self.logger.error(f"❌ Error enviando video: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_animation(
         self,
         animation_path: Union[str, Path],
@@ -339,7 +537,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 animation_path,
                 caption=caption,
                 parse_mode=parse_mode,
@@ -351,12 +549,16 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_animation(animation_path, caption, chat_id, parse_mode, reply_to)
         except Exception as e:
             self.logger.error(f"❌ Error enviando animación: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_sticker(
         self,
         sticker_path: Union[str, Path],
@@ -385,7 +587,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 sticker_path,
                 reply_to=reply_to
             )
@@ -395,12 +597,16 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_sticker(sticker_path, chat_id, reply_to)
         except Exception as e:
             self.logger.error(f"❌ Error enviando sticker: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_document(
         self,
         document_path: Union[str, Path],
@@ -435,7 +641,7 @@ class TelegramMessenger:
                 return None
             
             message = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 document_path,
                 caption=caption,
                 parse_mode=parse_mode,
@@ -448,12 +654,16 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_document(document_path, caption, chat_id, parse_mode, reply_to, force_document)
         except Exception as e:
             self.logger.error(f"❌ Error enviando documento: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_album(
         self,
         file_paths: List[Union[str, Path]],
@@ -466,7 +676,7 @@ class TelegramMessenger:
         Enviar álbum de multimedia (hasta 10 archivos)
         
         Args:
-            file_paths: Lista de rutas a los archivos
+            file_paths: Lista de rutas a los archivos u objetos media de Telegram
             caption: Texto del mensaje (solo en el primer archivo)
             chat_id: ID del chat
             parse_mode: Modo de parseo
@@ -492,7 +702,8 @@ class TelegramMessenger:
             # Verificar que todos los archivos existen
             valid_files = []
             for file_path in file_paths:
-                if os.path.exists(file_path):
+                # Los objetos media de Telegram se reenvían sin volver a subirlos
+                if not isinstance(file_path, (str, Path)) or os.path.exists(file_path):
                     valid_files.append(file_path)
                 else:
                     self.logger.warning(f"⚠️ Archivo no encontrado: {file_path}")
@@ -503,7 +714,7 @@ class TelegramMessenger:
             
             # Enviar álbum
             messages = await self.client.send_file(
-                target_chat,
+                self.resolve_chat(target_chat),
                 valid_files,
                 caption=caption,
                 parse_mode=parse_mode,
@@ -515,16 +726,21 @@ class TelegramMessenger:
             
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
             return await self.send_album(file_paths, caption, chat_id, parse_mode, reply_to)
         except Exception as e:
             self.logger.error(f"❌ Error enviando álbum: {e}")
             return None
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def send_notification_to_me(
         self,
         message: str,
-        parse_mode: str = 'md'
+        parse_mode: str = 'md',
+        buttons: Optional[Any] = None
     ) -> Optional[Any]:
         """
         Enviar notificación al chat personal (CHAT_ME)
@@ -532,6 +748,7 @@ class TelegramMessenger:
         Args:
             message: Mensaje de notificación
             parse_mode: Modo de parseo
+            buttons: Botones inline opcionales
             
         Returns:
             Mensaje enviado o None si falló
@@ -544,7 +761,8 @@ class TelegramMessenger:
             mensaje = await self.send_text_message(
                 message,
                 chat_id=self.config.chat_me,
-                parse_mode=parse_mode
+                parse_mode=parse_mode,
+                buttons=buttons
             )
             self.logger.info(f"Mensaje de notificación enviado a CHAT_ME: {mensaje.id}")
             
@@ -554,6 +772,59 @@ class TelegramMessenger:
         
         return mensaje
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def get_message(self, chat_id: int, message_id: int) -> Optional[Any]:
+        """
+        Volver a obtener un mensaje de Telegram
+        
+        Las referencias de archivo (``file_reference``) caducan al cabo de unas
+        horas: el mensaje recién obtenido trae unas vigentes.
+        
+        Args:
+            chat_id: ID del chat
+            message_id: ID del mensaje
+            
+        Returns:
+            El mensaje o None si ya no existe o falló
+        """
+        try:
+            return await self.client.get_messages(self.resolve_chat(chat_id), ids=message_id)
+        except FloodWaitError as e:
+            self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
+            await self._sleep_flood_wait(e.seconds)
+            return await self.get_message(chat_id, message_id)
+        except Exception as e:
+            self.logger.error(f"❌ Error obteniendo el mensaje {message_id} de {chat_id}: {e}")
+            return None
+    
+    async def refresh_media(
+        self,
+        source: Optional[Dict[str, int]],
+        document: Optional[Dict[str, Any]] = None
+    ) -> Optional[Any]:
+        """
+        Obtener el documento de un mensaje guardado con su referencia de archivo vigente
+        
+        Args:
+            source: {'chat_id', 'message_id'} de un mensaje que conserva el documento
+            document: Referencia serializada (``document_to_dict``) que se usa si
+                el mensaje ya no existe; su ``file_reference`` puede haber caducado
+            
+        Returns:
+            Multimedia del mensaje o None si no hay forma de obtenerla
+        """
+        if source:
+            message = await self.get_message(source['chat_id'], source['message_id'])
+            if message and message.media:
+                return message.media
+            self.logger.warning(f"⚠️ El mensaje {source['message_id']} con el documento ya no está disponible")
+        return document_from_dict(document) if document else None
+    
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def delete_message(
         self,
         message_id: int,
@@ -575,7 +846,7 @@ class TelegramMessenger:
                 self.logger.error("No hay chat objetivo configurado")
                 return False
             
-            await self.client.delete_messages(target_chat, message_id)
+            await self.client.delete_messages(self.resolve_chat(target_chat), message_id)
             
             self.logger.info(f"🗑️ Mensaje {message_id} eliminado de {target_chat}")
             return True
@@ -584,6 +855,44 @@ class TelegramMessenger:
             self.logger.error(f"❌ Error eliminando mensaje: {e}")
             return False
     
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def delete_messages(
+        self,
+        message_ids: List[int],
+        chat_id: Optional[int] = None
+    ) -> bool:
+        """
+        Eliminar varios mensajes con una sola llamada a la API
+        
+        Args:
+            message_ids: IDs de los mensajes a eliminar
+            chat_id: ID del chat (usa chat_target por defecto)
+            
+        Returns:
+            True si se eliminaron correctamente
+        """
+        try:
+            target_chat = chat_id or self.config.chat_target
+            if not target_chat:
+                self.logger.error("No hay chat objetivo configurado")
+                return False
+            
+            if not message_ids:
+                return True
+            
+            await self.client.delete_messages(self.resolve_chat(target_chat), list(message_ids))
+            
+            self.logger.info(f"🗑️ {len(message_ids)} mensajes eliminados de {target_chat}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error eliminando mensajes: {e}")
+            return False
+    
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
     async def download_media_from_message(
         self,
         message: Any,
@@ -596,7 +905,7 @@ class TelegramMessenger:
         
         Args:
             message: Mensaje de Telegram que contiene multimedia
-            download_dir: Directorio donde descargar (usa /app/downloads por defecto)
+            download_dir: Directorio donde descargar (usa DOWNLOADS_DIR por defecto)
             progress_callback: Función opcional para reportar progreso
             file_name: Nombre personalizado para el archivo (opcional)
             
@@ -609,7 +918,7 @@ class TelegramMessenger:
                 return None
             
             # Determinar directorio de descarga
-            target_dir = Path(download_dir) if download_dir else Path('/app/downloads')
+            target_dir = Path(download_dir) if download_dir else self.download_dir
             target_dir.mkdir(parents=True, exist_ok=True)
             
             # Generar nombre único para el archivo
@@ -632,24 +941,63 @@ class TelegramMessenger:
                         break
                     counter += 1
             else:
-                # Generar nombre automático
-                timestamp = asyncio.get_event_loop().time()
-                base_name = f"media_{message.id}_{int(timestamp)}"
+                # Generar nombre automático. Los documentos usan su ID para que el
+                # .part de una descarga interrumpida se encuentre al reintentarla
+                document = getattr(message.media, 'document', None)
+                if document is not None:
+                    base_name = f"doc_{document.id}"
+                else:
+                    timestamp = asyncio.get_event_loop().time()
+                    base_name = f"media_{message.id}_{int(timestamp)}"
                 file_extension = self._get_media_extension(message.media)
                 file_name = f"{base_name}{file_extension}"
                 file_path = target_dir / file_name
             
             self.logger.info(f"📥 Descargando multimedia: {file_name}")
             
-            # Descargar el archivo
-            downloaded_path = await self.client.download_media(
-                message.media,
-                file=str(file_path),
-                progress_callback=progress_callback
-            )
+            # Reservar espacio antes de empezar. Los documentos se descargan en un
+            # archivo .part que se conserva si la descarga se interrumpe (FloodWait,
+            # apagado, falta de espacio o un error de red) para continuarla después.
+            # Solo si la cancela el usuario el archivo parcial se borra en el acto
+            part_path = file_path.with_name(file_path.name + PART_SUFFIX)
+            # Al reanudar solo hace falta sitio para lo que queda por descargar
+            existing = part_path.stat().st_size if part_path.exists() else 0
+            size = max(self._get_media_size(message.media) - existing, 0)
+            try:
+                async with self.admission_controller.reserve(size, target_dir) as reservation:
+                    if isinstance(message.media, MessageMediaDocument):
+                        downloaded_path = await self._download_resumable(
+                            message.media, file_path, part_path, progress_callback, reservation
+                        )
+                    else:
+                        async with self.api_limiter.slot():
+                            downloaded_path = await self.client.download_media(
+                                message.media,
+                                file=str(file_path),
+                                progress_callback=progress_callback
+                            )
+                        if downloaded_path:
+                            BYTES_DOWNLOADED.inc(
+                                os.path.getsize(downloaded_path), method='download_media_from_message'
+                            )
+            except (asyncio.CancelledError, FloodWaitError) as e:
+                if cancelled_by_user(e):
+                    self.logger.info(f"🛑 Descarga cancelada: {file_name}")
+                    self._remove_partial_file(file_path)
+                    self._remove_partial_file(part_path)
+                elif part_path.exists():
+                    self.logger.info(f"⏸️ Descarga interrumpida, se continuará desde {part_path}")
+                raise
+            except BaseException:
+                # El archivo final nunca queda a medias; el .part se reanuda al reintentar
+                self._remove_partial_file(file_path)
+                if part_path.exists():
+                    self.logger.info(f"⏸️ Descarga fallida, se continuará desde {part_path}")
+                raise
             
             if downloaded_path:
                 self.logger.info(f"✅ Multimedia descargada: {downloaded_path}")
+                add_to_span('bytes', os.path.getsize(downloaded_path))
                 return str(downloaded_path)
             else:
                 self.logger.error("❌ Falló la descarga de multimedia")
@@ -657,12 +1005,376 @@ class TelegramMessenger:
                 
         except FloodWaitError as e:
             self.logger.warning(f"⏰ FloodWait: {e.seconds}s")
-            await asyncio.sleep(e.seconds)
-            return await self.download_media_from_message(message, download_dir, progress_callback)
+            add_to_span('flood_wait_seconds', e.seconds)
+            await self._sleep_flood_wait(e.seconds)
+            return await self.download_media_from_message(message, download_dir, progress_callback, file_name)
+        except InsufficientSpaceError as e:
+            self.logger.error(f"💾 Descarga rechazada por falta de espacio: {e}")
+            await self.send_notification_to_me(f"💾 Descarga rechazada: {e}")
+            return None
         except Exception as e:
             self.logger.error(f"❌ Error descargando multimedia: {e}")
             return None
     
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def download_head(
+        self,
+        message: Any,
+        file_path: Union[str, Path],
+        max_bytes: int
+    ) -> Optional[str]:
+        """
+        Descargar solo los primeros bytes del archivo de un mensaje
+        
+        Args:
+            message: Mensaje de Telegram que contiene multimedia
+            file_path: Ruta donde guardar el fragmento
+            max_bytes: Bytes máximos a descargar
+            
+        Returns:
+            Ruta del fragmento descargado o None si falló
+        """
+        file_path = Path(file_path)
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            chunks = max(1, -(-max_bytes // DOWNLOAD_REQUEST_SIZE))
+            with open(file_path, 'wb') as f:
+                async for chunk in self._iter_blocks(message.media, 0, chunks, method='download_head'):
+                    f.write(chunk)
+            add_to_span('bytes', file_path.stat().st_size)
+            self.logger.info(f"📥 Primeros {file_path.stat().st_size / (1024 * 1024):.1f}MB descargados: {file_path}")
+            return str(file_path)
+        except Exception as e:
+            self.logger.error(f"❌ Error descargando el comienzo del archivo: {e}")
+            self._remove_partial_file(file_path)
+            return None
+    
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def download_range(self, message: Any, offset: int, length: int) -> bytes:
+        """
+        Descargar un rango de bytes del documento de un mensaje
+        
+        Telegram solo acepta desplazamientos alineados, así que se piden los
+        bloques de ``DOWNLOAD_REQUEST_SIZE`` que cubren el rango.
+        
+        Args:
+            message: Mensaje (o fuente con ``media``) con el documento
+            offset: Primer byte
+            length: Número de bytes
+            
+        Returns:
+            Los bytes del rango (menos si el archivo termina antes)
+        """
+        first = offset // DOWNLOAD_REQUEST_SIZE
+        start = first * DOWNLOAD_REQUEST_SIZE
+        blocks = -(-(offset + length - start) // DOWNLOAD_REQUEST_SIZE)
+        data = bytearray()
+        async for chunk in self._iter_blocks(message.media, first, blocks, method='download_range'):
+            data += chunk
+        add_to_span('bytes', len(data))
+        return bytes(data[offset - start:offset - start + length])
+    
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def download_ranges(
+        self,
+        message: Any,
+        file_path: Union[str, Path],
+        ranges: List[Tuple[int, int]]
+    ) -> Optional[int]:
+        """
+        Descargar solo algunos rangos de un documento en un archivo disperso
+        
+        El archivo tiene el tamaño completo del original, con los rangos en su
+        posición y ceros en el resto (sin ocupar disco en los sistemas de
+        archivos que admiten archivos dispersos). Los bloques consecutivos se
+        piden en una sola descarga.
+        
+        El archivo disperso no se puede reanudar (los instantes de los clips
+        se eligen de nuevo en cada intento): lo borra quien lo pidió, también
+        si la descarga falla.
+        
+        Args:
+            message: Mensaje (o fuente con ``media``) con el documento
+            file_path: Ruta del archivo disperso
+            ranges: Rangos (offset, longitud) a descargar
+            
+        Returns:
+            Bytes descargados o None si falló
+        """
+        file_path = Path(file_path)
+        total = self._get_media_size(message.media)
+        blocks = sorted({
+            block
+            for offset, length in ranges
+            for block in range(offset // DOWNLOAD_REQUEST_SIZE, (offset + length - 1) // DOWNLOAD_REQUEST_SIZE + 1)
+        })
+        runs = []
+        for block in blocks:
+            if runs and runs[-1][0] + runs[-1][1] == block:
+                runs[-1][1] += 1
+            else:
+                runs.append([block, 1])
+        
+        fetched = 0
+        try:
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            async with self.admission_controller.reserve(len(blocks) * DOWNLOAD_REQUEST_SIZE, file_path.parent):
+                with open(file_path, 'wb') as f:
+                    f.truncate(total)
+                    for first, count in runs:
+                        f.seek(first * DOWNLOAD_REQUEST_SIZE)
+                        async for chunk in self._iter_blocks(message.media, first, count, method='download_ranges'):
+                            f.write(chunk)
+                            fetched += len(chunk)
+        except InsufficientSpaceError as e:
+            self.logger.error(f"💾 Descarga parcial rechazada por falta de espacio: {e}")
+            return None
+        except Exception as e:
+            self.logger.error(f"❌ Error descargando rangos del archivo: {e}")
+            return None
+        
+        add_to_span('bytes', fetched)
+        self.logger.info(
+            f"📥 {fetched / (1024 * 1024):.1f}MB de {total / (1024 * 1024):.1f}MB descargados "
+            f"en {len(runs)} rangos: {file_path}"
+        )
+        return fetched
+    
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def download_photo_variant(
+        self,
+        message: Any,
+        min_side: int,
+        file_path: Union[str, Path]
+    ) -> Optional[str]:
+        """
+        Descargar la variante más pequeña de una foto que cumpla un lado mínimo
+        
+        Args:
+            message: Mensaje de Telegram con una foto
+            min_side: Lado mínimo en píxeles necesario para la tarea
+            file_path: Ruta donde guardar la variante
+            
+        Returns:
+            Ruta de la variante descargada o None si falló
+        """
+        try:
+            if not isinstance(message.media, MessageMediaPhoto) or not message.media.photo:
+                return None
+            photo_size = select_photo_size(message.media.photo, min_side)
+            if photo_size is None:
+                return None
+            
+            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            downloaded = await self.client.download_media(message.media, file=str(file_path), thumb=photo_size)
+            if not downloaded:
+                return None
+            BYTES_DOWNLOADED.inc(os.path.getsize(downloaded), method='download_photo_variant')
+            add_to_span('bytes', os.path.getsize(downloaded))
+            
+            self.logger.info(
+                f"🖼️ Variante '{photo_size.type}' {photo_size.w}x{photo_size.h} descargada "
+                f"({photo_size_bytes(photo_size) / 1024:.0f}KB de {self._get_media_size(message.media) / 1024:.0f}KB)"
+            )
+            return str(downloaded)
+        except Exception as e:
+            self.logger.error(f"❌ Error descargando la variante de la foto: {e}")
+            return None
+    
+    @_api_slot
+    @timed(TELEGRAM_API_SECONDS, label='method')
+    @traced()
+    async def download_thumbnail(self, message: Any, file_path: Union[str, Path]) -> Optional[str]:
+        """
+        Descargar la miniatura más grande que Telegram adjunta al archivo
+        
+        Args:
+            message: Mensaje de Telegram que contiene multimedia
+            file_path: Ruta donde guardar la miniatura
+            
+        Returns:
+            Ruta de la miniatura o None si no tiene o falló
+        """
+        try:
+            document = getattr(message.media, 'document', None)
+            if not document or not getattr(document, 'thumbs', None):
+                return None
+            Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+            downloaded = await self.client.download_media(message.media, file=str(file_path), thumb=-1)
+            return str(downloaded) if downloaded else None
+        except Exception as e:
+            self.logger.error(f"❌ Error descargando la miniatura: {e}")
+            return None
+    
+    async def _download_resumable(
+        self,
+        media: Any,
+        file_path: Path,
+        part_path: Path,
+        progress_callback: Optional[callable] = None,
+        reservation: Optional[Reservation] = None
+    ) -> Optional[str]:
+        """
+        Descargar un documento continuando desde su archivo .part si existe
+        
+        Args:
+            media: Multimedia del mensaje (MessageMediaDocument)
+            file_path: Ruta final del archivo
+            part_path: Ruta del archivo parcial
+            progress_callback: Función opcional (actual, total) para el progreso
+            reservation: Reserva de espacio que se descuenta según crece el archivo
+            
+        Returns:
+            Ruta del archivo completo
+        """
+        total = self._get_media_size(media)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        # Tamaño en disco ya contado como ocupado (no sale de la reserva)
+        on_disk = offset
+        # Telegram exige desplazamientos alineados con el tamaño de petición
+        offset -= offset % DOWNLOAD_REQUEST_SIZE
+        if total and offset >= total:
+            offset = 0
+        if offset:
+            self.logger.info(f"⏯️ Reanudando descarga en {offset / (1024 * 1024):.1f}MB: {part_path}")
+        
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            current = offset
+            # Solo se guardan en la caché las cabeceras y el índice: el resto del
+            # video expulsaría los bloques que de verdad se vuelven a leer
+            async for chunk in self._iter_blocks(
+                media, offset // DOWNLOAD_REQUEST_SIZE, method='download_media_from_message',
+                cache_edges=CACHED_EDGE_BLOCKS
+            ):
+                f.write(chunk)
+                current += len(chunk)
+                if reservation and current > on_disk:
+                    reservation.written(current - on_disk)
+                    on_disk = current
+                if progress_callback:
+                    result = progress_callback(current, total)
+                    if inspect.isawaitable(result):
+                        await result
+        
+        os.replace(part_path, file_path)
+        return str(file_path)
+    
+    async def _iter_blocks(
+        self,
+        media: Any,
+        first: int,
+        count: Optional[int] = None,
+        method: str = 'iter_blocks',
+        cache_edges: Optional[int] = None
+    ):
+        """
+        Bloques de ``DOWNLOAD_REQUEST_SIZE`` de un documento, de la caché o de Telegram
+        
+        Los bloques que ya están en la caché se leen de disco y los que faltan
+        se piden a Telegram en tandas de bloques consecutivos (y se guardan).
+        Solo los bytes pedidos a Telegram cuentan como descargados. El hueco
+        de la API se ocupa solo mientras se pide cada bloque, no durante toda
+        la descarga, para que los botones no esperen a que termine.
+        
+        Args:
+            media: Multimedia del mensaje
+            first: Primer bloque
+            count: Número de bloques (None = hasta el final)
+            method: Etiqueta de la métrica de bytes descargados
+            cache_edges: Guardar solo los N primeros y N últimos bloques del
+                documento (None = guardar todos los que se piden)
+            
+        Yields:
+            Contenido de cada bloque, en orden
+        """
+        total = self._get_media_size(media)
+        document = getattr(media, 'document', None)
+        cache = self.chunk_cache
+        if cache is None or document is None or not total:
+            async for chunk in self._iter_download(media, first, count, total or None):
+                BYTES_DOWNLOADED.inc(len(chunk), method=method)
+                yield chunk
+            return
+        
+        blocks = -(-total // DOWNLOAD_REQUEST_SIZE)
+        end = blocks if count is None else min(blocks, first + count)
+        block = first
+        while block < end:
+            cached = cache.get(document.id, block)
+            if cached is not None:
+                yield cached
+                block += 1
+                continue
+            
+            run_end = block + 1
+            while run_end < end and (document.id, run_end) not in cache:
+                run_end += 1
+            start = block
+            async for chunk in self._iter_download(media, block, run_end - block, total):
+                if cache_edges is None or block < cache_edges or block >= blocks - cache_edges:
+                    cache.put(document.id, block, chunk)
+                BYTES_DOWNLOADED.inc(len(chunk), method=method)
+                yield chunk
+                block += 1
+            if block == start:
+                # Telegram no devolvió nada: el documento es más corto de lo indicado
+                return
+    
+    async def _iter_download(self, media: Any, first: int, count: Optional[int], total: Optional[int]):
+        """``iter_download`` ocupando un hueco de la API solo mientras se pide cada bloque"""
+        chunks = self.client.iter_download(
+            media,
+            offset=first * DOWNLOAD_REQUEST_SIZE,
+            request_size=DOWNLOAD_REQUEST_SIZE,
+            limit=count,
+            file_size=total
+        ).__aiter__()
+        while True:
+            async with self.api_limiter.slot():
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield chunk
+    
+    def _remove_partial_file(self, file_path: Path) -> None:
+        """Eliminar un archivo de descarga incompleto"""
+        try:
+            if file_path.exists():
+                file_path.unlink()
+                self.logger.info(f"🧹 Descarga incompleta eliminada: {file_path}")
+        except OSError as e:
+            self.logger.warning(f"No se pudo eliminar la descarga incompleta {file_path}: {e}")
+    
+    def _get_media_size(self, media) -> int:
+        """
+        Obtener el tamaño en bytes del archivo de un objeto media
+        
+        Args:
+            media: Objeto media de Telegram
+            
+        Returns:
+            Tamaño en bytes (0 si no se conoce)
+        """
+        if isinstance(media, MessageMediaDocument) and media.document:
+            return media.document.size or 0
+        if isinstance(media, MessageMediaPhoto) and media.photo:
+            sizes = []
+            for photo_size in getattr(media.photo, 'sizes', []):
+                if hasattr(photo_size, 'sizes'):
+                    sizes.extend(photo_size.sizes)
+                elif hasattr(photo_size, 'size'):
+                    sizes.append(photo_size.size)
+            return max(sizes, default=0)
+        return 0
+    
     def _get_media_extension(self, media) -> str:
         """
         Determinar extensión de archivo basada en el tipo de media
@@ -3,5 +3,29 @@ Paquete de utilidades del bot
 """
 
 from .file_manager import FileManager
+from .album_collector import AlbumCollector
+from .entity_cache import EntityCache
+from .download_admission import DownloadAdmissionController, InsufficientSpaceError, Reservation
+from .media_cache import MediaCache
+from .image_hash import PerceptualHashIndex, BKTree, phash, dhash
+from .media_reference import document_to_dict, document_from_dict
+from .photo_sizes import TASK_MIN_SIDE, select_photo_size
+from .metrics import MetricsRegistry, REGISTRY, timed
+from .loop_watchdog import LoopWatchdog
+from .profiler import RuntimeProfiler
+from .job_tracker import JobTracker
+from .job_scheduler import JobScheduler
+from .priority import PriorityLimiter, priority_lane, run_in_lane
+from .mp4_index import Mp4IndexError, load_mp4_index
+from .media_proxy import MediaProxy
+from .chunk_cache import ChunkCache
 
-__all__ = ['FileManager']
\ No newline at end of file
+__all__ = ['FileManager', 'AlbumCollector', 'EntityCache',
+           'DownloadAdmissionController', 'InsufficientSpaceError', 'Reservation', 'MediaCache',
+           'PerceptualHashIndex', 'BKTree', 'phash', 'dhash',
+           'document_to_dict', 'document_from_dict',
+           'TASK_MIN_SIDE', 'select_photo_size',
+           'MetricsRegistry', 'REGISTRY', 'timed', 'LoopWatchdog',
+           'RuntimeProfiler', 'JobTracker', 'JobScheduler',
+           'PriorityLimiter', 'priority_lane', 'run_in_lane',
+           'Mp4IndexError', 'load_mp4_index', 'MediaProxy', 'ChunkCache']
@@ -0,0 +1,98 @@
+"""
+Agrupador de álbumes de Telegram
+
+Los mensajes de un álbum (mismo ``grouped_id``) llegan como actualizaciones
+independientes. Esta clase los acumula durante una ventana corta y entrega
+el álbum completo de una sola vez.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+
+class AlbumCollector:
+    """
+    Acumula mensajes por ``grouped_id`` y entrega cada álbum como una unidad
+
+    Cada mensaje nuevo del mismo grupo reinicia la ventana de espera, de modo
+    que los álbumes que llegan repartidos en varias actualizaciones se
+    entregan completos.
+    """
+
+    def __init__(
+        self,
+        on_album: Callable[[List[Any]], Awaitable[None]],
+        window: float = 1.0
+    ):
+        """
+        Args:
+            on_album: Corrutina que recibe la lista de mensajes del álbum
+            window: Segundos de espera desde el último mensaje del grupo
+        """
+        self.on_album = on_album
+        self.window = window
+        self.logger = logger
+        self._pending: Dict[int, List[Any]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        # Referencias a las entregas en curso (el bucle solo guarda referencias débiles)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, message) -> None:
+        """
+        Añadir un mensaje agrupado al buffer
+
+        Args:
+            message: Mensaje de Telegram con ``grouped_id``
+        """
+        group_id = message.grouped_id
+        self._pending.setdefault(group_id, []).append(message)
+
+        timer = self._timers.pop(group_id, None)
+        if timer:
+            timer.cancel()
+
+        loop = asyncio.get_running_loop()
+        self._timers[group_id] = loop.call_later(self.window, self._flush, group_id)
+
+    def _flush(self, group_id: int) -> None:
+        """Entregar el álbum acumulado cuando vence la ventana"""
+        self._timers.pop(group_id, None)
+        messages = self._pending.pop(group_id, [])
+        if not messages:
+            return
+
+        messages.sort(key=lambda m: m.id)
+        self.logger.info(f"📚 Álbum {group_id} completo: {len(messages)} mensajes")
+        task = asyncio.ensure_future(self._deliver(group_id, messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _deliver(self, group_id: int, messages: List[Any]) -> None:
+        try:
+            await self.on_album(messages)
+        except Exception as e:
+            self.logger.error(f"Error procesando álbum {group_id}: {e}")
+
+    def flush_all(self) -> int:
+        """
+        Entregar ya todos los álbumes en espera (al apagar el bot)
+
+        Returns:
+            Número de álbumes entregados
+        """
+        groups = list(self._pending)
+        for group_id in groups:
+            timer = self._timers.get(group_id)
+            if timer:
+                timer.cancel()
+            self._flush(group_id)
+        return len(groups)
+
+    @property
+    def pending_groups(self) -> int:
+        """Número de álbumes todavía en la ventana de espera"""
+        return len(self._pending)
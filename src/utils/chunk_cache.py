@@ -0,0 +1,99 @@
+"""
+Caché en disco de bloques de los documentos de Telegram
+
+Guarda los bloques descargados, indexados por (id del documento, número de
+bloque), en un único archivo de tamaño fijo proyectado en memoria (``mmap``)
+y dividido en huecos del tamaño de un bloque. Cuando no quedan huecos libres
+se reutiliza el del bloque usado hace más tiempo (LRU).
+
+Así las operaciones repetidas sobre el mismo video (vista previa, índice MP4,
+clips por rangos, el proxy de medios...) leen de disco los bloques que ya se
+descargaron, sobre todo las cabeceras y el índice. Las descargas completas
+solo guardan sus primeros y últimos bloques: un recorrido secuencial de un
+video grande expulsaría todo lo demás sin que nadie volviera a leerlo.
+
+El índice vive en memoria: el archivo se vacía al arrancar.
+"""
+
+import mmap
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from src.config.logger import get_logger
+from src.utils.metrics import CHUNK_CACHE_BYTES
+
+logger = get_logger()
+
+
+class ChunkCache:
+    """Caché LRU de bloques de documentos en un archivo proyectado en memoria"""
+
+    def __init__(self, path: Union[str, Path], max_bytes: int, chunk_size: int = 512 * 1024):
+        """
+        Inicializar la caché
+
+        Args:
+            path: Archivo donde se guardan los bloques (se vacía al arrancar)
+            max_bytes: Tamaño máximo de la caché en disco
+            chunk_size: Tamaño de cada bloque
+        """
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.slots = max(1, max_bytes // chunk_size)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w+b')
+        # Archivo disperso: solo ocupa disco lo que se escribe
+        self._file.truncate(self.slots * chunk_size)
+        self._map = mmap.mmap(self._file.fileno(), self.slots * chunk_size)
+        # (documento, bloque) -> (hueco, longitud); el orden es el de uso
+        self._index: 'OrderedDict[Tuple[int, int], Tuple[int, int]]' = OrderedDict()
+        self._free: List[int] = list(range(self.slots - 1, -1, -1))
+        logger.info(f"🧊 Caché de bloques: {self.slots * chunk_size / (1024 * 1024):.0f}MB en {self.path}")
+
+    @property
+    def used_bytes(self) -> int:
+        """Bytes de bloques guardados"""
+        return sum(length for _, length in self._index.values())
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        return key in self._index
+
+    def get(self, document_id: int, block: int) -> Optional[bytes]:
+        """
+        Leer un bloque
+
+        Returns:
+            Contenido del bloque o None si no está en la caché
+        """
+        entry = self._index.get((document_id, block))
+        if entry is None or self._map.closed:
+            return None
+        self._index.move_to_end((document_id, block))
+        slot, length = entry
+        start = slot * self.chunk_size
+        CHUNK_CACHE_BYTES.inc(length, result='hit')
+        return self._map[start:start + length]
+
+    def put(self, document_id: int, block: int, data: bytes) -> None:
+        """Guardar un bloque, expulsando el usado hace más tiempo si no hay sitio"""
+        if len(data) > self.chunk_size or self._map.closed:
+            return
+        key = (document_id, block)
+        if key in self._index:
+            self._index.move_to_end(key)
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, (slot, _) = self._index.popitem(last=False)
+        start = slot * self.chunk_size
+        self._map[start:start + len(data)] = data
+        self._index[key] = (slot, len(data))
+        CHUNK_CACHE_BYTES.inc(len(data), result='miss')
+
+    def close(self) -> None:
+        """Liberar la proyección en memoria y el archivo"""
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
@@ -0,0 +1,246 @@
+"""
+Control de admisión de descargas según el espacio en disco
+
+Antes de empezar una descarga se reserva su tamaño contra el espacio libre
+del volumen donde se escribe y, si se escribe en el directorio de descargas,
+contra su presupuesto opcional.
+Si no hay sitio se intenta liberar espacio y, si aun así no cabe, la
+descarga espera en cola hasta que otras terminen o se agota el tiempo.
+
+Lo que la descarga ya ha escrito cuenta como ocupado en el volumen (y en el
+directorio de descargas), así que la reserva se reduce a medida que se
+escribe (``Reservation.written``) para no contar esos bytes dos veces.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+
+class InsufficientSpaceError(Exception):
+    """No hay espacio suficiente para admitir la descarga"""
+
+
+class Reservation:
+    """Espacio reservado por una descarga en curso"""
+
+    def __init__(self, controller: 'DownloadAdmissionController', device: int, in_budget: bool, size: int):
+        self._controller = controller
+        self._device = device
+        self._in_budget = in_budget
+        self.remaining = size
+
+    def written(self, nbytes: int) -> None:
+        """
+        Descontar de la reserva bytes ya escritos en disco
+
+        Args:
+            nbytes: Bytes en que ha crecido el archivo desde la última llamada
+        """
+        nbytes = min(max(int(nbytes), 0), self.remaining)
+        self._controller._unreserve(self._device, self._in_budget, nbytes)
+        self.remaining -= nbytes
+
+
+class DownloadAdmissionController:
+    """
+    Reserva de espacio en disco para descargas concurrentes
+
+    Funcionalidades:
+    1. Reserva de ``size`` bytes antes de descargar
+    2. Cola de espera cuando el espacio disponible no alcanza
+    3. Liberación de espacio mediante un evictor configurable
+    4. Rechazo limpio cuando la descarga nunca podría caber
+    """
+
+    def __init__(
+        self,
+        download_dir: Union[str, Path],
+        budget_bytes: int = 0,
+        min_free_bytes: int = 0,
+        wait_timeout: float = 600,
+        evict_min_age: float = 24 * 3600,
+        evictor: Optional[Callable[[int], int]] = None
+    ):
+        """
+        Args:
+            download_dir: Directorio de descargas
+            budget_bytes: Máximo de bytes en el directorio (0 = sin límite)
+            min_free_bytes: Bytes que siempre deben quedar libres en el volumen
+            wait_timeout: Segundos máximos de espera en cola
+            evict_min_age: Antigüedad mínima (s) de los archivos que el evictor
+                por defecto puede borrar
+            evictor: Función que recibe los bytes a liberar y devuelve los liberados
+        """
+        self.download_dir = Path(download_dir)
+        self.budget_bytes = budget_bytes
+        self.min_free_bytes = min_free_bytes
+        self.wait_timeout = wait_timeout
+        self.evict_min_age = evict_min_age
+        self.evictor = evictor or self._evict_old_downloads
+        self.logger = logger
+        # Bytes reservados por volumen (st_dev) y, de ellos, en el directorio de descargas
+        self._reserved: Dict[int, int] = {}
+        self._budget_reserved = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def reserved_bytes(self) -> int:
+        """Bytes reservados por descargas en curso"""
+        return sum(self._reserved.values())
+
+    def _target(self, directory: Optional[Union[str, Path]]) -> Path:
+        """Directorio donde se escribe (por defecto el de descargas), ya creado"""
+        target = Path(directory) if directory else self.download_dir
+        target.mkdir(parents=True, exist_ok=True)
+        return target
+
+    def _in_budget(self, directory: Path) -> bool:
+        """El directorio es el de descargas (el único con presupuesto)"""
+        return directory.resolve() == self.download_dir.resolve()
+
+    def set_evictor(self, evictor: Callable[[int], int]) -> None:
+        """Sustituir la estrategia de liberación de espacio"""
+        self.evictor = evictor
+
+    def _directory_usage(self) -> int:
+        """Bytes ocupados por los archivos del directorio de descargas"""
+        total = 0
+        try:
+            with os.scandir(self.download_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            pass
+        return total
+
+    def available_bytes(self, directory: Optional[Union[str, Path]] = None) -> int:
+        """
+        Bytes que se pueden reservar ahora mismo
+
+        Args:
+            directory: Directorio donde se va a escribir (por defecto el de descargas)
+        """
+        target = self._target(directory)
+        reserved = self._reserved.get(target.stat().st_dev, 0)
+        free = shutil.disk_usage(target).free - self.min_free_bytes - reserved
+        if self.budget_bytes and self._in_budget(target):
+            free = min(free, self.budget_bytes - self._directory_usage() - self._budget_reserved)
+        return free
+
+    def _can_ever_fit(self, size: int, target: Path) -> bool:
+        """Comprobar si la descarga cabría con el directorio vacío"""
+        capacity = shutil.disk_usage(target).total - self.min_free_bytes
+        if self.budget_bytes and self._in_budget(target):
+            capacity = min(capacity, self.budget_bytes)
+        return size <= capacity
+
+    def _evict_old_downloads(self, bytes_needed: int) -> int:
+        """
+        Evictor por defecto: borrar las descargas más antiguas
+
+        Solo se eliminan archivos no modificados en ``evict_min_age`` segundos,
+        empezando por los más antiguos, hasta liberar ``bytes_needed``.
+        """
+        cutoff = time.time() - self.evict_min_age
+        candidates = []
+        try:
+            with os.scandir(self.download_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_mtime < cutoff:
+                            candidates.append((stat.st_mtime, entry.path, stat.st_size))
+        except FileNotFoundError:
+            return 0
+
+        freed = 0
+        for _, path, size in sorted(candidates):
+            if freed >= bytes_needed:
+                break
+            try:
+                os.remove(path)
+                freed += size
+                self.logger.info(f"🧹 Descarga antigua eliminada para liberar espacio: {path}")
+            except OSError as e:
+                self.logger.warning(f"No se pudo eliminar {path}: {e}")
+        return freed
+
+    def _unreserve(self, device: int, in_budget: bool, nbytes: int) -> None:
+        """Devolver bytes reservados (ya escritos o no usados)"""
+        self._reserved[device] -= nbytes
+        if in_budget:
+            self._budget_reserved -= nbytes
+
+    @asynccontextmanager
+    async def reserve(self, size: int, directory: Optional[Union[str, Path]] = None):
+        """
+        Reservar ``size`` bytes durante la descarga
+
+        Args:
+            size: Bytes que se van a escribir (en una descarga reanudada, solo
+                lo que falta por escribir)
+            directory: Directorio donde se escriben (por defecto el de descargas)
+
+        Yields:
+            Reservation con la que ir descontando lo que ya se ha escrito
+
+        Raises:
+            InsufficientSpaceError: Si la descarga no cabe ni tras esperar
+        """
+        size = max(int(size or 0), 0)
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        target = self._target(directory)
+        device = target.stat().st_dev
+        in_budget = self._in_budget(target)
+        if not self._can_ever_fit(size, target):
+            raise InsufficientSpaceError(
+                f"El archivo ({size / (1024 * 1024):.1f}MB) supera la capacidad de descargas"
+            )
+
+        deadline = asyncio.get_running_loop().time() + self.wait_timeout
+        async with self._condition:
+            while True:
+                available = self.available_bytes(target)
+                if available < size:
+                    freed = self.evictor(size - available)
+                    if freed:
+                        self.logger.info(f"🧹 Liberados {freed / (1024 * 1024):.1f}MB para nuevas descargas")
+                        available = self.available_bytes(target)
+                if available >= size:
+                    break
+
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    raise InsufficientSpaceError(
+                        f"Espacio insuficiente para {size / (1024 * 1024):.1f}MB "
+                        f"(disponible: {max(available, 0) / (1024 * 1024):.1f}MB)"
+                    )
+                self.logger.info(f"⏳ Descarga de {size / (1024 * 1024):.1f}MB en cola por falta de espacio")
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            self._reserved[device] = self._reserved.get(device, 0) + size
+            if in_budget:
+                self._budget_reserved += size
+
+        reservation = Reservation(self, device, in_budget, size)
+        try:
+            yield reservation
+        finally:
+            async with self._condition:
+                self._unreserve(device, in_budget, reservation.remaining)
+                self._condition.notify_all()
@@ -0,0 +1,126 @@
+"""
+Caché de entidades de Telegram
+
+Guarda las ``InputPeer`` de los chats configurados para que los envíos no
+tengan que resolver la entidad por red, y memoriza ``get_me()``.
+La caché se persiste en disco para sobrevivir a los reinicios.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+
+class EntityCache:
+    """Caché persistente de entidades de entrada (InputPeer) por ID de chat"""
+
+    def __init__(self, client, cache_path: Union[str, Path]):
+        """
+        Args:
+            client: Cliente de Telethon
+            cache_path: Fichero JSON donde persistir la caché
+        """
+        self.client = client
+        self.cache_path = Path(cache_path)
+        self.logger = logger
+        self._entities: Dict[int, Any] = {}
+        self._me = None
+        self._load()
+
+    def _load(self) -> None:
+        """Cargar las entidades persistidas en disco"""
+        try:
+            if not self.cache_path.exists():
+                return
+            data = json.loads(self.cache_path.read_text(encoding='utf-8'))
+            for chat_id, raw in data.get('entities', {}).items():
+                peer = self._peer_from_dict(raw)
+                if peer is not None:
+                    self._entities[int(chat_id)] = peer
+            self.logger.info(f"Caché de entidades cargada: {len(self._entities)} entidades")
+        except Exception as e:
+            self.logger.warning(f"No se pudo cargar la caché de entidades: {e}")
+
+    def _save(self) -> None:
+        """Persistir las entidades en disco"""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                'entities': {
+                    str(chat_id): self._peer_to_dict(peer)
+                    for chat_id, peer in self._entities.items()
+                    if self._peer_to_dict(peer) is not None
+                }
+            }
+            self.cache_path.write_text(json.dumps(data), encoding='utf-8')
+        except Exception as e:
+            self.logger.warning(f"No se pudo guardar la caché de entidades: {e}")
+
+    @staticmethod
+    def _peer_to_dict(peer) -> Optional[dict]:
+        if isinstance(peer, InputPeerUser):
+            return {'type': 'user', 'id': peer.user_id, 'access_hash': peer.access_hash}
+        if isinstance(peer, InputPeerChannel):
+            return {'type': 'channel', 'id': peer.channel_id, 'access_hash': peer.access_hash}
+        if isinstance(peer, InputPeerChat):
+            return {'type': 'chat', 'id': peer.chat_id}
+        return None
+
+    @staticmethod
+    def _peer_from_dict(data: dict):
+        peer_type = data.get('type')
+        if peer_type == 'user':
+            return InputPeerUser(data['id'], data['access_hash'])
+        if peer_type == 'channel':
+            return InputPeerChannel(data['id'], data['access_hash'])
+        if peer_type == 'chat':
+            return InputPeerChat(data['id'])
+        return None
+
+    async def prefetch(self, chat_ids: Iterable[Optional[int]]) -> int:
+        """
+        Resolver y guardar las entidades que aún no están en la caché
+
+        Args:
+            chat_ids: IDs de chat a precargar (se ignoran los vacíos)
+
+        Returns:
+            Número de entidades resueltas por red
+        """
+        resolved = 0
+        for chat_id in chat_ids:
+            if not chat_id or chat_id in self._entities:
+                continue
+            try:
+                self._entities[chat_id] = await self.client.get_input_entity(chat_id)
+                resolved += 1
+            except Exception as e:
+                self.logger.warning(f"No se pudo resolver la entidad {chat_id}: {e}")
+
+        if resolved:
+            self._save()
+        self.logger.info(f"Entidades precargadas: {len(self._entities)} ({resolved} resueltas por red)")
+        return resolved
+
+    def resolve(self, chat_id):
+        """
+        Obtener la entidad de entrada de un chat sin llamadas a la API
+
+        Returns:
+            InputPeer cacheada o el propio valor recibido si no está en la caché
+        """
+        if isinstance(chat_id, int):
+            return self._entities.get(chat_id, chat_id)
+        return chat_id
+
+    async def get_me(self):
+        """Obtener el usuario del bot, consultando la API solo la primera vez"""
+        if self._me is None:
+            self._me = await self.client.get_me()
+        return self._me
@@ -3,10 +3,14 @@ import asyncio
 import json
 import random
 import subprocess
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 from src.config.logger import get_logger
+from src.utils.metrics import STAGE_SECONDS, timed
+from src.utils.priority import BULK, PriorityLimiter, current_lane
+from src.utils.tracing import traced
 
 logger = get_logger()
 
@@ -21,9 +25,101 @@ class FileManager:
     4. Limpieza de archivos temporales
     """
 
+    # Procesos de ffmpeg/ffprobe en curso (compartidos entre instancias)
+    _processes = set()
+
+    # Huecos de procesos por carril de prioridad (sin límite hasta configurarlo)
+    _limiter: Optional[PriorityLimiter] = None
+    _bulk_niceness = 0
+
     def __init__(self):
         self.logger = logger
 
+    @classmethod
+    def configure_limits(cls, slots: int, shares: Optional[dict] = None, bulk_niceness: int = 0) -> None:
+        """
+        Limitar los procesos simultáneos y repartirlos por carril de prioridad
+
+        Args:
+            slots: Procesos de ffmpeg/ffprobe a la vez
+            shares: Parte de los procesos que puede ocupar cada carril
+            bulk_niceness: Incremento de ``nice`` para los procesos del carril masivo
+        """
+        cls._limiter = PriorityLimiter('ffmpeg', slots, shares)
+        cls._bulk_niceness = bulk_niceness
+
+    async def _run(self, args: List[str]) -> subprocess.CompletedProcess:
+        """
+        Ejecutar un comando sin bloquear el bucle de eventos
+
+        El proceso queda registrado mientras se ejecuta para poder terminarlo
+        al apagar el bot; si la tarea se cancela, el proceso se mata. Espera
+        un hueco en el carril de prioridad actual y, en el masivo, se ejecuta
+        con menor prioridad de CPU.
+
+        Args:
+            args: Comando y argumentos
+
+        Returns:
+            subprocess.CompletedProcess con la salida decodificada
+        """
+        kwargs = {}
+        niceness = FileManager._bulk_niceness
+        if niceness and os.name == 'posix' and current_lane() == BULK:
+            kwargs['preexec_fn'] = lambda: os.nice(niceness)
+
+        limiter = FileManager._limiter
+        async with (limiter.slot() if limiter else nullcontext()):
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, **kwargs
+            )
+            FileManager._processes.add(process)
+            try:
+                stdout, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            finally:
+                FileManager._processes.discard(process)
+
+        return subprocess.CompletedProcess(
+            args, process.returncode,
+            stdout.decode('utf-8', errors='replace'),
+            stderr.decode('utf-8', errors='replace')
+        )
+
+    @classmethod
+    async def terminate_processes(cls, timeout: float = 5) -> int:
+        """
+        Terminar los procesos de ffmpeg en curso
+
+        Primero se envía SIGTERM para que ffmpeg cierre limpiamente y, si
+        no termina en ``timeout`` segundos, se mata.
+
+        Returns:
+            Número de procesos terminados
+        """
+        processes = [process for process in cls._processes if process.returncode is None]
+        for process in processes:
+            process.terminate()
+        if not processes:
+            return 0
+
+        done, pending = await asyncio.wait(
+            [asyncio.ensure_future(process.wait()) for process in processes], timeout=timeout
+        )
+        for process in processes:
+            if process.returncode is None:
+                process.kill()
+        if pending:
+            await asyncio.wait(pending, timeout=1)
+        logger.info(f"🛑 {len(processes)} procesos de ffmpeg terminados")
+        return len(processes)
+
+    @timed(STAGE_SECONDS, label='stage', handler='ffmpeg')
+    @traced()
     async def get_video_duration(self, video_path: str) -> Optional[float]:
         """
         Obtener la duración del video en segundos usando ffprobe
@@ -36,13 +132,13 @@ class FileManager:
         """
         try:
             # Usar ffprobe para obtener la duración
-            result = subprocess.run([
+            result = await self._run([
                 'ffprobe',
                 '-v', 'quiet',
                 '-show_entries', 'format=duration',
                 '-of', 'json',
                 video_path
-            ], capture_output=True, text=True)
+            ])
 
             if result.returncode != 0:
                 self.logger.error(f"Error ejecutando ffprobe: {result.stderr}")
@@ -90,6 +186,8 @@ class FileManager:
         self.logger.info(f"Tiempo de inicio aleatorio calculado: {random_start}s (rango: {min_start_time}-{max_start_time}s)")
         return random_start
 
+    @timed(STAGE_SECONDS, label='stage', handler='ffmpeg')
+    @traced()
     async def create_random_video_clip(
         self,
         input_path: str,
@@ -119,7 +217,7 @@ class FileManager:
             start_offset = self.calculate_random_start_time(video_duration, clip_duration)
 
             # Crear el clip usando ffmpeg
-            result = subprocess.run([
+            result = await self._run([
                 'ffmpeg',
                 '-i', input_path,
                 '-ss', str(start_offset),
@@ -129,7 +227,7 @@ class FileManager:
                 '-preset', 'fast',
                 '-y',
                 output_path
-            ], capture_output=True, text=True)
+            ])
 
             if result.returncode != 0:
                 return False, f"Error en ffmpeg: {result.stderr}"
@@ -148,6 +246,163 @@ class FileManager:
             self.logger.error(error_msg)
             return False, error_msg
 
+    @timed(STAGE_SECONDS, label='stage', handler='ffmpeg')
+    @traced()
+    async def create_video_clip(
+        self,
+        input_path: str,
+        output_path: str,
+        start_offset: float,
+        clip_duration: int = 30
+    ) -> Tuple[bool, str]:
+        """
+        Crear un clip de video desde un instante concreto
+
+        ``-ss`` va antes de ``-i`` para que ffmpeg salte con el índice del
+        archivo al fotograma clave anterior y solo lea las muestras del clip.
+        Así funciona con archivos dispersos que solo tienen esos rangos.
+
+        Args:
+            input_path (str): Ruta del video original
+            output_path (str): Ruta donde guardar el clip
+            start_offset (float): Segundo de inicio del clip
+            clip_duration (int): Duración del clip en segundos (default: 30)
+
+        Returns:
+            Tuple[bool, str]: (éxito, mensaje/ruta del clip o error)
+        """
+        try:
+            self.logger.info(f"Creando clip: {input_path} -> {output_path} (inicio: {start_offset}s, duración: {clip_duration}s)")
+
+            result = await self._run([
+                'ffmpeg',
+                '-ss', str(start_offset),
+                '-i', input_path,
+                '-t', str(clip_duration),
+                '-c:v', 'libx264',
+                '-c:a', 'aac',
+                '-preset', 'fast',
+                '-y',
+                output_path
+            ])
+
+            if result.returncode != 0:
+                return False, f"Error en ffmpeg: {result.stderr}"
+
+            if not os.path.exists(output_path):
+                return False, "El clip no se generó correctamente"
+
+            self.logger.info(f"Clip creado exitosamente: {output_path} ({os.path.getsize(output_path)} bytes)")
+            return True, output_path
+
+        except Exception as e:
+            error_msg = f"Error creando clip de video: {str(e)}"
+            self.logger.error(error_msg)
+            return False, error_msg
+
+    @timed(STAGE_SECONDS, label='stage', handler='ffmpeg')
+    @traced()
+    async def extract_keyframes(
+        self,
+        video_path: str,
+        output_dir: str,
+        count: int = 3
+    ) -> List[str]:
+        """
+        Extraer fotogramas clave repartidos a lo largo del video
+
+        Args:
+            video_path (str): Ruta al archivo de video
+            output_dir (str): Directorio donde guardar los fotogramas
+            count (int): Número de fotogramas a extraer
+
+        Returns:
+            List[str]: Rutas de los fotogramas extraídos
+        """
+        frames = []
+        try:
+            duration = await self.get_video_duration(video_path)
+            if not duration:
+                return frames
+
+            os.makedirs(output_dir, exist_ok=True)
+            base_name = Path(video_path).stem
+            for i in range(count):
+                # Con -ss antes de -i ffmpeg salta al fotograma clave más cercano
+                timestamp = duration * (i + 1) / (count + 1)
+                frame_path = os.path.join(output_dir, f"{base_name}_key_{i:02d}.jpg")
+                result = await self._run([
+                    'ffmpeg',
+                    '-ss', f"{timestamp:.2f}",
+                    '-i', video_path,
+                    '-frames:v', '1',
+                    '-vf', 'scale=256:-2',
+                    '-y',
+                    frame_path
+                ])
+
+                if result.returncode == 0 and os.path.exists(frame_path):
+                    frames.append(frame_path)
+                else:
+                    self.logger.warning(f"No se pudo extraer el fotograma {i} de {video_path}")
+
+        except Exception as e:
+            self.logger.error(f"Error extrayendo fotogramas clave: {e}")
+
+        return frames
+
+    @timed(STAGE_SECONDS, label='stage', handler='ffmpeg')
+    @traced()
+    async def create_contact_sheet(
+        self,
+        video_path: str,
+        output_path: str,
+        frames: int = 6,
+        columns: int = 3,
+        width: int = 320
+    ) -> bool:
+        """
+        Crear una hoja de contactos con los primeros fotogramas clave del video
+
+        Se hace en una sola pasada de ffmpeg decodificando solo fotogramas
+        clave, por lo que funciona con el comienzo de un video descargado
+        parcialmente (si el índice ``moov`` está al principio).
+
+        Args:
+            video_path (str): Ruta al video (completo o parcial)
+            output_path (str): Ruta de la imagen a generar
+            frames (int): Número de fotogramas de la hoja
+            columns (int): Columnas de la rejilla
+            width (int): Ancho de cada miniatura en píxeles
+
+        Returns:
+            bool: True si se generó la hoja de contactos
+        """
+        try:
+            columns = max(1, min(columns, frames))
+            rows = -(-frames // columns)
+            result = await self._run([
+                'ffmpeg',
+                '-skip_frame', 'nokey',
+                '-i', video_path,
+                '-vf', f"scale={width}:-2,tile={columns}x{rows}:padding=4:margin=4",
+                '-frames:v', '1',
+                '-fps_mode', 'vfr',
+                '-y',
+                output_path
+            ])
+
+            if result.returncode != 0 or not os.path.exists(output_path):
+                self.logger.warning(f"No se pudo crear la hoja de contactos de {video_path}: {result.stderr[-300:]}")
+                return False
+
+            self.logger.info(f"Hoja de contactos creada: {output_path}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error creando la hoja de contactos: {e}")
+            return False
+
     async def cleanup_files(self, file_paths: list) -> Tuple[int, list]:
         """
         Limpiar archivos temporales
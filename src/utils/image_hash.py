@@ -0,0 +1,231 @@
+"""
+Hash perceptual de imágenes y detección de casi-duplicados
+
+Calcula pHash y dHash de 64 bits con NumPy sobre imágenes reducidas y los
+indexa en un BK-tree para buscar hashes a poca distancia de Hamming.
+El índice se persiste en la base de datos y se reconstruye al arrancar.
+NumPy se importa al calcular el primer hash para no retrasar el arranque.
+"""
+
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from PIL import Image
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from src.config.logger import get_logger
+from src.database.models import MediaHash
+
+logger = get_logger()
+
+# Lado de la imagen reducida sobre la que se calcula la DCT del pHash
+_PHASH_SIZE = 32
+_DCT_CACHE: Dict[int, 'np.ndarray'] = {}
+
+
+def _dct_matrix(n: int) -> 'np.ndarray':
+    """Matriz de la DCT-II ortonormal de tamaño n x n (memorizada)"""
+    import numpy as np
+
+    if n not in _DCT_CACHE:
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+        matrix[0, :] = np.sqrt(1.0 / n)
+        _DCT_CACHE[n] = matrix
+    return _DCT_CACHE[n]
+
+
+def _bits_to_int(bits: 'np.ndarray') -> int:
+    """Empaquetar una matriz booleana en un entero"""
+    import numpy as np
+
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def _grayscale(image: Union[str, Image.Image], size: Tuple[int, int]) -> 'np.ndarray':
+    """Abrir, convertir a escala de grises y reducir una imagen"""
+    import numpy as np
+
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    image = image.convert('L').resize(size, Image.Resampling.LANCZOS)
+    return np.asarray(image, dtype=np.float64)
+
+
+def dhash(image: Union[str, Image.Image], hash_size: int = 8) -> int:
+    """
+    Hash de diferencias (dHash) de ``hash_size * hash_size`` bits
+
+    Args:
+        image: Ruta o imagen de Pillow
+        hash_size: Lado de la rejilla de comparación
+    """
+    pixels = _grayscale(image, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image: Union[str, Image.Image], hash_size: int = 8) -> int:
+    """
+    Hash perceptual (pHash) basado en la DCT de ``hash_size * hash_size`` bits
+
+    Args:
+        image: Ruta o imagen de Pillow
+        hash_size: Lado del bloque de bajas frecuencias usado
+    """
+    import numpy as np
+
+    pixels = _grayscale(image, (_PHASH_SIZE, _PHASH_SIZE))
+    dct = _dct_matrix(_PHASH_SIZE)
+    low_freq = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    # Se excluye el coeficiente DC para que el brillo global no afecte a la mediana
+    median = np.median(low_freq.flatten()[1:])
+    return _bits_to_int(low_freq > median)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Distancia de Hamming entre dos hashes"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Árbol BK para búsqueda por distancia de Hamming
+
+    Cada nodo guarda un hash, los elementos asociados y sus hijos indexados
+    por distancia, lo que permite podar las ramas que no pueden contener
+    resultados dentro del radio buscado.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None  # [hash, items, {distancia: nodo}]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any) -> None:
+        """Añadir un hash con el elemento asociado"""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """
+        Buscar elementos a distancia menor o igual que ``max_distance``
+
+        Returns:
+            Lista de (distancia, elemento) ordenada por distancia
+        """
+        results = []
+        if self._root is None:
+            return results
+
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            distance = hamming_distance(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    pending.append(child)
+
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+class PerceptualHashIndex:
+    """
+    Índice persistente de hashes perceptuales de imágenes y videos
+
+    Los hashes se guardan en la tabla ``media_hashes`` y se cargan en un
+    BK-tree en memoria al crear el índice.
+    """
+
+    def __init__(self, db_manager, max_distance: int = 6):
+        """
+        Args:
+            db_manager: Instancia de DatabaseManager
+            max_distance: Distancia de Hamming máxima para considerar duplicado
+        """
+        self.db_manager = db_manager
+        self.max_distance = max_distance
+        self.logger = logger
+        self.tree = BKTree()
+
+        for media_hash in self.db_manager.get_media_hashes():
+            self.tree.add(int(media_hash.hash_value, 16), media_hash)
+        self.logger.info(f"Índice de hashes perceptuales cargado: {len(self.tree)} hashes")
+
+    def find_duplicate(self, hashes: Iterable[int]) -> Optional[Tuple[MediaHash, int]]:
+        """
+        Buscar un elemento ya visto que coincida con los hashes dados
+
+        Para imágenes se pasa un único hash. Para videos se pasan los hashes
+        de sus fotogramas clave y se exige que coincida al menos la mitad con
+        el mismo mensaje anterior.
+
+        Returns:
+            (hash coincidente, distancia mínima) o None si no hay duplicado
+        """
+        hashes = list(hashes)
+        if not hashes:
+            return None
+
+        matches: Counter = Counter()
+        best: Dict[Tuple[int, int], Tuple[MediaHash, int]] = {}
+        for value in hashes:
+            seen = set()
+            for distance, media_hash in self.tree.search(value, self.max_distance):
+                key = (media_hash.chat_id, media_hash.message_id)
+                if key in seen:
+                    continue
+                seen.add(key)
+                matches[key] += 1
+                if key not in best or distance < best[key][1]:
+                    best[key] = (media_hash, distance)
+
+        required = max(1, (len(hashes) + 1) // 2)
+        for key, count in matches.most_common():
+            if count >= required:
+                return best[key]
+        return None
+
+    def add(self, hashes: Iterable[int], kind: str, chat_id: int, message_id: int,
+            file_path: Optional[str] = None) -> None:
+        """
+        Registrar los hashes de un elemento procesado
+
+        Args:
+            hashes: Hashes de la imagen o de los fotogramas del video
+            kind: 'image' o 'video'
+            chat_id: Chat del mensaje con botones asociado
+            message_id: ID del mensaje con botones asociado
+            file_path: Ruta del archivo descargado (opcional)
+        """
+        for value in hashes:
+            media_hash = MediaHash(
+                hash_value=f"{value:016x}",
+                kind=kind,
+                chat_id=chat_id,
+                message_id=message_id,
+                file_path=file_path
+            )
+            if self.db_manager.save_media_hash(media_hash):
+                self.tree.add(value, media_hash)
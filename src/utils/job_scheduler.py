@@ -0,0 +1,204 @@
+"""
+Planificador de trabajos persistentes
+
+Los trabajos pesados (descargar un video largo y crear sus clips) se guardan
+en la tabla ``jobs`` antes de empezar. Cada manejador marca con
+``checkpoint`` las etapas que va completando junto con sus resultados
+(p. ej. la ruta del archivo descargado), de modo que un reintento o un
+reinicio del bot continúa desde la última etapa en lugar de empezar de cero.
+
+Los fallos se reintentan con espera exponencial hasta ``max_attempts``.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from src.config.logger import get_logger
+from src.database.models import Job
+from src.utils.job_tracker import JobTracker, cancelled_by_user
+from src.utils.priority import BULK, priority_lane
+
+logger = get_logger()
+
+JobHandler = Callable[[Job], Awaitable[bool]]
+
+
+class JobScheduler:
+    """Ejecutar trabajos guardados en la base de datos con reintentos"""
+
+    def __init__(
+        self,
+        db_manager,
+        jobs: Optional[JobTracker] = None,
+        concurrency: int = 2,
+        max_attempts: int = 5,
+        retry_base: float = 30,
+        retry_max: float = 3600
+    ):
+        """
+        Inicializar el planificador
+
+        Args:
+            db_manager: DatabaseManager con la tabla de trabajos
+            jobs: Registro de trabajos en curso (para el apagado ordenado)
+            concurrency: Trabajos ejecutándose a la vez
+            max_attempts: Intentos antes de marcar un trabajo como fallido
+            retry_base: Segundos de espera tras el primer fallo (se duplica en cada intento)
+            retry_max: Espera máxima entre intentos
+        """
+        self.db = db_manager
+        self.jobs = jobs or JobTracker()
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._handlers: Dict[str, Tuple[JobHandler, str]] = {}
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+
+    def register(self, kind: str, handler: JobHandler, lane: str = BULK) -> None:
+        """
+        Registrar el manejador de un tipo de trabajo
+
+        El manejador devuelve True si el trabajo terminó y False (o lanza una
+        excepción) si hay que reintentarlo.
+
+        Args:
+            kind: Tipo de trabajo
+            handler: Corrutina que ejecuta el trabajo
+            lane: Carril de prioridad en el que se ejecuta (masivo por defecto)
+        """
+        self._handlers[kind] = (handler, lane)
+
+    async def submit(self, kind: str, payload: dict) -> Optional[Job]:
+        """
+        Guardar un trabajo nuevo y ponerlo en marcha
+
+        Returns:
+            El trabajo creado o None si no se pudo guardar
+        """
+        job = Job(kind=kind, payload=payload)
+        if self.db.create_job(job) is None:
+            return None
+        logger.info(f"🗂️ Trabajo {job.id} ({kind}) en cola")
+        self._schedule(job.id)
+        return job
+
+    async def start(self) -> int:
+        """
+        Recuperar los trabajos pendientes o interrumpidos al arrancar
+
+        Returns:
+            Número de trabajos planificados
+        """
+        requeued = self.db.requeue_running_jobs()
+        if requeued:
+            logger.info(f"♻️ {requeued} trabajos interrumpidos se reanudarán desde su última etapa")
+
+        now = datetime.now()
+        pending = self.db.get_pending_jobs()
+        for job in pending:
+            delay = (job.next_run_at - now).total_seconds() if job.next_run_at else 0
+            self._schedule(job.id, max(0.0, delay))
+        if pending:
+            logger.info(f"🗂️ {len(pending)} trabajos pendientes planificados")
+        return len(pending)
+
+    def stop(self) -> None:
+        """Cancelar los reintentos planificados (siguen guardados en la base de datos)"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    async def checkpoint(self, job: Job, stage: str, **payload) -> None:
+        """
+        Marcar una etapa como completada y guardar sus resultados
+
+        Args:
+            job: Trabajo en curso
+            stage: Nombre de la etapa completada
+            **payload: Datos a añadir al payload (rutas, IDs de mensajes...)
+        """
+        job.stage = stage
+        job.payload.update(payload)
+        self.db.update_job(job)
+        logger.debug("Trabajo %s: etapa '%s' completada", job.id, stage)
+
+    def backoff(self, attempts: int) -> float:
+        """Segundos de espera antes del siguiente intento"""
+        return min(self.retry_max, self.retry_base * 2 ** max(0, attempts - 1))
+
+    def _schedule(self, job_id: int, delay: float = 0) -> None:
+        loop = asyncio.get_running_loop()
+        if delay > 0:
+            self._timers[job_id] = loop.call_later(delay, self._spawn, job_id)
+        else:
+            self._spawn(job_id)
+
+    def _spawn(self, job_id: int) -> None:
+        self._timers.pop(job_id, None)
+        if not self.jobs.accepting or job_id in self._running:
+            return
+        task = asyncio.create_task(self.jobs.wrap(self._run)(job_id))
+        self._running[job_id] = task
+        task.add_done_callback(lambda done: self._forget(job_id, done))
+
+    def _forget(self, job_id: int, task: asyncio.Task) -> None:
+        """Quitar la tarea terminada (si no la ha sustituido ya un reintento)"""
+        if self._running.get(job_id) is task:
+            del self._running[job_id]
+
+    async def _run(self, job_id: int) -> None:
+        async with self._semaphore:
+            job = self.db.get_job(job_id)
+            if job is None or job.state in ('done', 'failed', 'cancelled'):
+                return
+            if job.kind not in self._handlers:
+                logger.error(f"Trabajo {job.id}: tipo desconocido '{job.kind}'")
+                return
+            handler, lane = self._handlers[job.kind]
+
+            job.state = 'running'
+            job.attempts += 1
+            self.db.update_job(job)
+            logger.info(f"▶️ Trabajo {job.id} ({job.kind}) intento {job.attempts}, etapa: {job.stage or 'inicio'}")
+
+            error = None
+            try:
+                with priority_lane(lane):
+                    completed = await handler(job)
+            except asyncio.CancelledError as e:
+                if cancelled_by_user(e):
+                    job.state = 'cancelled'
+                    self.db.update_job(job)
+                    logger.info(f"🛑 Trabajo {job.id} cancelado por el usuario en la etapa {job.stage or 'inicio'}")
+                else:
+                    # Se queda en 'running': al arrancar se reanuda desde su etapa
+                    logger.info(f"⏸️ Trabajo {job.id} interrumpido en la etapa {job.stage or 'inicio'}")
+                raise
+            except Exception as e:
+                completed, error = False, str(e)
+
+            if completed:
+                job.state, job.last_error, job.next_run_at = 'done', None, None
+                self.db.update_job(job)
+                logger.info(f"✅ Trabajo {job.id} ({job.kind}) completado")
+                return
+
+            job.last_error = error or job.last_error or 'El manejador no completó el trabajo'
+            if job.attempts >= self.max_attempts:
+                job.state = 'failed'
+                self.db.update_job(job)
+                logger.error(f"❌ Trabajo {job.id} ({job.kind}) fallido tras {job.attempts} intentos: {job.last_error}")
+                return
+
+            delay = self.backoff(job.attempts)
+            job.state = 'pending'
+            job.next_run_at = datetime.now() + timedelta(seconds=delay)
+            self.db.update_job(job)
+            logger.warning(f"🔁 Trabajo {job.id} reintentará en {delay:.0f}s: {job.last_error}")
+
+        # Esta tarea ya termina: sin quitarla, un reintento inmediato no se lanzaría
+        self._running.pop(job_id, None)
+        self._schedule(job_id, delay)
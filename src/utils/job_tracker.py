@@ -0,0 +1,148 @@
+"""
+Seguimiento de los trabajos en curso para el apagado ordenado
+
+Los handlers registran la tarea de cada trabajo (un mensaje, un álbum, una
+pulsación de botón). Al apagar el bot se dejan de aceptar trabajos nuevos y
+se espera a que terminen los que están en marcha hasta un plazo; los que no
+terminan a tiempo se cancelan (las descargas conservan su archivo ``.part``
+para continuar tras el reinicio).
+
+Los trabajos largos también se registran como cancelables con una clave que
+viaja en el botón "Cancelar" de sus mensajes de progreso. La cancelación
+pedida por el usuario lleva el mensaje ``CANCELLED_BY_USER`` para que las
+descargas y ffmpeg borren sus archivos parciales en lugar de conservarlos.
+"""
+
+import asyncio
+import functools
+import uuid
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+# Mensaje de la cancelación pedida desde un botón (frente al apagado del bot)
+CANCELLED_BY_USER = 'cancelled_by_user'
+# Prefijo de los datos del botón "Cancelar"
+CANCEL_PREFIX = 'cancel:'
+
+
+def cancelled_by_user(exc: BaseException) -> bool:
+    """Indicar si una excepción es una cancelación pedida por el usuario"""
+    return isinstance(exc, asyncio.CancelledError) and CANCELLED_BY_USER in exc.args
+
+
+def message_key(chat_id: int, message_id: int) -> str:
+    """Clave de cancelación de un trabajo asociado a un mensaje con botones"""
+    return f"msg:{chat_id}:{message_id}"
+
+
+class JobTracker:
+    """Registro de las tareas de los trabajos en curso"""
+
+    def __init__(self):
+        self.accepting = True
+        self._tasks: Set[asyncio.Task] = set()
+        self._cancellable: Dict[str, asyncio.Task] = {}
+
+    @property
+    def active(self) -> int:
+        """Número de trabajos en curso"""
+        return len(self._tasks)
+
+    @contextmanager
+    def track(self):
+        """Registrar la tarea actual como trabajo mientras dura el bloque"""
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            yield task
+        finally:
+            self._tasks.discard(task)
+
+    def wrap(self, func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Envolver una corrutina para que cada llamada se registre como trabajo"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with self.track():
+                return await func(*args, **kwargs)
+        return wrapper
+
+    def spawn(self, func: Callable[..., Awaitable], *args, **kwargs) -> asyncio.Task:
+        """
+        Lanzar un trabajo en su propia tarea
+
+        La tarea queda registrada (y referenciada) desde que se crea hasta que
+        termina, así el apagado también la espera.
+
+        Returns:
+            La tarea creada
+        """
+        task = asyncio.ensure_future(func(*args, **kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    @contextmanager
+    def cancellable(self, key: Optional[str] = None):
+        """
+        Permitir cancelar la tarea actual con una clave mientras dura el bloque
+
+        Args:
+            key: Clave de cancelación (se genera una si no se indica)
+
+        Yields:
+            La clave, para ponerla en el botón "Cancelar"
+        """
+        key = key or uuid.uuid4().hex[:12]
+        task = asyncio.current_task()
+        self._cancellable[key] = task
+        try:
+            yield key
+        finally:
+            if self._cancellable.get(key) is task:
+                del self._cancellable[key]
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancelar el trabajo registrado con una clave
+
+        Returns:
+            True si había un trabajo en curso con esa clave
+        """
+        task = self._cancellable.get(key)
+        if task is None or task.done():
+            return False
+        logger.info(f"🛑 Cancelando trabajo {key}")
+        task.cancel(CANCELLED_BY_USER)
+        return True
+
+    def stop_accepting(self) -> None:
+        """Rechazar los trabajos nuevos a partir de ahora"""
+        self.accepting = False
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Esperar a los trabajos en curso y cancelar los que no terminen a tiempo
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            Número de trabajos cancelados
+        """
+        current = asyncio.current_task()
+        tasks = {task for task in self._tasks if task is not current and not task.done()}
+        if not tasks:
+            return 0
+
+        logger.info(f"⏳ Esperando a {len(tasks)} trabajos en curso (máximo {timeout:.0f}s)")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"🛑 {len(pending)} trabajos cancelados al agotar el plazo de apagado")
+            await asyncio.wait(pending, timeout=5)
+        return len(pending)
@@ -0,0 +1,170 @@
+"""
+Vigilancia del retraso del bucle de eventos
+
+Una tarea del bucle duerme intervalos cortos y mide cuánto se retrasa al
+despertar (lag). Un hilo vigilante comprueba el latido de esa tarea: si el
+bucle lleva más de ``threshold`` segundos sin responder, captura la pila del
+hilo del bucle con ``sys._current_frames`` para saber qué handler está
+ejecutando código síncrono (sqlite3, cálculo de hashes, E/S de archivos...).
+
+Cada incidente se registra en el log, en las métricas y, opcionalmente, se
+notifica a ``chat_me``.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.config.logger import get_logger
+from src.utils.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = get_logger()
+
+# Raíz del proyecto: las pilas se recortan a los frames del propio bot
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Módulos de decoradores que envuelven a los handlers y no los identifican
+_WRAPPER_FILES = ('metrics.py', 'tracing.py', 'job_tracker.py', 'priority.py')
+
+
+def handler_frames(stack: List[traceback.FrameSummary], root: str = PROJECT_ROOT) -> List[traceback.FrameSummary]:
+    """
+    Frames del código del bot que está ejecutando el bucle
+
+    Se recorre la pila desde el frame más interno hasta el primero que no
+    pertenece al proyecto (normalmente ``asyncio.events.Handle._run``).
+    """
+    frames = []
+    for frame in reversed(stack):
+        if not os.path.abspath(frame.filename).startswith(root + os.sep):
+            if frames:
+                break
+            continue
+        frames.append(frame)
+    frames.reverse()
+    return frames
+
+
+def handler_name(stack: List[traceback.FrameSummary], root: str = PROJECT_ROOT) -> str:
+    """Nombre de la función del bot más externa de la sección síncrona"""
+    frames = handler_frames(stack, root)
+    for frame in frames:
+        if os.path.basename(frame.filename) not in _WRAPPER_FILES:
+            return frame.name
+    if frames:
+        return frames[0].name
+    return stack[-1].name if stack else 'desconocido'
+
+
+class LoopWatchdog:
+    """Medir el lag del bucle y capturar la pila de los handlers que lo bloquean"""
+
+    def __init__(
+        self,
+        threshold: float = 0.5,
+        interval: float = 0.1,
+        notify: Optional[Callable[[str], Awaitable[Any]]] = None,
+        notify_interval: float = 300,
+        root: str = PROJECT_ROOT
+    ):
+        """
+        Inicializar el vigilante
+
+        Args:
+            threshold: Segundos de bloqueo a partir de los que se registra un incidente
+            interval: Segundos entre latidos de la tarea del bucle
+            notify: Corrutina opcional para avisar de los incidentes (p. ej. a chat_me)
+            notify_interval: Segundos mínimos entre dos avisos
+            root: Directorio del proyecto para recortar las pilas
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.notify = notify
+        self.notify_interval = notify_interval
+        self.root = root
+        self.incidents: List[Dict[str, Any]] = []
+
+        self._heartbeat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._captured_beat: Optional[float] = None
+        self._last_notified = float('-inf')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._notify_tasks = set()
+
+    async def run(self) -> None:
+        """Tarea del bucle: latidos, medición del lag e informe de incidentes"""
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        logger.info(f"🐶 Vigilancia del bucle de eventos activa (umbral {self.threshold * 1000:.0f}ms)")
+
+        try:
+            while True:
+                beat = time.perf_counter()
+                self._heartbeat = beat
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.perf_counter() - beat - self.interval)
+                LOOP_LAG_SECONDS.observe(lag)
+
+                incident, self._pending = self._pending, None
+                if incident is not None:
+                    incident['lag'] = lag
+                    self._report(incident)
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Detener el hilo vigilante"""
+        self._stop.set()
+
+    def _watch(self) -> None:
+        """Hilo vigilante: captura la pila del bucle cuando deja de latir"""
+        while not self._stop.wait(self.interval / 2):
+            beat = self._heartbeat
+            blocked = time.perf_counter() - beat - self.interval
+            if blocked < self.threshold or self._captured_beat == beat:
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            del frame
+            self._captured_beat = beat
+            incident = {
+                'handler': handler_name(stack, self.root),
+                'stack': ''.join(traceback.format_list(handler_frames(stack, self.root) or stack[-5:])),
+                'blocked_at': blocked
+            }
+            self._pending = incident
+            logger.warning(
+                "🐢 Bucle de eventos bloqueado %.0fms en %s:\n%s",
+                blocked * 1000, incident['handler'], incident['stack']
+            )
+
+    def _report(self, incident: Dict[str, Any]) -> None:
+        """Registrar un incidente ya resuelto en el log, las métricas y el aviso"""
+        self.incidents.append(incident)
+        LOOP_STALLS.inc(handler=incident['handler'])
+        logger.warning(
+            "🐢 El handler %s bloqueó el bucle de eventos %.2fs",
+            incident['handler'], incident['lag']
+        )
+
+        now = time.monotonic()
+        if self.notify and now - self._last_notified >= self.notify_interval:
+            self._last_notified = now
+            text = (
+                f"🐢 **Bucle de eventos bloqueado {incident['lag']:.2f}s**\n"
+                f"Handler: `{incident['handler']}`\n\n"
+                f"```\n{incident['stack'][-3000:]}```"
+            )
+            task = asyncio.create_task(self.notify(text))
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
@@ -0,0 +1,195 @@
+"""
+Caché gestionada de archivos descargados
+
+Registra en la base de datos cada archivo descargado con su tamaño, su
+último acceso y si está fijado por un mensaje con botones todavía activo.
+Los archivos no fijados se eliminan por antigüedad o, cuando se supera el
+tamaño máximo, empezando por los menos usados (LRU). El barrido también
+elimina las descargas incompletas (``.part``) que nadie ha continuado.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src.config.logger import get_logger
+from src.database.models import MediaFile
+
+logger = get_logger()
+
+# Sufijo de los archivos de descarga incompletos
+PART_SUFFIX = '.part'
+
+
+class MediaCache:
+    """
+    Política de retención de las descargas
+
+    Funcionalidades:
+    1. Registro de archivos descargados (fijados por defecto)
+    2. Actualización del último acceso al usarlos desde los botones
+    3. Eviction LRU de archivos no fijados por tamaño y por antigüedad
+    4. Barrido periódico en segundo plano
+    5. Limpieza de descargas incompletas abandonadas
+    """
+
+    def __init__(self, db_manager, max_bytes: int = 0, max_age_hours: float = 0,
+                 partial_dirs: Iterable[str] = (), partial_max_age_hours: float = 0):
+        """
+        Args:
+            db_manager: Instancia de DatabaseManager
+            max_bytes: Tamaño máximo de la caché (0 = sin límite)
+            max_age_hours: Horas sin acceso tras las que se elimina un archivo
+                no fijado (0 = sin límite)
+            partial_dirs: Directorios donde se descargan los archivos .part
+            partial_max_age_hours: Horas sin escribir tras las que se elimina
+                un archivo .part (0 = no se eliminan)
+        """
+        self.db_manager = db_manager
+        self.max_bytes = max_bytes
+        self.max_age = timedelta(hours=max_age_hours) if max_age_hours else None
+        self.partial_dirs = list(partial_dirs)
+        self.partial_max_age = partial_max_age_hours * 3600
+        self.logger = logger
+
+    def register(self, file_path: Optional[str], pinned: bool = True) -> None:
+        """
+        Registrar un archivo descargado
+
+        Args:
+            file_path: Ruta del archivo
+            pinned: Si está referenciado por un mensaje con botones activo
+        """
+        if not file_path or not os.path.exists(file_path):
+            return
+        self.db_manager.save_media_file(MediaFile(
+            file_path=file_path,
+            size=os.path.getsize(file_path),
+            pinned=pinned
+        ))
+
+    def touch(self, file_path: str) -> None:
+        """Marcar un archivo como usado recientemente"""
+        self.db_manager.touch_media_file(file_path)
+
+    def unpin(self, file_paths: Iterable[str]) -> None:
+        """Liberar archivos cuyo mensaje con botones ya no existe"""
+        for file_path in file_paths:
+            if file_path:
+                self.db_manager.set_media_file_pinned(file_path, False)
+
+    def forget(self, file_path: str) -> None:
+        """Olvidar un archivo eliminado por otra vía"""
+        self.db_manager.delete_media_file(file_path)
+
+    def _remove(self, media_file: MediaFile, reason: str) -> int:
+        """Eliminar un archivo de disco y de la caché, devolviendo los bytes liberados"""
+        freed = 0
+        try:
+            if os.path.exists(media_file.file_path):
+                freed = os.path.getsize(media_file.file_path)
+                os.remove(media_file.file_path)
+                self.logger.info(f"🧹 Archivo eliminado de la caché ({reason}): {media_file.file_path}")
+        except OSError as e:
+            self.logger.warning(f"No se pudo eliminar {media_file.file_path}: {e}")
+            return 0
+        self.db_manager.delete_media_file(media_file.file_path)
+        return freed
+
+    def make_room(self, bytes_needed: int) -> int:
+        """
+        Liberar espacio eliminando archivos no fijados en orden LRU
+
+        Args:
+            bytes_needed: Bytes que se quieren liberar
+
+        Returns:
+            Bytes liberados
+        """
+        freed = 0
+        for media_file in self.db_manager.get_media_files():
+            if freed >= bytes_needed:
+                break
+            if not media_file.pinned:
+                freed += self._remove(media_file, "espacio")
+        return freed
+
+    def enforce_limits(self) -> int:
+        """
+        Aplicar los límites de antigüedad y tamaño
+
+        Returns:
+            Bytes liberados
+        """
+        freed = 0
+        now = datetime.now()
+        remaining = []
+
+        for media_file in self.db_manager.get_media_files():
+            if not os.path.exists(media_file.file_path):
+                # Borrado fuera de la caché: solo limpiar el registro
+                self.db_manager.delete_media_file(media_file.file_path)
+                continue
+            if (self.max_age and not media_file.pinned and media_file.last_access
+                    and now - media_file.last_access > self.max_age):
+                freed += self._remove(media_file, "antigüedad")
+                continue
+            remaining.append(media_file)
+
+        if self.max_bytes:
+            total = sum(media_file.size for media_file in remaining)
+            for media_file in remaining:
+                if total <= self.max_bytes:
+                    break
+                if not media_file.pinned:
+                    freed += self._remove(media_file, "tamaño")
+                    total -= media_file.size
+
+        return freed
+
+    def remove_stale_partials(self) -> int:
+        """
+        Eliminar las descargas incompletas que llevan tiempo sin continuarse
+
+        Una descarga en curso escribe su .part continuamente, así que solo se
+        eliminan los que no se han modificado en ``partial_max_age_hours``
+        (descargas de mensajes que ya no existen o de trabajos fallidos).
+
+        Returns:
+            Bytes liberados
+        """
+        if not self.partial_max_age:
+            return 0
+        freed = 0
+        cutoff = time.time() - self.partial_max_age
+        for directory in self.partial_dirs:
+            for part_path in Path(directory).glob(f'*{PART_SUFFIX}'):
+                try:
+                    stat = part_path.stat()
+                    if stat.st_mtime < cutoff:
+                        part_path.unlink()
+                        freed += stat.st_size
+                        self.logger.info(f"🧹 Descarga incompleta abandonada eliminada: {part_path}")
+                except OSError as e:
+                    self.logger.warning(f"No se pudo eliminar {part_path}: {e}")
+        return freed
+
+    async def run_sweeper(self, interval: float = 600) -> None:
+        """
+        Barrer la caché periódicamente
+
+        Args:
+            interval: Segundos entre barridos
+        """
+        self.logger.info(f"🧹 Barrido de la caché de medios cada {interval:.0f}s")
+        while True:
+            try:
+                freed = self.enforce_limits() + self.remove_stale_partials()
+                if freed:
+                    self.logger.info(f"🧹 Barrido completado: {freed / (1024 * 1024):.1f}MB liberados")
+            except Exception as e:
+                self.logger.error(f"Error en el barrido de la caché de medios: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,213 @@
+"""
+Proxy HTTP local que sirve documentos de Telegram con peticiones por rango
+
+ffmpeg y ffprobe pueden abrir ``http://127.0.0.1:<puerto>/media/<id>`` como
+si fuera un archivo: cada salto se convierte en una petición ``Range`` que el
+proxy atiende descargando de Telegram solo los bloques necesarios, así que se
+empieza a trabajar en segundos y se transfiere únicamente lo que ffmpeg lee.
+
+Solo se sirven los documentos registrados con ``url_for`` (hace falta el
+objeto de Telethon con su ``access_hash``). Los bloques se leen con
+``TelegramMessenger.download_range``, que usa la caché de bloques: ffmpeg
+vuelve a pedir las cabeceras y el índice varias veces.
+"""
+
+import asyncio
+import re
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Optional, Tuple
+
+from src.config.logger import get_logger
+from src.utils.priority import current_lane, priority_lane
+
+logger = get_logger()
+
+# Tamaño de los bloques que se piden (múltiplo de los 4KB que exige Telegram)
+BLOCK_SIZE = 512 * 1024
+# Documentos registrados que se recuerdan (los más antiguos se olvidan)
+MAX_DOCUMENTS = 256
+# Bloques que se piden de una vez: empieza en 1 y se dobla en las lecturas secuenciales
+MAX_RUN_BLOCKS = 8
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_PATH = re.compile(r'^/media/(\d+)$')
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpretar una cabecera ``Range`` de un solo rango
+
+    Args:
+        header: Valor de la cabecera (o None)
+        size: Tamaño del documento
+
+    Returns:
+        (primer byte, último byte) incluidos; None si no hay rango o no se
+        entiende (se sirve el documento completo)
+
+    Raises:
+        ValueError: Si el rango queda fuera del documento
+    """
+    match = _RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Sufijo: los últimos N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise ValueError(header)
+    return first, last
+
+
+class MediaProxy:
+    """Servidor HTTP local con los documentos de Telegram registrados"""
+
+    def __init__(self, messenger, host: str = '127.0.0.1', port: int = 0):
+        """
+        Inicializar el proxy
+
+        Args:
+            messenger: TelegramMessenger con el que se descargan los bloques
+            host: Interfaz de escucha (solo local)
+            port: Puerto TCP (0 = uno libre)
+        """
+        self.messenger = messenger
+        self.host = host
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+        # id del documento -> (media, tamaño, carril de quien lo registró)
+        self._documents: 'OrderedDict[int, Tuple[Any, int, str]]' = OrderedDict()
+
+    async def start(self) -> asyncio.AbstractServer:
+        """Empezar a escuchar (con el puerto 0 se elige uno libre)"""
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"🎞️ Proxy de medios en http://{self.host}:{self.port}/media/")
+        return self.server
+
+    def close(self) -> None:
+        """Dejar de aceptar conexiones"""
+        if self.server:
+            self.server.close()
+            self.server = None
+
+    @property
+    def running(self) -> bool:
+        return self.server is not None
+
+    def url_for(self, source: Any) -> Optional[str]:
+        """
+        Registrar el documento de un mensaje y devolver su URL
+
+        Las peticiones a la URL se atienden en el carril de prioridad de
+        quien la registra.
+
+        Args:
+            source: Mensaje o fuente con ``media`` (documento)
+
+        Returns:
+            URL local del documento o None si no es un documento o el proxy
+            no está en marcha
+        """
+        media = getattr(source, 'media', None)
+        document = getattr(media, 'document', None)
+        size = self.messenger._get_media_size(media) if media else 0
+        if not self.running or document is None or not size:
+            return None
+
+        self._documents[document.id] = (media, size, current_lane())
+        self._documents.move_to_end(document.id)
+        while len(self._documents) > MAX_DOCUMENTS:
+            self._documents.popitem(last=False)
+        return f"http://{self.host}:{self.port}/media/{document.id}"
+
+    async def read_blocks(self, media: Any, first: int, count: int):
+        """
+        Bloques de un documento
+
+        Se piden en tandas crecientes (1, 2, 4...) para que un salto de
+        ffmpeg apenas descargue de más y una lectura secuencial use pocas
+        peticiones.
+
+        Yields:
+            Contenido de cada bloque, en orden
+        """
+        block, end, run = first, first + count, 1
+        source = SimpleNamespace(media=media)
+        while block < end:
+            length = min(run, end - block)
+            data = await self.messenger.download_range(source, block * BLOCK_SIZE, length * BLOCK_SIZE)
+            if not data:
+                return
+            for i in range(0, len(data), BLOCK_SIZE):
+                yield data[i:i + BLOCK_SIZE]
+                block += 1
+            run = min(run * 2, MAX_RUN_BLOCKS)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode('latin-1').split()
+            match = _PATH.match(parts[1].split('?')[0]) if len(parts) >= 2 else None
+            document_id = int(match.group(1)) if match else None
+            if document_id not in self._documents or parts[0] not in ('GET', 'HEAD'):
+                self._write_head(writer, '404 Not Found', {'Content-Length': '0'})
+                return
+
+            media, size, lane = self._documents[document_id]
+            try:
+                requested = parse_range(headers.get('range'), size)
+            except ValueError:
+                self._write_head(writer, '416 Range Not Satisfiable', {
+                    'Content-Length': '0', 'Content-Range': f"bytes */{size}"
+                })
+                return
+
+            first, last = requested or (0, size - 1)
+            response_headers = {'Content-Type': 'application/octet-stream', 'Content-Length': str(last - first + 1)}
+            if requested:
+                response_headers['Content-Range'] = f"bytes {first}-{last}/{size}"
+            self._write_head(writer, '206 Partial Content' if requested else '200 OK', response_headers)
+            if parts[0] == 'GET':
+                with priority_lane(lane):
+                    await self._send_range(writer, media, first, last)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # ffmpeg cierra la conexión al saltar a otra posición
+            pass
+        except Exception as e:
+            logger.debug("Error sirviendo un documento por el proxy: %s", e)
+        finally:
+            writer.close()
+
+    async def _send_range(self, writer: asyncio.StreamWriter, media: Any, first: int, last: int) -> None:
+        first_block, last_block = first // BLOCK_SIZE, last // BLOCK_SIZE
+        block = first_block
+        async for chunk in self.read_blocks(media, first_block, last_block - first_block + 1):
+            start = first - block * BLOCK_SIZE if block == first_block else 0
+            end = last - block * BLOCK_SIZE + 1 if block == last_block else len(chunk)
+            writer.write(chunk[start:end])
+            # No pedir más bloques hasta que ffmpeg lea los anteriores
+            await writer.drain()
+            block += 1
+
+    @staticmethod
+    def _write_head(writer: asyncio.StreamWriter, status: str, headers: dict) -> None:
+        lines = [f"HTTP/1.1 {status}", "Accept-Ranges: bytes", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
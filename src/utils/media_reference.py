@@ -0,0 +1,76 @@
+"""
+Referencias persistentes a documentos de Telegram
+
+Permite guardar en la base de datos la referencia (id, access_hash y
+file_reference) de un documento para reenviarlo o descargarlo más tarde
+aunque el mensaje original ya se haya borrado.
+
+El ``file_reference`` caduca al cabo de unas horas: siempre que se pueda hay
+que volver a obtener el mensaje que conserva el documento
+(``TelegramMessenger.refresh_media``) y usar esta referencia solo como
+reserva.
+"""
+
+from typing import Any, Dict, Optional
+
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+
+def document_to_dict(document: Any) -> Optional[Dict[str, Any]]:
+    """
+    Serializar la referencia de un documento
+
+    Args:
+        document: Documento de Telegram (o un MessageMediaDocument)
+
+    Returns:
+        Diccionario serializable en JSON o None si no es un documento
+    """
+    if isinstance(document, MessageMediaDocument):
+        document = document.document
+    if not isinstance(document, Document):
+        return None
+
+    file_name = None
+    for attr in document.attributes or []:
+        if isinstance(attr, DocumentAttributeFilename):
+            file_name = attr.file_name
+            break
+
+    return {
+        'id': document.id,
+        'access_hash': document.access_hash,
+        'file_reference': (document.file_reference or b'').hex(),
+        'dc_id': document.dc_id,
+        'size': document.size,
+        'mime_type': document.mime_type,
+        'file_name': file_name
+    }
+
+
+def document_from_dict(data: Dict[str, Any]) -> MessageMediaDocument:
+    """
+    Reconstruir un documento a partir de su referencia serializada
+
+    El resultado sirve tanto para ``send_file`` como para ``download_media``.
+
+    Args:
+        data: Diccionario creado con ``document_to_dict``
+
+    Returns:
+        MessageMediaDocument con el documento referenciado
+    """
+    attributes = []
+    if data.get('file_name'):
+        attributes.append(DocumentAttributeFilename(data['file_name']))
+
+    return MessageMediaDocument(document=Document(
+        id=data['id'],
+        access_hash=data['access_hash'],
+        file_reference=bytes.fromhex(data.get('file_reference') or ''),
+        date=None,
+        mime_type=data.get('mime_type') or 'application/octet-stream',
+        size=data.get('size') or 0,
+        dc_id=data['dc_id'],
+        attributes=attributes
+    ))
@@ -0,0 +1,350 @@
+"""
+Métricas del bot en formato de exposición de Prometheus
+
+Registro mínimo de contadores e histogramas de latencia sin dependencias
+externas. Las métricas se publican en un puerto HTTP local (``/metrics``)
+y se resumen en el comando ``/metrics`` del bot.
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+# Límites (en segundos) de los buckets de latencia por defecto
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _default_outcome(result: Any) -> str:
+    """Resultado de una llamada: los métodos del bot devuelven None/False al fallar"""
+    if result is None or result is False:
+        return 'error'
+    if isinstance(result, tuple) and result and result[0] is False:
+        return 'error'
+    return 'ok'
+
+
+def exception_outcome(result: Any) -> str:
+    """Resultado de una etapa que no devuelve nada: solo una excepción es error"""
+    return 'ok'
+
+
+def db_outcome(result: Any) -> str:
+    """Resultado de una operación de base de datos: solo False indica error"""
+    return 'error' if result is False else 'ok'
+
+
+class Counter:
+    """Contador monótono con etiquetas"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Incrementar el contador"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Valor actual para unas etiquetas"""
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram(Counter):
+    """Histograma de latencias con buckets acumulados"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteos por bucket (+Inf al final), suma, total]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Registrar una observación"""
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][bisect_left(self.buckets, value)] += 1
+            data[1] += value
+            data[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Medir la duración de un bloque
+
+        Añade la etiqueta ``outcome`` ('ok' o 'error' si sale con excepción)
+        cuando el histograma la declara.
+        """
+        started = time.perf_counter()
+        outcome = 'ok'
+        try:
+            yield
+        except BaseException:
+            outcome = 'error'
+            raise
+        finally:
+            if 'outcome' in self.labelnames:
+                labels['outcome'] = outcome
+            self.observe(time.perf_counter() - started, **labels)
+
+    def stats(self) -> List[Tuple[Dict[str, str], int, float, float]]:
+        """
+        Resumen por etiquetas
+
+        Returns:
+            Lista de (etiquetas, total, media, p95 aproximado por buckets)
+        """
+        result = []
+        for key, (counts, total_sum, total) in sorted(self._values.items()):
+            target = total * 0.95
+            accumulated, p95 = 0, float('inf')
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                accumulated += count
+                if accumulated >= target:
+                    p95 = bound
+                    break
+            result.append((dict(zip(self.labelnames, key)), total, total_sum / total if total else 0.0, p95))
+        return result
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, (counts, total_sum, total) in sorted(self._values.items()):
+            accumulated = 0
+            for bound, count in zip(self.buckets, counts):
+                accumulated += count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {accumulated}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {total}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total_sum:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas con salida en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Counter] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Crear (o recuperar) un contador"""
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, documentation, labelnames)
+        return self._metrics[name]
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Crear (o recuperar) un histograma"""
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+        return self._metrics[name]
+
+    def histograms(self) -> List[Histogram]:
+        return [metric for metric in self._metrics.values() if isinstance(metric, Histogram)]
+
+    def render(self) -> str:
+        """Exposición en formato de texto de Prometheus (versión 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'bot_stage_duration_seconds',
+    'Duración de cada etapa de los handlers',
+    ('handler', 'stage', 'outcome')
+)
+TELEGRAM_API_SECONDS = REGISTRY.histogram(
+    'bot_telegram_api_duration_seconds',
+    'Duración de las llamadas a la API de Telegram por método y resultado',
+    ('method', 'outcome')
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    'bot_db_query_duration_seconds',
+    'Duración de las operaciones de base de datos',
+    ('operation', 'outcome'),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+BYTES_DOWNLOADED = REGISTRY.counter(
+    'bot_downloaded_bytes_total',
+    'Bytes descargados de Telegram',
+    ('method',)
+)
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'bot_event_loop_lag_seconds',
+    'Retraso del bucle de eventos al despertar de cada latido',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+LOOP_STALLS = REGISTRY.counter(
+    'bot_event_loop_stalls_total',
+    'Bloqueos del bucle de eventos por encima del umbral, por handler',
+    ('handler',)
+)
+PRIORITY_WAIT_SECONDS = REGISTRY.histogram(
+    'bot_priority_wait_seconds',
+    'Espera hasta obtener un hueco de la API de Telegram o de ffmpeg, por carril',
+    ('resource', 'lane')
+)
+CHUNK_CACHE_BYTES = REGISTRY.counter(
+    'bot_chunk_cache_bytes_total',
+    'Bytes de documentos servidos desde la caché de bloques (hit) o guardados tras descargarlos (miss)',
+    ('result',)
+)
+
+
+def timed(histogram: Histogram, label: Optional[str] = None,
+          outcome: Callable[[Any], str] = _default_outcome, **labels) -> Callable:
+    """
+    Decorador que mide la duración de una función (síncrona o asíncrona)
+
+    Args:
+        histogram: Histograma donde registrar la duración
+        label: Etiqueta que recibe el nombre de la función (p. ej. 'method')
+        outcome: Función que clasifica el resultado en 'ok' o 'error'
+        **labels: Etiquetas fijas adicionales
+    """
+    def decorator(func: Callable) -> Callable:
+        func_labels = dict(labels)
+        if label:
+            func_labels[label] = func.__name__
+
+        def record(started: float, result_outcome: str) -> None:
+            observed = dict(func_labels)
+            if 'outcome' in histogram.labelnames:
+                observed['outcome'] = result_outcome
+            histogram.observe(time.perf_counter() - started, **observed)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    record(started, 'error')
+                    raise
+                record(started, outcome(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                record(started, 'error')
+                raise
+            record(started, outcome(result))
+            return result
+        return wrapper
+
+    return decorator
+
+
+def format_summary(registry: MetricsRegistry = REGISTRY, limit: int = 15) -> str:
+    """
+    Resumen legible de los histogramas para el comando /metrics
+
+    Se muestran las entradas con más tiempo acumulado.
+    """
+    rows = []
+    for histogram in registry.histograms():
+        for labels, total, mean, p95 in histogram.stats():
+            name = '/'.join(value for key, value in labels.items() if key != 'outcome')
+            rows.append((total * mean, name, labels.get('outcome', ''), total, mean, p95))
+
+    if not rows:
+        return "📊 **Métricas**\n\nTodavía no hay datos."
+
+    rows.sort(reverse=True)
+    lines = ["📊 **Métricas** (más tiempo acumulado)", ""]
+    for _, name, outcome, total, mean, p95 in rows[:limit]:
+        mark = "❌" if outcome == 'error' else "•"
+        p95_text = f"{p95:g}s" if p95 != float('inf') else "+Inf"
+        lines.append(f"{mark} `{name}`: {total}× media {mean:.3f}s p95≤{p95_text}")
+    return '\n'.join(lines)
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = REGISTRY) -> asyncio.AbstractServer:
+    """
+    Publicar las métricas en ``http://host:port/metrics``
+
+    Args:
+        host: Interfaz de escucha (por defecto solo local)
+        port: Puerto TCP
+        registry: Registro de métricas a exponer
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Descartar las cabeceras de la petición
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', registry.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.debug("Error sirviendo métricas: %s", e)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"📊 Métricas disponibles en http://{host}:{port}/metrics")
+    return server
@@ -1 +1,7 @@
-# model_hf package
\ No newline at end of file
+"""
+Análisis de imágenes con modelos locales de Hugging Face
+"""
+
+from .inference import InferenceService
+
+__all__ = ['InferenceService']
@@ -0,0 +1,360 @@
+"""
+Servicio de inferencia local por lotes para análisis de imágenes
+
+El modelo de Hugging Face se carga una sola vez en cada proceso del pool.
+Las peticiones concurrentes de ``analyze`` se agrupan en micro-lotes (hasta
+``batch_size`` imágenes o ``batch_wait_ms`` milisegundos) que se ejecutan en
+un ``ProcessPoolExecutor`` para no bloquear nunca el bucle de eventos.
+
+Ni transformers ni los pesos se importan en el proceso principal: el modelo
+se carga en segundo plano tras el arranque (``warm_up``) o, como muy tarde,
+con la primera imagen que se analiza.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.logger import configure_worker_logging, get_logger, worker_logging_args
+
+logger = get_logger()
+
+# Modelo cargado en el proceso trabajador (uno por proceso)
+_MODEL = None
+# Barrera del arranque: obliga a que todos los procesos del pool estén vivos a la vez
+_READY_BARRIER = None
+# Segundos máximos que un proceso espera a que los demás carguen el modelo
+WORKER_READY_TIMEOUT = 600
+
+
+def _init_worker(
+    model_name: str,
+    task: str,
+    token: Optional[str],
+    logging_args: tuple,
+    barrier: Optional[Any] = None
+) -> None:
+    """Configurar el logging y cargar el modelo en el proceso trabajador"""
+    global _MODEL, _READY_BARRIER
+    configure_worker_logging(*logging_args)
+    _READY_BARRIER = barrier
+    # Importación diferida: transformers es una dependencia opcional y pesada
+    from transformers import pipeline
+
+    _MODEL = pipeline(task, model=model_name, token=token or None, device=-1)
+
+
+def _worker_ready() -> bool:
+    """
+    Comprobar que el modelo está cargado en el proceso trabajador
+
+    Con barrera, cada llamada se queda esperando hasta que las demás lleguen:
+    así ningún proceso puede atender dos comprobaciones y el pool tiene que
+    arrancar (y cargar el modelo en) todos sus procesos.
+    """
+    if _READY_BARRIER is not None:
+        _READY_BARRIER.wait(timeout=WORKER_READY_TIMEOUT)
+    return _MODEL is not None
+
+
+def _normalize(prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """Unificar la salida de clasificación y detección de objetos"""
+    return {
+        'label': prediction.get('label'),
+        'score': float(prediction.get('score', 0.0)),
+        'box': prediction.get('box')
+    }
+
+
+def _run_batch(image_paths: List[str]) -> List[List[Dict[str, Any]]]:
+    """Ejecutar el modelo sobre un lote de imágenes en el proceso trabajador"""
+    from PIL import Image
+
+    images = [Image.open(path).convert('RGB') for path in image_paths]
+    outputs = _MODEL(images, batch_size=len(images))
+    results = []
+    for output in outputs:
+        if isinstance(output, dict):
+            output = [output]
+        results.append([_normalize(prediction) for prediction in output])
+    return results
+
+
+class InferenceService:
+    """
+    Servicio de inferencia por micro-lotes
+
+    Funcionalidades:
+    1. Carga única del modelo al arrancar (en los procesos del pool)
+    2. Agrupación de peticiones concurrentes en lotes
+    3. Escritura de detecciones en disco y en la base de datos
+    4. Medición del rendimiento en imágenes por segundo
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        task: str = 'object-detection',
+        token: Optional[str] = None,
+        batch_size: int = 8,
+        batch_wait_ms: int = 50,
+        workers: int = 1,
+        min_score: float = 0.5,
+        detections_dir: str = 'detections',
+        db_manager=None,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            model_name: Modelo de Hugging Face (ID del hub o ruta local)
+            task: Tarea del pipeline ('object-detection', 'image-classification'...)
+            token: Token de Hugging Face para modelos privados
+            batch_size: Máximo de imágenes por lote
+            batch_wait_ms: Espera máxima para completar un lote
+            workers: Procesos del pool de inferencia
+            min_score: Puntuación mínima para conservar una detección
+            detections_dir: Directorio donde escribir las detecciones
+            db_manager: Instancia de DatabaseManager (opcional)
+            executor: Ejecutor alternativo (por defecto un pool de procesos)
+        """
+        self.model_name = model_name
+        self.task = task
+        self.token = token
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+        self.workers = max(1, workers)
+        self.min_score = min_score
+        self.detections_dir = Path(detections_dir)
+        self.db_manager = db_manager
+        self.logger = logger
+
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        self._start_task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.failed = False
+
+        # Métricas de rendimiento
+        self.images_processed = 0
+        self.batches_processed = 0
+        self.inference_seconds = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        """Rendimiento medio del modelo en imágenes por segundo"""
+        if not self.inference_seconds:
+            return 0.0
+        return self.images_processed / self.inference_seconds
+
+    @property
+    def status(self) -> str:
+        """Estado legible del modelo para los comandos del bot"""
+        if self.ready:
+            return "listo"
+        if self.failed:
+            return "error al cargar"
+        if self._start_task:
+            return "cargando"
+        return "sin cargar"
+
+    def warm_up(self) -> asyncio.Task:
+        """
+        Lanzar la carga del modelo en segundo plano (idempotente)
+
+        Returns:
+            Tarea de arranque compartida por todos los que esperan al modelo
+        """
+        if self._start_task is None:
+            self._start_task = asyncio.create_task(self.start())
+        return self._start_task
+
+    async def ensure_started(self) -> bool:
+        """Esperar a que el modelo esté cargado, cargándolo si hace falta"""
+        if self.ready:
+            return True
+        if self.failed:
+            return False
+        return await asyncio.shield(self.warm_up())
+
+    async def start(self) -> bool:
+        """
+        Arrancar el pool y cargar el modelo en todos sus procesos
+
+        Returns:
+            True si el servicio quedó listo
+        """
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            context = multiprocessing.get_context('spawn')
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(
+                    self.model_name, self.task, self.token,
+                    worker_logging_args(context), context.Barrier(self.workers)
+                )
+            )
+
+        started = time.perf_counter()
+        try:
+            # Una comprobación por proceso: la barrera obliga a que cada una
+            # caiga en un proceso distinto, así todos cargan el modelo ya
+            loaded = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, _worker_ready)
+                for _ in range(self.workers)
+            ))
+            if not all(loaded):
+                raise RuntimeError("el modelo no quedó cargado en todos los procesos")
+        except Exception as e:
+            self.logger.error(f"❌ No se pudo cargar el modelo {self.model_name}: {e}")
+            await self.stop()
+            self.failed = True
+            return False
+
+        self._queue = asyncio.Queue()
+        self._batch_task = asyncio.create_task(self._batch_loop())
+        self.ready = True
+        self.logger.info(
+            f"🧠 Modelo {self.model_name} cargado en {self.workers} procesos "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+        return True
+
+    async def stop(self) -> None:
+        """Detener el agrupador y el pool de procesos"""
+        self.ready = False
+        if self._batch_task:
+            self._batch_task.cancel()
+            self._batch_task = None
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def analyze(
+        self,
+        image_path: str,
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        media_path: Optional[str] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Analizar una imagen (se agrupa con otras peticiones concurrentes)
+
+        Args:
+            image_path: Ruta de la imagen que se analiza (puede ser temporal)
+            chat_id: Chat del mensaje asociado (para la base de datos)
+            message_id: ID del mensaje asociado (para la base de datos)
+            media_path: Ruta persistente del archivo descargado (None si el
+                medio solo se conserva en Telegram, p. ej. una foto)
+
+        Returns:
+            Lista de detecciones o None si el servicio no está disponible
+        """
+        if not await self.ensure_started():
+            return None
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image_path, chat_id, message_id, media_path, future))
+        return await future
+
+    async def _collect_batch(
+        self
+    ) -> List[Tuple[str, Optional[int], Optional[int], Optional[str], asyncio.Future]]:
+        """Esperar una petición y completar el lote hasta el tamaño o el tiempo máximo"""
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self) -> None:
+        """Bucle principal: agrupar, inferir y repartir resultados"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            paths = [item[0] for item in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, _run_batch, paths)
+            except Exception as e:
+                self.logger.error(f"❌ Error en la inferencia de un lote de {len(paths)} imágenes: {e}")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+                continue
+
+            elapsed = time.perf_counter() - started
+            self.images_processed += len(paths)
+            self.batches_processed += 1
+            self.inference_seconds += elapsed
+            self.logger.info(
+                f"🧠 Lote de {len(paths)} imágenes en {elapsed:.2f}s "
+                f"({len(paths) / elapsed if elapsed else 0:.1f} img/s, media {self.images_per_second:.1f} img/s)"
+            )
+
+            for (path, chat_id, message_id, media_path, future), detections in zip(batch, results):
+                detections = [d for d in detections if d['score'] >= self.min_score]
+                try:
+                    await asyncio.to_thread(
+                        self._store_detections, path, chat_id, message_id, media_path, detections
+                    )
+                except Exception as e:
+                    self.logger.error(f"Error guardando detecciones de {path}: {e}")
+                if not future.done():
+                    future.set_result(detections)
+
+    def _store_detections(
+        self,
+        image_path: str,
+        chat_id: Optional[int],
+        message_id: Optional[int],
+        media_path: Optional[str],
+        detections: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Escribir las detecciones en el directorio de detecciones y en la base de datos
+
+        El JSON se nombra por chat y mensaje (los nombres de archivo se
+        repiten entre chats) y guarda la ruta persistente del medio, nunca la
+        de la variante temporal que se analizó.
+        """
+        self.detections_dir.mkdir(parents=True, exist_ok=True)
+        if chat_id is not None and message_id is not None:
+            output = self.detections_dir / f"{chat_id}_{message_id}.json"
+        else:
+            output = self.detections_dir / f"{Path(media_path or image_path).stem}.json"
+        output.write_text(json.dumps({
+            'file_path': media_path,
+            'model': self.model_name,
+            'chat_id': chat_id,
+            'message_id': message_id,
+            'detections': detections
+        }, ensure_ascii=False, indent=2), encoding='utf-8')
+
+        if self.db_manager:
+            from src.database.models import Detection
+
+            self.db_manager.save_detections([
+                Detection(
+                    # Sin ruta local el medio se identifica por chat y mensaje
+                    file_path=media_path or '',
+                    label=detection['label'],
+                    score=detection['score'],
+                    box=detection.get('box'),
+                    model=self.model_name,
+                    chat_id=chat_id,
+                    message_id=message_id
+                )
+                for detection in detections
+            ])
@@ -0,0 +1,306 @@
+"""
+Índice de muestras de un MP4 a partir de su caja ``moov``
+
+Permite saber qué bytes de un video hacen falta para cortar un fragmento sin
+descargarlo entero: se leen las cajas de primer nivel con lecturas por rango
+hasta encontrar ``moov`` y, con sus tablas de muestras (``stts``, ``stss``,
+``stsc``, ``stsz`` y ``stco``/``co64``), se calcula dónde está cada muestra
+de audio y video.
+
+Los MP4 fragmentados (``moof``) no tienen las muestras en ``moov`` y no se
+admiten.
+"""
+
+import struct
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Lector de rangos del archivo remoto: (offset, longitud) -> bytes
+ReadRange = Callable[[int, int], Awaitable[bytes]]
+# Rango de bytes: (offset, longitud)
+ByteRange = Tuple[int, int]
+
+# Cajas con las que puede empezar un MP4
+_FIRST_BOXES = {b'ftyp', b'free', b'skip', b'wide', b'mdat'}
+# Pistas con muestras que ffmpeg necesita leer para cortar un clip
+_MEDIA_TRACKS = ('vide', 'soun')
+# Huecos menores que esto entre rangos se descargan igualmente (menos peticiones)
+MERGE_GAP = 64 * 1024
+
+
+class Mp4IndexError(Exception):
+    """El archivo no es un MP4 con un índice ``moov`` utilizable"""
+
+
+@dataclass
+class Mp4Track:
+    """Tabla de muestras de una pista"""
+    kind: str  # 'vide', 'soun', ...
+    timescale: int
+    times: List[int] = field(default_factory=list)  # Instante de decodificación de cada muestra
+    offsets: List[int] = field(default_factory=list)
+    sizes: List[int] = field(default_factory=list)
+    sync: Optional[List[int]] = None  # Índices de los fotogramas clave (None = todas lo son)
+
+    @property
+    def duration(self) -> float:
+        return self.times[-1] / self.timescale if self.times else 0.0
+
+    def sample_range(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        Muestras que cubren el intervalo, empezando en el fotograma clave anterior
+
+        Returns:
+            (primera, última + 1)
+        """
+        first = max(0, bisect_right(self.times, int(start * self.timescale)) - 1)
+        if self.sync:
+            index = bisect_right(self.sync, first) - 1
+            first = self.sync[index] if index >= 0 else 0
+        last = max(first + 1, bisect_right(self.times, int(end * self.timescale)))
+        return first, min(last, len(self.times))
+
+
+@dataclass
+class Mp4Index:
+    """Índice de un MP4: pistas, duración y posición de las cajas de cabecera"""
+    file_size: int
+    duration: float
+    tracks: List[Mp4Track]
+    header_ranges: List[ByteRange]  # ftyp y moov
+
+    def byte_ranges(self, start: float, end: float, margin: float = 1.0) -> List[ByteRange]:
+        """
+        Rangos de bytes necesarios para decodificar el intervalo [start, end]
+
+        Incluye las muestras desde el fotograma clave anterior a ``start`` y
+        un margen por ambos lados para el audio y las listas de edición.
+
+        Args:
+            start: Segundo inicial
+            end: Segundo final
+            margin: Segundos extra a cada lado
+
+        Returns:
+            Rangos ordenados y fusionados
+        """
+        ranges = []
+        for track in self.tracks:
+            if track.kind not in _MEDIA_TRACKS or not track.times:
+                continue
+            first, last = track.sample_range(max(0.0, start - margin), end + margin)
+            for i in range(first, last):
+                ranges.append((track.offsets[i], track.sizes[i]))
+        return merge_ranges(ranges)
+
+    def clip_ranges(self, starts: List[float], clip_duration: float) -> List[ByteRange]:
+        """
+        Rangos de bytes para cortar varios clips, con las cabeceras y el primer segundo
+
+        ffmpeg lee las primeras muestras al abrir el archivo para detectar los
+        códecs, así que también se incluyen.
+        """
+        ranges = list(self.header_ranges) + self.byte_ranges(0, 0, margin=1.0)
+        for start in starts:
+            ranges += self.byte_ranges(start, start + clip_duration)
+        return merge_ranges(ranges)
+
+
+def merge_ranges(ranges: List[ByteRange], gap: int = MERGE_GAP) -> List[ByteRange]:
+    """Ordenar y fusionar rangos que se solapan o están separados por menos de ``gap`` bytes"""
+    merged: List[List[int]] = []
+    for offset, length in sorted(ranges):
+        if length <= 0:
+            continue
+        if merged and offset <= merged[-1][0] + merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], offset + length - merged[-1][0])
+        else:
+            merged.append([offset, length])
+    return [(offset, length) for offset, length in merged]
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Recorrer las cajas de un bloque: (tipo, inicio del contenido, fin de la caja)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise Mp4IndexError(f"Caja {box_type!r} corrupta en {pos}")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_boxes(data: bytes, start: int, end: int) -> Dict[bytes, Tuple[int, int]]:
+    return {box_type: (body, box_end) for box_type, body, box_end in _iter_boxes(data, start, end)}
+
+
+def _full_box(data: bytes, body: int) -> Tuple[int, int]:
+    """Versión y posición del contenido de una caja completa (con versión y flags)"""
+    return data[body], body + 4
+
+
+def _parse_track(data: bytes, body: int, end: int) -> Optional[Mp4Track]:
+    mdia = _find_boxes(data, body, end).get(b'mdia')
+    if not mdia:
+        return None
+    mdia_boxes = _find_boxes(data, *mdia)
+    if b'mdhd' not in mdia_boxes or b'hdlr' not in mdia_boxes or b'minf' not in mdia_boxes:
+        return None
+
+    version, pos = _full_box(data, mdia_boxes[b'mdhd'][0])
+    timescale = struct.unpack_from('>I', data, pos + (16 if version == 1 else 8))[0]
+    _, pos = _full_box(data, mdia_boxes[b'hdlr'][0])
+    kind = data[pos + 4:pos + 8].decode('latin-1')
+
+    stbl = _find_boxes(data, *mdia_boxes[b'minf']).get(b'stbl')
+    if not stbl or not timescale:
+        return None
+    tables = _find_boxes(data, *stbl)
+    if b'stz2' in tables:
+        raise Mp4IndexError("Tablas stz2 no admitidas")
+    if b'stts' not in tables or b'stsz' not in tables or b'stsc' not in tables:
+        return None
+
+    track = Mp4Track(kind=kind, timescale=timescale)
+
+    # Tamaños
+    _, pos = _full_box(data, tables[b'stsz'][0])
+    sample_size, count = struct.unpack_from('>II', data, pos)
+    track.sizes = [sample_size] * count if sample_size else list(struct.unpack_from(f'>{count}I', data, pos + 8))
+
+    # Instantes de decodificación
+    _, pos = _full_box(data, tables[b'stts'][0])
+    entries = struct.unpack_from('>I', data, pos)[0]
+    current = 0
+    for i in range(entries):
+        sample_count, delta = struct.unpack_from('>II', data, pos + 4 + 8 * i)
+        for _ in range(sample_count):
+            track.times.append(current)
+            current += delta
+    del track.times[count:]
+
+    # Posiciones: muestras por chunk (stsc) y posición de cada chunk (stco/co64)
+    if b'co64' in tables:
+        _, pos = _full_box(data, tables[b'co64'][0])
+        chunks = struct.unpack_from('>I', data, pos)[0]
+        chunk_offsets = struct.unpack_from(f'>{chunks}Q', data, pos + 4)
+    elif b'stco' in tables:
+        _, pos = _full_box(data, tables[b'stco'][0])
+        chunks = struct.unpack_from('>I', data, pos)[0]
+        chunk_offsets = struct.unpack_from(f'>{chunks}I', data, pos + 4)
+    else:
+        return None
+    _, pos = _full_box(data, tables[b'stsc'][0])
+    entries = struct.unpack_from('>I', data, pos)[0]
+    stsc = [struct.unpack_from('>III', data, pos + 4 + 12 * i)[:2] for i in range(entries)]
+    sample = 0
+    for i, (first_chunk, per_chunk) in enumerate(stsc):
+        last_chunk = stsc[i + 1][0] - 1 if i + 1 < len(stsc) else len(chunk_offsets)
+        for chunk in range(first_chunk, last_chunk + 1):
+            offset = chunk_offsets[chunk - 1]
+            for _ in range(per_chunk):
+                if sample >= count:
+                    break
+                track.offsets.append(offset)
+                offset += track.sizes[sample]
+                sample += 1
+    if len(track.offsets) != count or len(track.times) != count:
+        raise Mp4IndexError(f"Tablas de muestras incoherentes en la pista {kind}")
+
+    # Fotogramas clave (numerados desde 1)
+    if b'stss' in tables:
+        _, pos = _full_box(data, tables[b'stss'][0])
+        entries = struct.unpack_from('>I', data, pos)[0]
+        track.sync = [n - 1 for n in struct.unpack_from(f'>{entries}I', data, pos + 4)]
+    return track
+
+
+def parse_moov(moov: bytes, file_size: int, header_ranges: List[ByteRange]) -> Mp4Index:
+    """
+    Construir el índice a partir del contenido de la caja ``moov``
+
+    Args:
+        moov: Contenido de ``moov`` (sin su cabecera)
+        file_size: Tamaño total del archivo
+        header_ranges: Posición de ftyp y moov en el archivo
+
+    Returns:
+        Mp4Index con las pistas de audio y video
+    """
+    try:
+        boxes = list(_iter_boxes(moov))
+        duration = 0.0
+        tracks = []
+        for box_type, body, end in boxes:
+            if box_type == b'mvhd':
+                version, pos = _full_box(moov, body)
+                if version == 1:
+                    timescale, length = struct.unpack_from('>IQ', moov, pos + 16)
+                else:
+                    timescale, length = struct.unpack_from('>II', moov, pos + 8)
+                duration = length / timescale if timescale else 0.0
+            elif box_type == b'trak':
+                track = _parse_track(moov, body, end)
+                if track:
+                    tracks.append(track)
+    except struct.error as e:
+        raise Mp4IndexError(f"moov truncado: {e}") from e
+
+    if not any(track.kind in _MEDIA_TRACKS and track.times for track in tracks):
+        raise Mp4IndexError("El MP4 no tiene muestras de audio ni video en moov")
+    duration = duration or max(track.duration for track in tracks)
+    return Mp4Index(file_size=file_size, duration=duration, tracks=tracks, header_ranges=header_ranges)
+
+
+async def load_mp4_index(read_range: ReadRange, file_size: int) -> Mp4Index:
+    """
+    Localizar y leer la caja ``moov`` con lecturas por rango
+
+    Solo se leen las cabeceras de las cajas de primer nivel (saltando
+    ``mdat``), ``ftyp`` y ``moov``.
+
+    Args:
+        read_range: Corrutina que devuelve los bytes de un rango del archivo
+        file_size: Tamaño total del archivo
+
+    Returns:
+        Mp4Index del archivo
+
+    Raises:
+        Mp4IndexError: Si no es un MP4 con ``moov`` completo
+    """
+    header_ranges = []
+    pos = 0
+    while pos + 8 <= file_size:
+        header = await read_range(pos, min(16, file_size - pos))
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise Mp4IndexError(f"Caja {box_type!r} corrupta en {pos}")
+
+        if box_type == b'moof':
+            raise Mp4IndexError("MP4 fragmentado no admitido")
+        if box_type == b'ftyp':
+            header_ranges.append((pos, size))
+        elif box_type == b'moov':
+            header_ranges.append((pos, size))
+            moov = await read_range(pos + header_size, size - header_size)
+            return parse_moov(moov, file_size, header_ranges)
+        elif pos == 0 and box_type not in _FIRST_BOXES:
+            raise Mp4IndexError("El archivo no empieza con una caja MP4")
+        pos += size
+
+    raise Mp4IndexError("No se encontró la caja moov")
@@ -0,0 +1,56 @@
+"""
+Selección de variantes (PhotoSize) de las fotos de Telegram
+
+Telegram guarda cada foto en varios tamaños. Para calcular hashes o
+clasificar una imagen basta con una variante pequeña, así que se elige la
+menor que cumpla el lado mínimo que necesita cada tarea y la resolución
+completa solo se descarga cuando el usuario la pide.
+"""
+
+from typing import Any, Optional
+
+from telethon.tl.types import PhotoCachedSize, PhotoSize, PhotoSizeProgressive
+
+# Lado mínimo (px) de la variante necesaria para cada tarea
+TASK_MIN_SIDE = {
+    'hash': 64,             # pHash trabaja sobre 32x32
+    'classification': 224,  # Entrada típica de los modelos de visión
+    'preview': 320
+}
+
+
+def photo_size_bytes(size: Any) -> int:
+    """Bytes que ocupa una variante de la foto (0 si no se conoce)"""
+    if isinstance(size, PhotoSizeProgressive):
+        return max(size.sizes, default=0)
+    if isinstance(size, PhotoCachedSize):
+        return len(size.bytes)
+    if isinstance(size, PhotoSize):
+        return size.size
+    return 0
+
+
+def select_photo_size(photo: Any, min_side: int) -> Optional[Any]:
+    """
+    Elegir la variante más pequeña cuyo lado menor alcance ``min_side``
+
+    Args:
+        photo: Foto de Telegram (``message.media.photo``)
+        min_side: Lado mínimo en píxeles que necesita la tarea
+
+    Returns:
+        Variante elegida (la mayor disponible si ninguna llega al mínimo)
+        o None si la foto no tiene variantes con dimensiones
+    """
+    sizes = [
+        size for size in getattr(photo, 'sizes', None) or []
+        if isinstance(size, (PhotoSize, PhotoCachedSize, PhotoSizeProgressive))
+    ]
+    if not sizes:
+        return None
+
+    sizes.sort(key=lambda size: (min(size.w, size.h), photo_size_bytes(size)))
+    for size in sizes:
+        if min(size.w, size.h) >= min_side:
+            return size
+    return sizes[-1]
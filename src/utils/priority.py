@@ -0,0 +1,233 @@
+"""
+Carriles de prioridad para la API de Telegram y los procesos de ffmpeg
+
+El trabajo del bot se clasifica en tres carriles:
+
+- ``interactive``: respuestas a botones y comandos (el usuario está esperando)
+- ``normal``: reenvío de los medios que llegan
+- ``bulk``: trabajos pesados en segundo plano (descargas largas, clips, subidas)
+
+El carril se propaga con una variable de contexto, así que basta con fijarlo
+donde empieza el trabajo (``priority_lane`` o ``run_in_lane``) y todas las
+llamadas que cuelgan de él lo heredan, también las tareas que cree.
+
+``PriorityLimiter`` reparte un número fijo de huecos: cada carril puede
+ocupar como máximo su parte (``shares``) y, cuando hay espera, los huecos que
+se liberan van primero al carril interactivo, luego al normal y por último al
+masivo. Además ``normal`` y ``bulk`` juntos nunca ocupan los huecos
+reservados (``reserved``, uno por defecto), así que un botón siempre
+encuentra sitio aunque haya reenvíos y subidas largas en curso. Con un solo
+hueco no se puede reservar nada y solo se respeta el orden de atención.
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from src.config.logger import get_logger
+from src.utils.metrics import PRIORITY_WAIT_SECONDS
+
+logger = get_logger()
+
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BULK = 'bulk'
+# Orden de atención cuando hay espera
+LANES = (INTERACTIVE, NORMAL, BULK)
+
+DEFAULT_SHARES = {INTERACTIVE: 1.0, NORMAL: 0.75, BULK: 0.5}
+# Huecos que solo puede ocupar el carril interactivo
+DEFAULT_RESERVED = 1
+
+_current_lane: ContextVar[str] = ContextVar('priority_lane', default=NORMAL)
+
+
+def current_lane() -> str:
+    """Carril de prioridad del trabajo actual"""
+    return _current_lane.get()
+
+
+@contextmanager
+def priority_lane(lane: str):
+    """Ejecutar el bloque (y las tareas que cree) en un carril de prioridad"""
+    if lane not in LANES:
+        raise ValueError(f"Carril de prioridad desconocido: {lane}")
+    token = _current_lane.set(lane)
+    try:
+        yield lane
+    finally:
+        _current_lane.reset(token)
+
+
+def run_in_lane(lane: str) -> Callable:
+    """Decorador que ejecuta una corrutina en un carril de prioridad"""
+    def decorator(func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with priority_lane(lane):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class PriorityLimiter:
+    """Huecos de ejecución compartidos entre carriles de prioridad"""
+
+    def __init__(self, name: str, slots: int, shares: Optional[Dict[str, float]] = None,
+                 reserved: int = DEFAULT_RESERVED):
+        """
+        Inicializar el limitador
+
+        Args:
+            name: Recurso que se limita (etiqueta de las métricas)
+            slots: Huecos totales que se pueden usar a la vez
+            shares: Parte de los huecos (0-1] que puede ocupar cada carril
+            reserved: Huecos que normal y bulk juntos dejan siempre libres
+        """
+        self.name = name
+        self.slots = max(1, slots)
+        shares = {**DEFAULT_SHARES, **(shares or {})}
+        self.limits = {
+            lane: max(1, min(self.slots, round(self.slots * shares[lane]))) for lane in LANES
+        }
+        # Huecos que pueden ocupar a la vez los carriles no interactivos
+        self.background_limit = max(1, self.slots - max(0, reserved))
+        self._in_use = {lane: 0 for lane in LANES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        # Tarea que tiene un hueco y su carril: las llamadas anidadas lo reutilizan
+        self._holder: ContextVar[Optional[Tuple[asyncio.Task, str]]] = ContextVar(
+            f'priority_{name}_holder', default=None
+        )
+
+    @property
+    def active(self) -> int:
+        """Huecos ocupados"""
+        return sum(self._in_use.values())
+
+    def in_use(self, lane: str) -> int:
+        """Huecos ocupados por un carril"""
+        return self._in_use[lane]
+
+    def waiting(self, lane: str) -> int:
+        """Llamadas de un carril esperando hueco"""
+        return sum(1 for waiter in self._waiters[lane] if not waiter.done())
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None):
+        """
+        Ocupar un hueco mientras dura el bloque
+
+        Args:
+            lane: Carril (por defecto el del contexto actual)
+        """
+        task = asyncio.current_task()
+        if self._held_lane() is not None:
+            # Llamada anidada (p. ej. el reintento tras un FloodWait)
+            yield
+            return
+
+        lane = lane or current_lane()
+        started = time.perf_counter()
+        await self._acquire(lane)
+        PRIORITY_WAIT_SECONDS.observe(time.perf_counter() - started, resource=self.name, lane=lane)
+        token = self._holder.set((task, lane))
+        try:
+            yield
+        finally:
+            self._holder.reset(token)
+            self._release(lane)
+
+    @asynccontextmanager
+    async def released(self):
+        """
+        Dejar libre el hueco de la tarea actual mientras dura el bloque
+
+        Sirve para esperas largas dentro de una llamada con hueco (la espera
+        de un FloodWait): otras llamadas pueden usarlo entretanto y al salir
+        del bloque se vuelve a pedir en el mismo carril. Sin hueco no hace nada.
+        """
+        lane = self._held_lane()
+        if lane is None:
+            yield
+            return
+
+        self._release(lane)
+        try:
+            yield
+        except BaseException:
+            # El bloque con hueco termina enseguida y lo devuelve: contarlo sin esperar
+            self._in_use[lane] += 1
+            raise
+        try:
+            await self._acquire(lane)
+        except asyncio.CancelledError:
+            self._in_use[lane] += 1
+            raise
+
+    def _held_lane(self) -> Optional[str]:
+        """Carril del hueco que ocupa la tarea actual (None si no ocupa ninguno)"""
+        held = self._holder.get()
+        if held is not None and held[0] is asyncio.current_task():
+            return held[1]
+        return None
+
+    def wrap(self, func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Envolver una corrutina para que cada llamada ocupe un hueco"""
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            async with self.slot():
+                return await func(*args, **kwargs)
+        return wrapper
+
+    def _lane_has_room(self, lane: str) -> bool:
+        """El carril no ha llegado a su parte (ni a la de los carriles no interactivos)"""
+        if self._in_use[lane] >= self.limits[lane]:
+            return False
+        return lane == INTERACTIVE or self.active - self._in_use[INTERACTIVE] < self.background_limit
+
+    def _can_run(self, lane: str) -> bool:
+        return self.active < self.slots and self._lane_has_room(lane)
+
+    def _has_priority_waiters(self, lane: str) -> bool:
+        """Hay llamadas de este carril o de uno más prioritario esperando y con sitio"""
+        for other in LANES[:LANES.index(lane) + 1]:
+            if self.waiting(other) and self._lane_has_room(other):
+                return True
+        return False
+
+    async def _acquire(self, lane: str) -> None:
+        if self._can_run(lane) and not self._has_priority_waiters(lane):
+            self._in_use[lane] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append(waiter)
+        logger.debug("Esperando hueco de %s en el carril %s", self.name, lane)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco llegó a la vez que la cancelación: devolverlo
+                self._release(lane)
+            elif waiter in self._waiters[lane]:
+                self._waiters[lane].remove(waiter)
+            raise
+
+    def _release(self, lane: str) -> None:
+        self._in_use[lane] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Entregar los huecos libres a los carriles en orden de prioridad"""
+        for lane in LANES:
+            waiters = self._waiters[lane]
+            while waiters and self._can_run(lane):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self._in_use[lane] += 1
+                waiter.set_result(None)
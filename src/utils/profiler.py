@@ -0,0 +1,104 @@
+"""
+Perfilado del proceso activable en caliente
+
+``cProfile`` solo mide el hilo donde se activa, que aquí es el del bucle de
+eventos: justo donde se ejecutan los handlers. Mientras está apagado no se
+instala ningún hook, así que no tiene coste.
+"""
+
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+
+class RuntimeProfiler:
+    """Perfilador de cProfile que se enciende y apaga desde un comando"""
+
+    def __init__(self, output_dir: str = 'logs', top: int = 15):
+        """
+        Inicializar el perfilador
+
+        Args:
+            output_dir: Directorio donde se guardan los archivos .pstats
+            top: Número de funciones del resumen
+        """
+        self.output_dir = output_dir
+        self.top = top
+        self._profile: Optional[cProfile.Profile] = None
+        self._started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None
+
+    def start(self) -> bool:
+        """
+        Empezar a perfilar el hilo actual (el del bucle de eventos)
+
+        Returns:
+            True si se ha iniciado, False si ya estaba activo o no se pudo activar
+        """
+        if self._profile is not None:
+            return False
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Otro perfilador ya está activo en el intérprete
+            logger.error(f"No se pudo iniciar el perfilador: {e}")
+            return False
+
+        self._profile = profile
+        self._started_at = time.perf_counter()
+        logger.info("🔬 Perfilado iniciado")
+        return True
+
+    async def stop(self) -> Optional[Tuple[str, str]]:
+        """
+        Detener el perfilado y guardar las estadísticas
+
+        El volcado y el resumen se generan fuera del bucle de eventos.
+
+        Returns:
+            (ruta del archivo .pstats, resumen de las funciones más costosas)
+            o None si no estaba activo o falló al guardar
+        """
+        if self._profile is None:
+            return None
+
+        profile, self._profile = self._profile, None
+        profile.disable()
+        elapsed = time.perf_counter() - self._started_at
+
+        file_name = f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pstats"
+        path = os.path.join(self.output_dir, file_name)
+        try:
+            summary = await asyncio.get_running_loop().run_in_executor(
+                None, self._dump, profile, path
+            )
+        except Exception as e:
+            logger.error(f"Error guardando el perfil: {e}")
+            return None
+
+        logger.info(f"🔬 Perfilado detenido tras {elapsed:.1f}s: {path}")
+        return path, summary
+
+    def _dump(self, profile: cProfile.Profile, path: str) -> str:
+        """Guardar el archivo .pstats y devolver el resumen por tiempo acumulado"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        profile.dump_stats(path)
+
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        return stream.getvalue()
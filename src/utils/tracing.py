@@ -0,0 +1,229 @@
+"""
+Trazas ligeras por trabajo de medios
+
+Cada trabajo (un video, una descarga pedida desde los botones...) abre una
+traza raíz con ``start_trace``. Las funciones decoradas con ``@traced`` abren
+spans hijos que se propagan con ``contextvars`` a través de ``await`` y de
+las tareas creadas dentro del trabajo. Cada span guarda su duración y
+atributos como bytes transferidos o segundos de espera por FloodWait.
+
+Al cerrar la traza sus spans se exportan como líneas JSON y se pueden
+mostrar como un desglose de tiempos con ``format_breakdown``.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config.logger import get_logger
+
+logger = get_logger()
+
+_current_span: contextvars.ContextVar[Optional['Span']] = contextvars.ContextVar('current_span', default=None)
+_export_path: Optional[str] = None
+
+
+def configure_tracing(export_path: Optional[str]) -> None:
+    """
+    Configurar el archivo JSONL donde se exportan las trazas
+
+    Args:
+        export_path: Ruta del archivo (None o vacío desactiva la exportación)
+    """
+    global _export_path
+    _export_path = export_path or None
+
+
+class Span:
+    """Intervalo de tiempo con nombre y atributos dentro de una traza"""
+
+    def __init__(self, name: str, trace: 'Trace', parent: Optional['Span'] = None, **attributes):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = uuid.uuid4().hex[:16]
+        self.depth = parent.depth + 1 if parent else 0
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        trace.spans.append(self)
+
+    def set(self, key: str, value: Any) -> None:
+        """Fijar un atributo"""
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float) -> None:
+        """Acumular un atributo numérico (bytes, segundos de espera...)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def finish(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convertir a diccionario para exportar"""
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'start': datetime.fromtimestamp(self.started_at).isoformat(timespec='milliseconds'),
+            'duration_ms': round((self.duration or 0) * 1000, 3),
+            'attributes': self.attributes
+        }
+
+
+class Trace:
+    """Conjunto de spans de un trabajo"""
+
+    def __init__(self):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    def export(self) -> None:
+        """Añadir los spans al archivo JSONL configurado"""
+        if not _export_path:
+            return
+        lines = ''.join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n' for span in self.spans)
+        try:
+            os.makedirs(os.path.dirname(_export_path) or '.', exist_ok=True)
+            with open(_export_path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except OSError as e:
+            logger.warning(f"No se pudo exportar la traza {self.trace_id}: {e}")
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Abrir la traza raíz de un trabajo
+
+    Yields:
+        La traza, para mostrar el desglose al terminar
+    """
+    trace = Trace()
+    root = Span(name, trace, **attributes)
+    token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.set('error', type(e).__name__)
+        raise
+    finally:
+        root.finish()
+        _current_span.reset(token)
+        try:
+            # La escritura del archivo se hace fuera del bucle de eventos
+            asyncio.get_running_loop().run_in_executor(None, trace.export)
+        except RuntimeError:
+            trace.export()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Abrir un span hijo del span actual
+
+    Si no hay ninguna traza activa no se registra nada.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent, **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set('error', type(e).__name__)
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    """Span activo en el contexto actual (o None)"""
+    return _current_span.get()
+
+
+def add_to_span(key: str, amount: float) -> None:
+    """Acumular un atributo en el span activo si lo hay"""
+    active = _current_span.get()
+    if active is not None:
+        active.add(key, amount)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """
+    Decorador que abre un span alrededor de una función (síncrona o asíncrona)
+
+    Args:
+        name: Nombre del span (por defecto el nombre de la función)
+    """
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def _format_bytes(size: float) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f}MB"
+    return f"{size / 1024:.0f}KB"
+
+
+def format_breakdown(trace: Trace, min_seconds: float = 0.05) -> str:
+    """
+    Desglose de tiempos de un trabajo para el mensaje de estado
+
+    Args:
+        trace: Traza terminada
+        min_seconds: Spans más cortos que esto se omiten
+    """
+    root = trace.root
+    if root is None:
+        return ""
+
+    lines = [f"⏱️ **Tiempos ({root.name})**: {root.duration or 0:.1f}s"]
+    for item in trace.spans[1:]:
+        duration = item.duration or 0
+        if duration < min_seconds and not item.attributes:
+            continue
+        details = []
+        if item.attributes.get('bytes'):
+            details.append(_format_bytes(item.attributes['bytes']))
+        if item.attributes.get('flood_wait_seconds'):
+            details.append(f"FloodWait {item.attributes['flood_wait_seconds']:.0f}s")
+        if item.attributes.get('error'):
+            details.append(f"❌ {item.attributes['error']}")
+        suffix = f" ({', '.join(details)})" if details else ""
+        lines.append(f"{'  ' * (item.depth - 1)}• {item.name}: {duration:.1f}s{suffix}")
+    return '\n'.join(lines)
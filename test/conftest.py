@@ -0,0 +1,16 @@
+"""
+Configuración común de pytest
+
+Los tests no deben escribir en los directorios ``logs/`` ni ``data/`` del
+repositorio: el log del bot se redirige a un directorio temporal antes de
+que ningún test importe el sistema de logging.
+"""
+
+import os
+import shutil
+import atexit
+import tempfile
+
+_LOG_DIR = tempfile.mkdtemp(prefix='pequeno-bot-test-logs-')
+os.environ['LOG_FILE'] = os.path.join(_LOG_DIR, 'bot.log')
+atexit.register(shutil.rmtree, _LOG_DIR, ignore_errors=True)
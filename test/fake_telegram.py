@@ -0,0 +1,548 @@
+#!/usr/bin/env python3
+"""
+Simulador de Telegram sin conexión para pruebas de carga de los handlers
+
+``FakeTelegramClient`` implementa la parte de la API de ``TelegramClient``
+que usan los handlers (``on``, ``send_file``, ``send_message``,
+``edit_message``, ``delete_messages``, ``download_media``, ``iter_download``,
+``get_messages``, ``get_me``, ``run_until_disconnected``) con latencia y
+FloodWait inyectables. ``simulate`` reproduce un flujo sintético de eventos
+``NewMessage``/``CallbackQuery`` a un ritmo fijo contra los handlers reales y
+devuelve el rendimiento y la latencia p50/p99 de cada tipo de evento.
+
+Uso (desde la raíz del repositorio):
+    python test/fake_telegram.py --events 500 --rate 50 --latency-ms 30 --flood-rate 0.01
+"""
+
+import sys
+import os
+import random
+import asyncio
+import argparse
+import statistics
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+sys.path.append('.')
+
+from telethon import events
+from telethon.errors import FloodWaitError
+from telethon.tl.types import (
+    Document, DocumentAttributeFilename, DocumentAttributeVideo,
+    MessageMediaDocument, MessageMediaPhoto, Photo, PhotoSize
+)
+
+from src.config import BotConfig, configure_logging
+from src.config.logger import get_logger
+from src.handlers import CallbackHandler, CommandHandler, MediaForwardHandler
+from src.telegram_client import TelegramMessenger
+
+logger = get_logger('fake_telegram')
+
+SOURCE_CHAT = -100555
+CHAT_ME = 1000
+CHAT_TARGET = 2000
+# Tamaño máximo de los archivos que escribe la descarga simulada
+MAX_FAKE_DOWNLOAD = 256 * 1024
+
+
+class FakeMessage:
+    """Mensaje simulado con los atributos que leen los handlers"""
+
+    def __init__(self, client, chat_id, message_id, text='', media=None, buttons=None,
+                 sender_id=None, grouped_id=None, out=False):
+        self._client = client
+        self.id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.raw_text = text
+        self.message = text
+        self.media = media
+        self.buttons = buttons
+        self.sender_id = sender_id
+        self.grouped_id = grouped_id
+        self.out = out
+        self.fwd_from = None
+        self.reply_to = None
+        self.date = datetime.now()
+
+    async def delete(self):
+        await self._client.delete_messages(self.chat_id, [self.id])
+
+
+class FakeNewMessageEvent:
+    """Evento ``NewMessage`` simulado"""
+
+    def __init__(self, message: FakeMessage):
+        self.message = message
+        self.chat_id = message.chat_id
+        self.sender_id = message.sender_id
+        self.raw_text = message.raw_text
+        self.text = message.text
+        self.date = message.date
+        self.pattern_match = None
+
+    async def get_chat(self):
+        return SimpleNamespace(id=self.chat_id, title='Chat simulado', username=None)
+
+    async def get_sender(self):
+        return SimpleNamespace(id=self.sender_id, first_name='Usuario', last_name=None,
+                               username='usuario_simulado', bot=False)
+
+    async def get_reply_message(self):
+        return None
+
+
+class FakeCallbackEvent:
+    """Evento ``CallbackQuery`` simulado sobre un mensaje con botones"""
+
+    def __init__(self, client, message: FakeMessage, data: bytes, sender_id: int):
+        self._client = client
+        self.message_id = message.id
+        self.chat_id = message.chat_id
+        self.data = data
+        self.sender_id = sender_id
+        self.pattern_match = None
+
+    async def get_message(self):
+        return self._client.messages.get((self.chat_id, self.message_id))
+
+    async def answer(self, message=None, alert=False, **kwargs):
+        await self._client._api('answer_callback')
+
+
+class FakeTelegramClient:
+    """Cliente de Telegram en memoria con latencia y FloodWait configurables"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.5, flood_wait_rate: float = 0.0,
+                 flood_wait_seconds: int = 0, seed: Optional[int] = None):
+        """
+        Inicializar el cliente simulado
+
+        Args:
+            latency: Segundos medios de cada llamada a la API
+            jitter: Variación relativa de la latencia (0.5 = ±50%)
+            flood_wait_rate: Probabilidad de que una llamada lance FloodWaitError
+            flood_wait_seconds: Segundos de espera indicados en el FloodWait
+            seed: Semilla para reproducir la simulación
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.random = random.Random(seed)
+        self.handlers: List[tuple] = []
+        self.messages: Dict[tuple, FakeMessage] = {}
+        self.button_messages: List[FakeMessage] = []
+        self.calls: Counter = Counter()
+        self.flood_waits = 0
+        self.handler_errors = 0
+        self._next_id = 1
+        self._disconnected = asyncio.Event()
+
+    # ----- Registro de handlers -----
+
+    def on(self, event):
+        def decorator(callback):
+            self.add_event_handler(callback, event)
+            return callback
+        return decorator
+
+    def add_event_handler(self, callback, event):
+        self.handlers.append((event, callback))
+
+    # ----- API simulada -----
+
+    async def _api(self, method: str) -> None:
+        """Contar la llamada, aplicar la latencia y lanzar FloodWait si toca"""
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.jitter * (self.random.random() * 2 - 1)))
+        if self.flood_wait_rate and self.random.random() < self.flood_wait_rate:
+            self.flood_waits += 1
+            raise FloodWaitError(request=None, capture=self.flood_wait_seconds)
+
+    def _new_message(self, chat_id, **kwargs) -> FakeMessage:
+        message = FakeMessage(self, chat_id, self._next_id, **kwargs)
+        self._next_id += 1
+        self.messages[(chat_id, message.id)] = message
+        if message.buttons:
+            self.button_messages.append(message)
+        return message
+
+    async def start(self, bot_token=None, **kwargs):
+        await self._api('start')
+        return self
+
+    async def get_me(self):
+        await self._api('get_me')
+        return SimpleNamespace(id=1, username='pequeno_sim_bot', first_name='pequeno', bot=True)
+
+    async def get_input_entity(self, entity):
+        await self._api('get_input_entity')
+        return entity
+
+    async def send_message(self, entity, message='', buttons=None, **kwargs):
+        await self._api('send_message')
+        return self._new_message(entity, text=message, buttons=buttons, out=True)
+
+    async def send_file(self, entity, file, caption=None, buttons=None, **kwargs):
+        await self._api('send_file')
+        if isinstance(file, (list, tuple)):
+            return [self._new_message(entity, text=caption or '', media=self._as_media(item), out=True)
+                    for item in file]
+        return self._new_message(entity, text=caption or '', media=self._as_media(file), buttons=buttons, out=True)
+
+    async def edit_message(self, entity, message=None, text=None, **kwargs):
+        await self._api('edit_message')
+        message_id = getattr(message, 'id', message)
+        edited = self.messages.get((entity, message_id))
+        if edited is not None and text is not None:
+            edited.text = edited.raw_text = text
+        return edited
+
+    async def delete_messages(self, entity, message_ids, **kwargs):
+        await self._api('delete_messages')
+        if not isinstance(message_ids, (list, tuple)):
+            message_ids = [message_ids]
+        for message_id in message_ids:
+            removed = self.messages.pop((entity, message_id), None)
+            if removed in self.button_messages:
+                self.button_messages.remove(removed)
+
+    async def get_messages(self, entity, ids=None, limit=None, **kwargs):
+        await self._api('get_messages')
+        if isinstance(ids, (list, tuple)):
+            return [self.messages.get((entity, message_id)) for message_id in ids]
+        if ids is not None:
+            return self.messages.get((entity, ids))
+        found = [m for (chat_id, _), m in self.messages.items() if chat_id == entity]
+        return found[-limit:] if limit else found
+
+    async def download_media(self, media, file=None, progress_callback=None, thumb=None, **kwargs):
+        await self._api('download_media')
+        size = min(_media_size(media), MAX_FAKE_DOWNLOAD) if thumb is None else 8 * 1024
+        path = Path(file) if file else Path(tempfile.gettempdir()) / f"fake_{self._next_id}.bin"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'\0' * size)
+        if progress_callback:
+            progress_callback(size, size)
+        return str(path)
+
+    async def iter_download(self, file, offset=0, request_size=128 * 1024, limit=None, **kwargs):
+        total = min(_media_size(file), MAX_FAKE_DOWNLOAD)
+        sent, chunks = min(offset, total), 0
+        while sent < total and (limit is None or chunks < limit):
+            await self._api('iter_download')
+            chunk = b'\0' * min(request_size, total - sent)
+            sent += len(chunk)
+            chunks += 1
+            yield chunk
+
+    async def run_until_disconnected(self):
+        await self._disconnected.wait()
+
+    async def disconnect(self):
+        self._disconnected.set()
+
+    def is_connected(self) -> bool:
+        return not self._disconnected.is_set()
+
+    def _as_media(self, file):
+        if isinstance(file, (str, Path)):
+            size = os.path.getsize(file) if os.path.exists(file) else 0
+            return _document('image/jpeg' if str(file).endswith('.jpg') else 'application/octet-stream',
+                             size, [DocumentAttributeFilename(os.path.basename(str(file)))])
+        return file
+
+    # ----- Entrega de eventos -----
+
+    def _matches(self, builder, event) -> bool:
+        if isinstance(builder, events.CallbackQuery):
+            if not isinstance(event, FakeCallbackEvent):
+                return False
+            if builder.match is not None:
+                event.pattern_match = builder.match(event.data)
+                return bool(event.pattern_match)
+            return True
+
+        if not isinstance(builder, events.NewMessage) or not isinstance(event, FakeNewMessageEvent):
+            return False
+        if builder.outgoing and not builder.incoming:
+            return False
+        if builder.pattern is not None:
+            event.pattern_match = builder.pattern(event.raw_text or '')
+            if not event.pattern_match:
+                return False
+        return builder.func is None or bool(builder.func(event))
+
+    async def dispatch(self, event) -> None:
+        """Ejecutar en orden los handlers que aceptan el evento, como Telethon"""
+        for builder, callback in self.handlers:
+            if not self._matches(builder, event):
+                continue
+            try:
+                await callback(event)
+            except events.StopPropagation:
+                break
+            except Exception as e:
+                self.handler_errors += 1
+                logger.error(f"Error no controlado en {callback.__name__}: {e}")
+
+
+def _media_size(media) -> int:
+    document = getattr(media, 'document', None)
+    if document is not None:
+        return document.size
+    photo = getattr(media, 'photo', None)
+    if photo is not None:
+        return max((getattr(size, 'size', 0) for size in photo.sizes), default=0)
+    return 0
+
+
+def _document(mime_type, size, attributes):
+    return MessageMediaDocument(document=Document(
+        id=random.getrandbits(62), access_hash=random.getrandbits(62), file_reference=b'\x01',
+        date=None, mime_type=mime_type, size=size, dc_id=2, attributes=attributes,
+        thumbs=[PhotoSize('m', 320, 180, 12000)]
+    ))
+
+
+def _photo():
+    return MessageMediaPhoto(photo=Photo(
+        id=random.getrandbits(62), access_hash=random.getrandbits(62), file_reference=b'\x01',
+        date=None, dc_id=2, sizes=[PhotoSize('s', 90, 68, 2000), PhotoSize('x', 800, 600, 90000)]
+    ))
+
+
+def _video(size_mb):
+    return _document('video/mp4', int(size_mb * 1024 * 1024), [
+        DocumentAttributeVideo(duration=int(size_mb * 6), w=1280, h=720),
+        DocumentAttributeFilename('video.mp4')
+    ])
+
+
+# Peso de cada tipo de evento en el flujo sintético
+DEFAULT_MIX = {
+    'text': 3,
+    'command': 1,
+    'photo': 3,
+    'short_video': 2,
+    'long_video': 1,
+    'callback': 2
+}
+COMMANDS = ['/ping', '/status', '/stats', '/help']
+CALLBACK_ACTIONS = [b'discard', b'send_to_target']
+
+
+def make_event(client: FakeTelegramClient, kind: str, rng: random.Random):
+    """
+    Crear un evento sintético del tipo indicado
+
+    Los ``callback`` se aplican a un mensaje con botones enviado por el bot;
+    si todavía no hay ninguno se genera un texto.
+    """
+    if kind == 'callback':
+        if client.button_messages:
+            message = rng.choice(client.button_messages)
+            return kind, FakeCallbackEvent(client, message, rng.choice(CALLBACK_ACTIONS), CHAT_ME)
+        kind = 'text'
+
+    text, media = '', None
+    if kind == 'text':
+        text = 'mensaje simulado'
+    elif kind == 'command':
+        text = rng.choice(COMMANDS)
+    elif kind == 'photo':
+        media = _photo()
+    elif kind == 'short_video':
+        media = _video(rng.uniform(1, 15))
+    elif kind == 'long_video':
+        media = _video(rng.uniform(50, 500))
+    message = client._new_message(SOURCE_CHAT, text=text, media=media, sender_id=42)
+    return kind, FakeNewMessageEvent(message)
+
+
+@dataclass
+class SimulationReport:
+    """Resultado de una simulación"""
+    events: int
+    duration: float
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    api_calls: Dict[str, int] = field(default_factory=dict)
+    flood_waits: int = 0
+    handler_errors: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.events / self.duration if self.duration else 0.0
+
+    @staticmethod
+    def percentiles(values: List[float]) -> tuple:
+        """(p50, p99) de una lista de latencias"""
+        if len(values) < 2:
+            value = values[0] if values else 0.0
+            return value, value
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+        return statistics.median(values), cuts[98]
+
+    def format(self) -> str:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        p50, p99 = self.percentiles(all_latencies)
+        lines = [
+            f"📊 Eventos: {self.events} en {self.duration:.2f}s ({self.throughput:.1f} eventos/s)",
+            f"⏱️ Latencia total: p50 {p50 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms",
+        ]
+        for kind, values in sorted(self.latencies.items()):
+            kind_p50, kind_p99 = self.percentiles(values)
+            lines.append(f"  • {kind}: {len(values)} eventos, p50 {kind_p50 * 1000:.1f}ms, p99 {kind_p99 * 1000:.1f}ms")
+        lines.append(f"📡 Llamadas a la API: {sum(self.api_calls.values())} {dict(sorted(self.api_calls.items()))}")
+        lines.append(f"⏰ FloodWait inyectados: {self.flood_waits}, errores no controlados: {self.handler_errors}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def working_directory(path):
+    """Ejecutar con ``path`` como directorio de trabajo (base de datos, temp, logs...)"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+
+
+def simulation_config(**overrides) -> BotConfig:
+    """
+    Crear un BotConfig con credenciales ficticias y los chats simulados
+
+    Args:
+        **overrides: Atributos de la configuración a sobrescribir
+    """
+    env = {
+        'API_ID': '1',
+        'API_HASH': '0' * 32,
+        'BOT_TOKEN': '1:simulado',
+        'CHAT_ME': str(CHAT_ME),
+        'CHAT_TARGET': str(CHAT_TARGET)
+    }
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        config = BotConfig()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    config.duplicate_detection_enabled = False
+    config.image_analysis_enabled = False
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+def build_bot(client: FakeTelegramClient, config: BotConfig) -> SimpleNamespace:
+    """Crear y registrar los handlers reales igual que ``pequenoBot``"""
+    messenger = TelegramMessenger(client, config)
+    media_forward_handler = MediaForwardHandler(client, config, messenger=messenger)
+    command_handler = CommandHandler(client, config, media_forward_handler, messenger=messenger)
+    callback_handler = CallbackHandler(client, config, media_forward_handler, messenger=messenger)
+
+    media_forward_handler.register_handlers()
+    command_handler.register_commands()
+    callback_handler.register_handlers()
+    return SimpleNamespace(
+        messenger=messenger,
+        media_forward_handler=media_forward_handler,
+        command_handler=command_handler,
+        callback_handler=callback_handler
+    )
+
+
+async def simulate(client: FakeTelegramClient, events_count: int, rate: float,
+                   mix: Optional[Dict[str, float]] = None, seed: Optional[int] = None) -> SimulationReport:
+    """
+    Reproducir un flujo sintético de eventos a ritmo constante
+
+    Cada evento se entrega en su propia tarea, como hace Telethon, y su
+    latencia se mide desde el instante en que debía llegar hasta que
+    terminan todos sus handlers.
+
+    Args:
+        client: Cliente simulado con los handlers ya registrados
+        events_count: Número de eventos
+        rate: Eventos por segundo (0 = todos de golpe)
+        mix: Peso de cada tipo de evento (por defecto DEFAULT_MIX)
+        seed: Semilla del flujo
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = {}
+
+    async def deliver(kind, event, scheduled):
+        await client.dispatch(event)
+        latencies.setdefault(kind, []).append(time.perf_counter() - scheduled)
+
+    tasks = []
+    started = time.perf_counter()
+    for index in range(events_count):
+        scheduled = started + (index / rate if rate else 0)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, event = make_event(client, rng.choices(kinds, weights)[0], rng)
+        tasks.append(asyncio.create_task(deliver(kind, event, scheduled)))
+
+    await asyncio.gather(*tasks)
+    # Dejar terminar los álbumes y tareas en segundo plano de los handlers
+    await asyncio.sleep(0)
+
+    return SimulationReport(
+        events=events_count,
+        duration=time.perf_counter() - started,
+        latencies=latencies,
+        api_calls=dict(client.calls),
+        flood_waits=client.flood_waits,
+        handler_errors=client.handler_errors
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los handlers con Telegram simulado")
+    parser.add_argument('--events', type=int, default=200, help="Número de eventos")
+    parser.add_argument('--rate', type=float, default=50, help="Eventos por segundo (0 = todos de golpe)")
+    parser.add_argument('--latency-ms', type=float, default=20, help="Latencia media de la API simulada")
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="Probabilidad de FloodWait por llamada")
+    parser.add_argument('--flood-seconds', type=int, default=1, help="Segundos de cada FloodWait")
+    parser.add_argument('--seed', type=int, default=None, help="Semilla para reproducir la simulación")
+    parser.add_argument('--log-level', default='WARNING', help="Nivel de logging de los handlers")
+    args = parser.parse_args()
+
+    async def run():
+        client = FakeTelegramClient(
+            latency=args.latency_ms / 1000,
+            flood_wait_rate=args.flood_rate,
+            flood_wait_seconds=args.flood_seconds,
+            seed=args.seed
+        )
+        build_bot(client, simulation_config(temp_dir='temp'))
+        return await simulate(client, args.events, args.rate, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        configure_logging(args.log_level)
+        report = asyncio.run(run())
+    print(report.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test básico del agrupador de álbumes
+"""
+
+import sys
+import asyncio
+from types import SimpleNamespace
+sys.path.append('.')
+
+from src.utils.album_collector import AlbumCollector
+
+
+def test_album_collector():
+    """Los mensajes del mismo grupo se entregan juntos y ordenados"""
+    print("🧪 Probando AlbumCollector...")
+    delivered = []
+
+    async def on_album(messages):
+        delivered.append([m.id for m in messages])
+
+    async def run():
+        collector = AlbumCollector(on_album, window=0.05)
+        collector.add(SimpleNamespace(id=3, grouped_id=10))
+        collector.add(SimpleNamespace(id=1, grouped_id=10))
+        collector.add(SimpleNamespace(id=7, grouped_id=20))
+        await asyncio.sleep(0.03)
+        collector.add(SimpleNamespace(id=2, grouped_id=10))
+        assert collector.pending_groups == 2
+        await asyncio.sleep(0.15)
+        assert collector.pending_groups == 0
+
+        # Las entregas en curso se conservan hasta que terminan
+        collector.add(SimpleNamespace(id=9, grouped_id=30))
+        collector.flush_all()
+        assert len(collector._tasks) == 1
+        await asyncio.sleep(0.01)
+        assert not collector._tasks
+
+    asyncio.run(run())
+
+    assert sorted(delivered) == [[1, 2, 3], [7], [9]], f"Álbumes inesperados: {delivered}"
+    print("✅ Álbumes agrupados correctamente")
+
+
+if __name__ == "__main__":
+    test_album_collector()
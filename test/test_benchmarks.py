@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de los caminos críticos de medios y base de datos
+
+No se ejecutan con el resto de tests: hay que activarlos con
+``RUN_BENCHMARKS=1``. Cada medición (mediana de varias rondas) se compara con
+``test/benchmarks_baseline.json`` y falla si es más lenta que la referencia
+multiplicada por ``BENCH_TOLERANCE``. Las referencias dependen de la
+máquina: al cambiar de entorno hay que regenerarlas con
+``BENCH_UPDATE_BASELINE=1``.
+
+Variables de entorno:
+    RUN_BENCHMARKS=1: Ejecutar los benchmarks
+    BENCH_ROWS: Filas de la tabla de mensajes (por defecto 10000; p. ej. 1000000)
+    BENCH_TOLERANCE: Margen frente a la referencia (por defecto 1.5)
+    BENCH_UPDATE_BASELINE=1: Guardar las mediciones como nueva referencia
+
+Ejemplo:
+    RUN_BENCHMARKS=1 python -m pytest -q -s test/test_benchmarks.py
+"""
+
+import sys
+import os
+import json
+import random
+import shutil
+import asyncio
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append('.')
+
+import pytest
+from telethon.tl.types import (
+    Document, DocumentAttributeFilename, DocumentAttributeVideo,
+    MessageMediaDocument, MessageMediaPhoto, Photo, PhotoSize
+)
+
+from src.database import DatabaseManager, Message
+from src.handlers.media_forward_handler import MediaForwardHandler
+from src.utils.file_manager import FileManager
+
+RUN_BENCHMARKS = os.getenv('RUN_BENCHMARKS', '') == '1'
+BENCH_ROWS = int(os.getenv('BENCH_ROWS', 10000))
+BENCH_TOLERANCE = float(os.getenv('BENCH_TOLERANCE', 1.5))
+UPDATE_BASELINE = os.getenv('BENCH_UPDATE_BASELINE', '') == '1'
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+
+pytestmark = pytest.mark.skipif(not RUN_BENCHMARKS, reason="Benchmarks desactivados (RUN_BENCHMARKS=1)")
+
+
+def _load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def bench(name, func, rounds=5, number=1):
+    """
+    Medir ``func`` y compararla con la referencia guardada
+
+    Args:
+        name: Nombre de la medición en el archivo de referencia
+        func: Función a medir (sin argumentos)
+        rounds: Rondas; se usa la mediana
+        number: Llamadas por ronda (para funciones muy rápidas)
+
+    Returns:
+        Mediana en segundos por llamada
+    """
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - started) / number)
+    median = statistics.median(times)
+    print(f"⏱️ {name}: mediana {median * 1e6:.1f}µs (mín {min(times) * 1e6:.1f}µs)")
+
+    baseline = _load_baseline()
+    if UPDATE_BASELINE:
+        baseline[name] = median
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+    elif name in baseline:
+        limit = baseline[name] * BENCH_TOLERANCE
+        assert median <= limit, (
+            f"Regresión en {name}: {median * 1e6:.1f}µs > {limit * 1e6:.1f}µs "
+            f"(referencia {baseline[name] * 1e6:.1f}µs × {BENCH_TOLERANCE})"
+        )
+    return median
+
+
+def _seed_messages(db_path, rows):
+    """Rellenar la base de datos con mensajes sintéticos en bloque"""
+    types = ['text', 'image', 'video', 'animation', 'sticker', 'document']
+    now = datetime.now()
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT OR REPLACE INTO chats (chat_id, title, chat_type) VALUES (?, ?, 'group')",
+        [(-1000 - i, f"Chat {i}") for i in range(20)]
+    )
+    conn.executemany(
+        """INSERT INTO messages (message_id, chat_id, user_id, text, message_type, media_info, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (
+            (i, -1000 - i % 20, i % 50, f"mensaje {i}", types[i % len(types)],
+             json.dumps({'file_size': i}) if i % 3 else None,
+             (now - timedelta(minutes=i % 20000)).isoformat(sep=' '))
+            for i in range(rows)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture(scope='module')
+def seeded_db():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = DatabaseManager(os.path.join(temp_dir, 'bench.db'))
+        _seed_messages(db.db_path, BENCH_ROWS)
+        yield db
+
+
+def _synthetic_messages():
+    """Mensajes de Telethon sintéticos con los tipos de medio habituales"""
+    def document(mime_type, attributes):
+        return MessageMediaDocument(document=Document(
+            id=1, access_hash=2, file_reference=b'', date=None, mime_type=mime_type,
+            size=50 * 1024 * 1024, dc_id=2, attributes=attributes
+        ))
+
+    class FakeMessage:
+        def __init__(self, text, media):
+            self.text = text
+            self.media = media
+
+    photo = MessageMediaPhoto(photo=Photo(
+        id=1, access_hash=2, file_reference=b'', date=None, dc_id=2,
+        sizes=[PhotoSize('x', 800, 600, 90000)]
+    ))
+    video_attrs = [DocumentAttributeVideo(duration=120, w=1280, h=720), DocumentAttributeFilename('video.mp4')]
+    return [
+        FakeMessage("hola", None),
+        FakeMessage("", photo),
+        FakeMessage("", document('video/mp4', video_attrs)),
+        FakeMessage("", document('image/gif', [DocumentAttributeFilename('anim.gif')])),
+        FakeMessage("", document('application/pdf', [DocumentAttributeFilename('doc.pdf')]))
+    ]
+
+
+def test_bench_save_message(seeded_db):
+    """DatabaseManager.save_message sobre una tabla con BENCH_ROWS filas"""
+    print("🧪 Benchmark save_message...")
+    counter = iter(range(BENCH_ROWS, BENCH_ROWS + 10 ** 7))
+
+    def save():
+        message_id = next(counter)
+        assert seeded_db.save_message(Message(
+            message_id=message_id, chat_id=-1000, user_id=1, text="benchmark",
+            message_type='video', media_info={'file_size': message_id}, created_at=datetime.now()
+        ))
+
+    bench(f"save_message[{BENCH_ROWS}]", save, rounds=5, number=50)
+
+
+def test_bench_get_message_stats(seeded_db):
+    """DatabaseManager.get_message_stats sobre una tabla con BENCH_ROWS filas"""
+    print("🧪 Benchmark get_message_stats...")
+    assert seeded_db.get_message_stats()['total_messages'] >= BENCH_ROWS
+    bench(f"get_message_stats[{BENCH_ROWS}]", seeded_db.get_message_stats, rounds=5)
+
+
+def test_bench_message_serialization():
+    """Message.to_dict / Message.from_dict de ida y vuelta"""
+    print("🧪 Benchmark serialización de Message...")
+    message = Message(
+        message_id=1, chat_id=-1000, user_id=1, text="x" * 200, message_type='video',
+        media_info={'file_size': 1234, 'document': {'id': 1, 'access_hash': 2, 'file_name': 'video.mp4'}},
+        created_at=datetime.now(), edit_date=datetime.now()
+    )
+    data = message.to_dict()
+    assert Message.from_dict(data) == message
+    bench("message_to_dict", message.to_dict, number=5000)
+    bench("message_from_dict", lambda: Message.from_dict(data), number=5000)
+
+
+def test_bench_message_classification():
+    """_determine_message_type y _get_file_info con objetos de Telethon sintéticos"""
+    print("🧪 Benchmark clasificación de mensajes...")
+    # Los métodos medidos no usan el estado del handler (cliente, base de datos...)
+    handler = MediaForwardHandler.__new__(MediaForwardHandler)
+    messages = _synthetic_messages()
+    assert [handler._determine_message_type(m) for m in messages] == \
+        ['text', 'image', 'video', 'animation', 'unknown']
+
+    bench("determine_message_type", lambda: [handler._determine_message_type(m) for m in messages], number=5000)
+    bench("get_file_info", lambda: [handler._get_file_info(m) for m in messages], number=5000)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg no disponible")
+def test_bench_create_random_video_clip():
+    """FileManager.create_random_video_clip sobre un video de prueba generado"""
+    print("🧪 Benchmark create_random_video_clip...")
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, 'input.mp4')
+        subprocess.run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=60:size=640x360:rate=25',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '50', video_path
+        ], capture_output=True, check=True)
+
+        fm = FileManager()
+        clip_path = os.path.join(temp_dir, 'clip.mp4')
+
+        def clip():
+            ok, result = asyncio.run(fm.create_random_video_clip(video_path, clip_path, clip_duration=10))
+            assert ok, result
+
+        bench("create_random_video_clip[60s]", clip, rounds=3)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(['-q', '-s', __file__]))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test básico de la cancelación de descargas, ffmpeg y trabajos desde un botón
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.database import DatabaseManager
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.file_manager import FileManager
+from src.utils.job_scheduler import JobScheduler
+from src.utils.job_tracker import CANCELLED_BY_USER, JobTracker, cancelled_by_user, message_key
+
+
+class SlowClient:
+    """Cliente mínimo con una descarga lenta que da tiempo a cancelarla"""
+
+    def __init__(self, data):
+        self.data = data
+        self.chunks = 0
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        for position in range(offset, len(self.data), request_size):
+            self.chunks += 1
+            yield self.data[position:position + request_size]
+            await asyncio.sleep(0.05)
+
+
+def _document_message(size):
+    media = MessageMediaDocument(document=Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=size, dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    ))
+    return SimpleNamespace(id=10, chat_id=20, media=media)
+
+
+def test_cancel_by_key():
+    """Solo se cancela el trabajo registrado con la clave del botón"""
+    print("🧪 Probando cancelación por clave...")
+    tracker = JobTracker()
+
+    async def run():
+        async def job():
+            with tracker.cancellable(message_key(1, 2)):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(job())
+        await asyncio.sleep(0.01)
+        assert not tracker.cancel('otra')
+        assert tracker.cancel(message_key(1, 2))
+        try:
+            await task
+        except asyncio.CancelledError as e:
+            assert cancelled_by_user(e)
+        assert not tracker.cancel(message_key(1, 2))
+
+    asyncio.run(run())
+    print("✅ Cancelación por clave correcta")
+
+
+def test_cancelled_download_removes_partial_file():
+    """Una descarga cancelada por el usuario borra su .part; una interrumpida lo conserva"""
+    print("🧪 Probando limpieza de descargas canceladas...")
+    data = os.urandom(20 * DOWNLOAD_REQUEST_SIZE)
+
+    async def download(temp_dir, msg):
+        client = SlowClient(data)
+        config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+        messenger = TelegramMessenger(client, config)
+        task = asyncio.create_task(messenger.download_media_from_message(
+            _document_message(len(data)), download_dir=temp_dir, file_name='video.mp4'
+        ))
+        await asyncio.sleep(0.12)
+        task.cancel(msg)
+        await asyncio.gather(task, return_exceptions=True)
+        return client.chunks
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        part_path = os.path.join(temp_dir, 'video.mp4.part')
+        # Apagado: el .part queda para continuar tras el reinicio
+        asyncio.run(download(temp_dir, None))
+        assert os.path.exists(part_path)
+        # Botón "Cancelar": se deja de descargar y se libera el disco
+        chunks = asyncio.run(download(temp_dir, CANCELLED_BY_USER))
+        assert chunks < 20
+        assert os.listdir(temp_dir) == []
+    print("✅ Archivos parciales eliminados al cancelar")
+
+
+def test_cancel_kills_ffmpeg():
+    """Cancelar un trabajo mata su proceso de ffmpeg al momento"""
+    print("🧪 Probando cancelación de procesos...")
+    fm = FileManager()
+    tracker = JobTracker()
+
+    async def run():
+        async def job():
+            with tracker.cancellable('clips'):
+                await fm._run([sys.executable, '-c', 'import time; time.sleep(30)'])
+
+        task = asyncio.create_task(job())
+        await asyncio.sleep(0.3)
+        started = time.perf_counter()
+        tracker.cancel('clips')
+        await asyncio.gather(task, return_exceptions=True)
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 2
+    assert not FileManager._processes
+    print("✅ Proceso terminado al cancelar")
+
+
+def test_cancelled_job_is_not_resumed():
+    """Un trabajo cancelado por el usuario no se reanuda al reiniciar"""
+    print("🧪 Probando trabajos cancelados...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'jobs.db'))
+
+        async def run():
+            tracker = JobTracker()
+            scheduler = JobScheduler(db, jobs=tracker)
+
+            async def handler(job):
+                with tracker.cancellable(message_key(1, 2)):
+                    await scheduler.checkpoint(job, 'downloaded')
+                    await asyncio.sleep(10)
+                return True
+
+            scheduler.register('clips', handler)
+            job = await scheduler.submit('clips', {})
+            await asyncio.sleep(0.1)
+            assert tracker.cancel(message_key(1, 2))
+            await asyncio.sleep(0.05)
+            return job.id
+
+        job_id = asyncio.run(run())
+        assert db.get_job(job_id).state == 'cancelled'
+        assert db.requeue_running_jobs() == 0 and db.get_pending_jobs() == []
+    print("✅ Trabajo cancelado correctamente")
+
+
+if __name__ == "__main__":
+    test_cancel_by_key()
+    test_cancelled_download_removes_partial_file()
+    test_cancel_kills_ffmpeg()
+    test_cancelled_job_is_not_resumed()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test básico de la caché en disco de bloques de documentos
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.chunk_cache import ChunkCache
+
+
+class RangeClient:
+    """Cliente mínimo que sirve un documento en memoria y anota las peticiones"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        self.calls.append((offset // request_size, limit))
+        end = len(self.data) if limit is None else min(len(self.data), offset + limit * request_size)
+        for position in range(offset, end, request_size):
+            yield self.data[position:position + request_size]
+
+
+def test_lru_eviction():
+    """Con la caché llena se expulsa el bloque usado hace más tiempo"""
+    print("🧪 Probando expulsión LRU...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = ChunkCache(os.path.join(temp_dir, 'chunks.bin'), max_bytes=3 * 1024, chunk_size=1024)
+        blocks = {i: os.urandom(1024) for i in range(3)}
+        for i, data in blocks.items():
+            cache.put(1, i, data)
+        # El último bloque de un documento puede ser más corto
+        assert cache.get(1, 0) == blocks[0]
+        cache.put(2, 0, b'fin')
+
+        assert cache.get(1, 1) is None
+        assert cache.get(1, 0) == blocks[0] and cache.get(1, 2) == blocks[2]
+        assert cache.get(2, 0) == b'fin'
+        assert cache.used_bytes == 2 * 1024 + 3
+        assert os.path.getsize(os.path.join(temp_dir, 'chunks.bin')) == 3 * 1024
+        cache.close()
+        assert cache.get(1, 0) is None
+    print("✅ Expulsión LRU correcta")
+
+
+def test_repeated_reads_use_cache():
+    """Las lecturas repetidas solo piden los bloques que faltan y las descargas completas no llenan la caché"""
+    print("🧪 Probando lecturas sobre la caché de bloques...")
+    block = DOWNLOAD_REQUEST_SIZE
+    data = os.urandom(12 * block + 100)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client = RangeClient(data)
+        config = SimpleNamespace(
+            chat_me=1, chat_target=2, data_dir=temp_dir, temp_dir=temp_dir,
+            downloads_min_free_mb=0, chunk_cache_mb=8
+        )
+        TelegramMessenger._chunk_cache = None
+        messenger = TelegramMessenger(client, config)
+        message = SimpleNamespace(id=10, chat_id=20, media=MessageMediaDocument(document=Document(
+            id=5, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+            size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+        )))
+
+        async def run():
+            # Índice al final del archivo (como el que lee el índice MP4)
+            tail = await messenger.download_range(message, len(data) - 50, 50)
+            assert tail == data[-50:]
+            assert await messenger.download_range(message, len(data) - 50, 50) == tail
+            assert client.calls == [(12, 1)]
+
+            # La descarga completa se salta el bloque que ya estaba en la caché
+            client.calls.clear()
+            path = await messenger.download_media_from_message(message, download_dir=temp_dir, file_name='video.mp4')
+            with open(path, 'rb') as f:
+                assert f.read() == data
+            assert client.calls == [(0, 12)]
+
+            # Solo guarda el comienzo y el final: al repetirla se piden los bloques centrales
+            assert messenger.chunk_cache.used_bytes == 7 * block + 100
+            os.remove(path)
+            client.calls.clear()
+            path = await messenger.download_media_from_message(message, download_dir=temp_dir, file_name='video.mp4')
+            with open(path, 'rb') as f:
+                assert f.read() == data
+            assert client.calls == [(4, 5)]
+
+        try:
+            asyncio.run(run())
+        finally:
+            messenger.chunk_cache.close()
+            TelegramMessenger._chunk_cache = None
+    print("✅ Caché de bloques usada correctamente")
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_repeated_reads_use_cache()
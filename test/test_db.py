@@ -5,6 +5,8 @@ Script de prueba para verificar el sistema de base de datos
 
 import sys
 import os
+import shutil
+import tempfile
 sys.path.append('/app')
 
 from src.database import DatabaseManager, Message, User, Chat
@@ -14,7 +16,9 @@ def test_database():
     """Probar el sistema de base de datos"""
     
     print("🔄 Inicializando base de datos...")
-    db = DatabaseManager("data/test_bot.db")
+    # Base de datos temporal: la prueba no deja archivos en data/
+    tmp = tempfile.mkdtemp()
+    db = DatabaseManager(os.path.join(tmp, "test_bot.db"))
     
     print("✅ Base de datos inicializada")
     
@@ -65,6 +69,7 @@ def test_database():
     print(f"Total de mensajes: {stats.get('total_messages', 0)}")
     print(f"Tipos de mensaje: {stats.get('by_type', {})}")
     
+    shutil.rmtree(tmp, ignore_errors=True)
     print("✅ Prueba de base de datos completada exitosamente")
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Test básico del control de admisión de descargas
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.download_admission import DownloadAdmissionController, InsufficientSpaceError
+
+
+def test_download_admission():
+    """Las reservas respetan el presupuesto, esperan en cola y rechazan lo imposible"""
+    print("🧪 Probando DownloadAdmissionController...")
+
+    async def run(tmp):
+        controller = DownloadAdmissionController(tmp, budget_bytes=1000, wait_timeout=0.2)
+
+        # Un archivo mayor que el presupuesto se rechaza sin esperar
+        try:
+            async with controller.reserve(5000):
+                raise AssertionError("La reserva imposible no se rechazó")
+        except InsufficientSpaceError:
+            pass
+
+        order = []
+
+        async def download(name, size, hold):
+            async with controller.reserve(size):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        # La segunda descarga espera a que termine la primera
+        await asyncio.gather(download('a', 800, 0.05), download('b', 800, 0))
+        assert order == ['a', 'b'], f"Orden inesperado: {order}"
+        assert controller.reserved_bytes == 0
+
+        # Sin liberar espacio a tiempo, la espera termina en rechazo
+        async def blocked():
+            async with controller.reserve(800):
+                pass
+
+        async with controller.reserve(900):
+            try:
+                await blocked()
+                raise AssertionError("La reserva en cola no expiró")
+            except InsufficientSpaceError:
+                pass
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+    print("✅ Control de admisión funciona correctamente")
+
+
+def test_reserve_in_other_directory():
+    """El presupuesto solo cuenta lo que se escribe en el directorio de descargas"""
+    print("🧪 Probando reservas en otros directorios...")
+
+    async def run(tmp):
+        controller = DownloadAdmissionController(os.path.join(tmp, 'downloads'), budget_bytes=1000, wait_timeout=0.1)
+        # Un archivo temporal grande no compite con el presupuesto de las descargas
+        async with controller.reserve(5000, os.path.join(tmp, 'temp')):
+            async with controller.reserve(800):
+                assert controller.reserved_bytes == 5800
+        assert controller.reserved_bytes == 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+        # El controlador de TelegramMessenger usa DOWNLOADS_DIR
+        previous = TelegramMessenger._admission_controller
+        TelegramMessenger._admission_controller = None
+        try:
+            config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=tmp, downloads_dir=tmp, downloads_min_free_mb=0)
+            messenger = TelegramMessenger(None, config)
+            assert messenger.download_dir == Path(tmp)
+            assert messenger.admission_controller.download_dir == Path(tmp)
+        finally:
+            TelegramMessenger._admission_controller = previous
+    print("✅ Reservas por directorio correctas")
+
+
+def test_written_bytes_leave_reservation():
+    """Lo ya escrito cuenta como ocupado y deja de contar en la reserva"""
+    print("🧪 Probando reservas que se reducen al escribir...")
+
+    async def run(tmp):
+        controller = DownloadAdmissionController(tmp, budget_bytes=1000, wait_timeout=0.1)
+        async with controller.reserve(800) as reservation:
+            assert controller.available_bytes() == 200
+            with open(os.path.join(tmp, 'video.mp4.part'), 'wb') as f:
+                f.write(b'\0' * 600)
+            reservation.written(600)
+            # 600 escritos + 200 por escribir: no se cuentan dos veces
+            assert controller.available_bytes() == 200
+            assert controller.reserved_bytes == 200
+            reservation.written(500)
+            assert reservation.remaining == 0 and controller.reserved_bytes == 0
+        assert controller.reserved_bytes == 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+    print("✅ Reservas descontadas al escribir")
+
+
+class InterruptedClient:
+    """Cliente cuya descarga se corta una vez con FloodWait a mitad del archivo"""
+
+    def __init__(self, data):
+        self.data = data
+        self.fail_at = 2 * DOWNLOAD_REQUEST_SIZE
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        position = offset
+        while position < len(self.data):
+            if self.fail_at is not None and position >= self.fail_at:
+                self.fail_at = None
+                raise FloodWaitError(request=None, capture=0)
+            yield self.data[position:position + request_size]
+            position += request_size
+
+
+class RecordingController(DownloadAdmissionController):
+    """Controlador que anota el tamaño de cada reserva"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sizes = []
+
+    def reserve(self, size, directory=None):
+        self.sizes.append(size)
+        return super().reserve(size, directory)
+
+
+def test_resumed_download_reserves_remainder():
+    """Al reanudar un .part solo se reserva lo que falta y la reserva baja al escribir"""
+    print("🧪 Probando la reserva de una descarga reanudada...")
+    data = os.urandom(3 * DOWNLOAD_REQUEST_SIZE + 1000)
+    message = SimpleNamespace(id=10, chat_id=20, media=MessageMediaDocument(document=Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    )))
+    reserved = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        controller = RecordingController(tmp)
+        previous = TelegramMessenger._admission_controller
+        TelegramMessenger._admission_controller = controller
+        try:
+            config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=tmp, downloads_min_free_mb=0)
+            messenger = TelegramMessenger(InterruptedClient(data), config)
+            path = asyncio.run(messenger.download_media_from_message(
+                message, download_dir=tmp, file_name='video.mp4',
+                progress_callback=lambda current, total: reserved.append(controller.reserved_bytes)
+            ))
+        finally:
+            TelegramMessenger._admission_controller = previous
+
+        assert path and os.path.getsize(path) == len(data)
+    assert controller.sizes == [len(data), len(data) - 2 * DOWNLOAD_REQUEST_SIZE], controller.sizes
+    assert reserved == [
+        len(data) - DOWNLOAD_REQUEST_SIZE, len(data) - 2 * DOWNLOAD_REQUEST_SIZE,
+        len(data) - 3 * DOWNLOAD_REQUEST_SIZE, 0
+    ], reserved
+    assert controller.reserved_bytes == 0
+    print("✅ Reserva de la descarga reanudada correcta")
+
+
+if __name__ == "__main__":
+    test_download_admission()
+    test_reserve_in_other_directory()
+    test_written_bytes_leave_reservation()
+    test_resumed_download_reserves_remainder()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test básico de la caché de entidades
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+sys.path.append('.')
+
+from telethon.tl.types import InputPeerChannel, InputPeerUser
+from src.utils.entity_cache import EntityCache
+
+
+class FakeClient:
+    """Cliente mínimo que cuenta las resoluciones por red"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def get_input_entity(self, chat_id):
+        self.calls += 1
+        if chat_id < 0:
+            return InputPeerChannel(abs(chat_id), 1111)
+        return InputPeerUser(chat_id, 2222)
+
+    async def get_me(self):
+        self.calls += 1
+        return 'me'
+
+
+def test_entity_cache():
+    """Las entidades se resuelven una vez y sobreviven a un reinicio"""
+    print("🧪 Probando EntityCache...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / 'entity_cache.json'
+
+        client = FakeClient()
+        cache = EntityCache(client, cache_path)
+        asyncio.run(cache.prefetch([123, -100456, None]))
+        asyncio.run(cache.get_me())
+        asyncio.run(cache.get_me())
+        assert client.calls == 3, f"Llamadas inesperadas: {client.calls}"
+        assert isinstance(cache.resolve(123), InputPeerUser)
+        assert cache.resolve(999) == 999
+
+        # Un nuevo proceso carga la caché sin llamadas a la API
+        restarted = FakeClient()
+        cache = EntityCache(restarted, cache_path)
+        asyncio.run(cache.prefetch([123, -100456]))
+        assert restarted.calls == 0, "La caché persistida no se reutilizó"
+        assert isinstance(cache.resolve(-100456), InputPeerChannel)
+
+    print("✅ Caché de entidades persistida correctamente")
+
+
+if __name__ == "__main__":
+    test_entity_cache()
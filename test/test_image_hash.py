@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test básico del hash perceptual y el índice de duplicados
+"""
+
+import sys
+import os
+import io
+import tempfile
+sys.path.append('.')
+
+import numpy as np
+from PIL import Image
+
+from src.database import DatabaseManager
+from src.utils.image_hash import BKTree, PerceptualHashIndex, dhash, hamming_distance, phash
+
+
+def _sample_image(seed, size=(320, 240)):
+    """Imagen sintética con formas suaves para que el hash sea estable"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    pixels = np.zeros((size[1], size[0], 3))
+    for channel in range(3):
+        fx, fy, phase = rng.uniform(0.005, 0.03, 2).tolist() + [rng.uniform(0, 6)]
+        pixels[..., channel] = 127 + 120 * np.sin(x * fx + y * fy + phase)
+    return Image.fromarray(pixels.astype(np.uint8))
+
+
+def _recompress(image, scale=0.5, quality=40):
+    """Redimensionar y recomprimir en JPEG"""
+    resized = image.resize((int(image.width * scale), int(image.height * scale)))
+    buffer = io.BytesIO()
+    resized.save(buffer, format='JPEG', quality=quality)
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def test_hashes_detect_near_duplicates():
+    """Una copia recomprimida queda cerca; otra imagen queda lejos"""
+    print("🧪 Probando phash/dhash...")
+    original = _sample_image(1)
+    copy = _recompress(original)
+    other = _sample_image(2)
+
+    for hash_function in (phash, dhash):
+        near = hamming_distance(hash_function(original), hash_function(copy))
+        far = hamming_distance(hash_function(original), hash_function(other))
+        assert near <= 6, f"{hash_function.__name__}: copia demasiado lejana ({near})"
+        assert far > 12, f"{hash_function.__name__}: imágenes distintas demasiado cercanas ({far})"
+    print("✅ Hashes perceptuales estables frente a recompresión")
+
+
+def test_bk_tree_search():
+    """El BK-tree devuelve exactamente los hashes dentro del radio"""
+    rng = np.random.default_rng(0)
+    values = [int(v) for v in rng.integers(0, 2**63, 500)]
+    tree = BKTree()
+    for index, value in enumerate(values):
+        tree.add(value, index)
+
+    query = values[42] ^ 0b1011
+    expected = sorted(i for i, v in enumerate(values) if hamming_distance(v, query) <= 5)
+    found = sorted(item for _, item in tree.search(query, 5))
+    assert found == expected, f"Resultados inesperados: {found} != {expected}"
+    print("✅ Búsqueda en BK-tree correcta")
+
+
+def test_index_persistence():
+    """El índice se reconstruye desde la base de datos"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'data', 'hashes.db'))
+        value = phash(_sample_image(3))
+
+        index = PerceptualHashIndex(db, max_distance=4)
+        assert index.find_duplicate([value]) is None
+        index.add([value], 'image', chat_id=1, message_id=10)
+
+        reloaded = PerceptualHashIndex(db, max_distance=4)
+        match = reloaded.find_duplicate([value ^ 1])
+        assert match is not None and match[0].message_id == 10 and match[1] == 1
+
+        # Un video solo es duplicado si coincide al menos la mitad de sus fotogramas
+        frames = [phash(_sample_image(seed)) for seed in (4, 5, 6)]
+        reloaded.add(frames, 'video', chat_id=1, message_id=20)
+        assert reloaded.find_duplicate([frames[0], frames[1], phash(_sample_image(7))])[0].message_id == 20
+        assert reloaded.find_duplicate([frames[0], phash(_sample_image(8)), phash(_sample_image(9))]) is None
+    print("✅ Índice de hashes persistido correctamente")
+
+
+if __name__ == "__main__":
+    test_hashes_detect_near_duplicates()
+    test_bk_tree_search()
+    test_index_persistence()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test básico del servicio de inferencia por lotes
+"""
+
+import sys
+import json
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.append('.')
+
+from PIL import Image
+
+from src.utils.model_hf import inference
+from src.utils.model_hf.inference import InferenceService
+
+
+def test_inference_batching():
+    """Las peticiones concurrentes se agrupan en lotes de tamaño máximo"""
+    print("🧪 Probando InferenceService...")
+    batch_sizes = []
+
+    def fake_model(images, batch_size):
+        batch_sizes.append(batch_size)
+        return [[{'label': 'cat', 'score': 0.9}, {'label': 'dog', 'score': 0.1}] for _ in images]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(5):
+            path = Path(tmp) / f"img_{i}.jpg"
+            Image.new('RGB', (16, 16)).save(path)
+            paths.append(str(path))
+
+        inference._MODEL = fake_model
+        service = InferenceService(
+            'fake-model',
+            batch_size=4,
+            batch_wait_ms=50,
+            detections_dir=str(Path(tmp) / 'detections'),
+            executor=ThreadPoolExecutor(max_workers=1)
+        )
+
+        async def run():
+            assert service.status == "sin cargar"
+            # El modelo se carga con la primera petición si no hubo precarga
+            results = await asyncio.gather(*(service.analyze(path, 1, i, path if i else None) for i, path in enumerate(paths)))
+            assert service.status == "listo"
+            await service.stop()
+            return results
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            inference._MODEL = None
+
+        assert batch_sizes == [4, 1], f"Lotes inesperados: {batch_sizes}"
+        assert all(r == [{'label': 'cat', 'score': 0.9, 'box': None}] for r in results)
+        assert service.images_processed == 5 and service.images_per_second > 0
+
+        # Un JSON por chat y mensaje con la ruta persistente (ninguna si era una variante temporal)
+        stored = json.loads((Path(tmp) / 'detections' / '1_0.json').read_text(encoding='utf-8'))
+        assert stored['detections'][0]['label'] == 'cat' and stored['file_path'] is None
+        stored = json.loads((Path(tmp) / 'detections' / '1_3.json').read_text(encoding='utf-8'))
+        assert stored['file_path'] == paths[3] and stored['message_id'] == 3
+
+    print("✅ Inferencia por lotes correcta")
+
+
+def test_warm_up_loads_every_worker():
+    """El arranque solo termina si cada proceso del pool atiende una comprobación"""
+    print("🧪 Probando el arranque de todos los procesos...")
+
+    async def start(executor_workers):
+        service = InferenceService('fake-model', workers=2, executor=ThreadPoolExecutor(max_workers=executor_workers))
+        try:
+            return await service.start()
+        finally:
+            await service.stop()
+
+    previous_timeout = inference.WORKER_READY_TIMEOUT
+    inference._MODEL = lambda images, batch_size: []
+    inference.WORKER_READY_TIMEOUT = 0.2
+    try:
+        inference._READY_BARRIER = threading.Barrier(2)
+        assert asyncio.run(start(2)), "Con dos procesos el arranque debe completarse"
+        # Un único proceso no puede atender las dos comprobaciones
+        inference._READY_BARRIER = threading.Barrier(2)
+        assert not asyncio.run(start(1)), "Un proceso sin arrancar no debe darse por listo"
+    finally:
+        inference._MODEL, inference._READY_BARRIER = None, None
+        inference.WORKER_READY_TIMEOUT = previous_timeout
+
+    print("✅ Arranque de todos los procesos correcto")
+
+
+if __name__ == "__main__":
+    test_inference_batching()
+    test_warm_up_loads_every_worker()
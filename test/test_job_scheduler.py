@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test básico de la cola persistente de trabajos
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.append('.')
+
+from src.database import DatabaseManager, Job
+from src.utils.job_scheduler import JobScheduler
+from src.utils.job_tracker import JobTracker
+
+
+async def wait_for(condition, timeout=3):
+    """Esperar a que se cumpla una condición"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "Tiempo de espera agotado"
+        await asyncio.sleep(0.01)
+
+
+def test_job_round_trip():
+    """Los trabajos se guardan y los interrumpidos vuelven a la cola"""
+    print("🧪 Probando persistencia de trabajos...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'jobs.db'))
+        job = Job(kind='clips', payload={'chat_id': 1, 'message_id': 2})
+        assert db.create_job(job) == job.id
+
+        job.state, job.stage = 'running', 'downloaded'
+        job.payload['file_path'] = '/tmp/video.mp4'
+        assert db.update_job(job)
+
+        stored = db.get_job(job.id)
+        assert stored.payload == {'chat_id': 1, 'message_id': 2, 'file_path': '/tmp/video.mp4'}
+        assert stored.stage == 'downloaded' and stored.created_at is not None
+
+        assert db.requeue_running_jobs() == 1
+        assert [j.id for j in db.get_pending_jobs()] == [job.id]
+    print("✅ Trabajos persistidos correctamente")
+
+
+def test_retry_with_backoff():
+    """Los fallos se reintentan con espera exponencial hasta el máximo de intentos"""
+    print("🧪 Probando reintentos con espera exponencial...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'jobs.db'))
+        scheduler = JobScheduler(db, max_attempts=3, retry_base=0.01, retry_max=0.05)
+        assert [scheduler.backoff(n) for n in (1, 2, 3, 4)] == [0.01, 0.02, 0.04, 0.05]
+        calls = []
+
+        async def flaky(job):
+            calls.append(job.attempts)
+            if len(calls) == 1:
+                raise RuntimeError("fallo de red")
+            return len(calls) == 3
+
+        async def always_fails(job):
+            return False
+
+        scheduler.register('flaky', flaky)
+        scheduler.register('broken', always_fails)
+
+        async def run():
+            ok = await scheduler.submit('flaky', {})
+            ko = await scheduler.submit('broken', {})
+            await wait_for(lambda: db.get_job(ok.id).state == 'done' and db.get_job(ko.id).state == 'failed')
+            return db.get_job(ok.id), db.get_job(ko.id)
+
+        ok, ko = asyncio.run(run())
+        assert calls == [1, 2, 3] and ok.attempts == 3 and ok.last_error is None
+        assert ko.attempts == 3 and ko.last_error
+    print("✅ Reintentos correctos")
+
+
+def test_retry_without_backoff():
+    """Con espera cero el reintento se lanza en cuanto termina el intento fallido"""
+    print("🧪 Probando reintentos sin espera...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'jobs.db'))
+        scheduler = JobScheduler(db, max_attempts=3, retry_base=0)
+        calls = []
+
+        async def flaky(job):
+            calls.append(job.attempts)
+            return len(calls) == 2
+
+        scheduler.register('flaky', flaky)
+
+        async def run():
+            job = await scheduler.submit('flaky', {})
+            await wait_for(lambda: db.get_job(job.id).state == 'done', timeout=1)
+            return db.get_job(job.id)
+
+        job = asyncio.run(run())
+        assert calls == [1, 2] and job.attempts == 2
+    print("✅ Reintento inmediato correcto")
+
+
+def test_resume_from_last_stage():
+    """Un trabajo interrumpido se reanuda tras el reinicio sin repetir etapas completadas"""
+    print("🧪 Probando reanudación desde la última etapa...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'jobs.db'))
+        downloads = []
+
+        def make_handler(scheduler, block):
+            async def handler(job):
+                if job.stage is None:
+                    downloads.append(job.id)
+                    await scheduler.checkpoint(job, 'downloaded', file_path='video.mp4')
+                if block:
+                    await asyncio.sleep(10)
+                await scheduler.checkpoint(job, 'clips')
+                return True
+            return handler
+
+        async def first_run():
+            tracker = JobTracker()
+            scheduler = JobScheduler(db, jobs=tracker)
+            scheduler.register('clips', make_handler(scheduler, block=True))
+            job = await scheduler.submit('clips', {'chat_id': 1})
+            await wait_for(lambda: db.get_job(job.id).stage == 'downloaded')
+            # Apagado: el trabajo no termina a tiempo y se cancela
+            tracker.stop_accepting()
+            scheduler.stop()
+            assert await tracker.drain(timeout=0.1) == 1
+            return job.id
+
+        async def second_run():
+            scheduler = JobScheduler(db)
+            scheduler.register('clips', make_handler(scheduler, block=False))
+            assert await scheduler.start() == 1
+            await wait_for(lambda: db.get_job(job_id).state == 'done')
+
+        job_id = asyncio.run(first_run())
+        assert db.get_job(job_id).state == 'running'
+        asyncio.run(second_run())
+
+        job = db.get_job(job_id)
+        assert downloads == [job_id]
+        assert job.stage == 'clips' and job.attempts == 2
+        assert job.payload['file_path'] == 'video.mp4'
+    print("✅ Trabajo reanudado desde su última etapa")
+
+
+if __name__ == "__main__":
+    test_job_round_trip()
+    test_retry_with_backoff()
+    test_retry_without_backoff()
+    test_resume_from_last_stage()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test básico del logging asíncrono con cola
+"""
+
+import os
+import sys
+import json
+import logging
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+sys.path.append('.')
+
+from src.config import logger as log_config
+
+
+def _configure(tmp, **env):
+    """Configurar el logging desde cero con un archivo temporal"""
+    os.environ.update({'LOG_FILE': str(Path(tmp) / 'bot.log'), **env})
+    log_config._queue_handler, log_config._listener = None, None
+    log_config._worker_queue, log_config._worker_listener = None, None
+    log_config.configure_logging('INFO')
+    return Path(tmp) / 'bot.log'
+
+
+def _run_isolated(test):
+    """Ejecutar con el logger raíz limpio y restaurar el estado al terminar"""
+    root = logging.getLogger()
+    previous = (log_config._queue_handler, log_config._listener, log_config._module_levels,
+                log_config._worker_queue, log_config._worker_listener,
+                root.handlers[:], root.level, dict(os.environ))
+    root.handlers = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            test(tmp)
+    finally:
+        for handler in root.handlers:
+            handler.close()
+        (log_config._queue_handler, log_config._listener, log_config._module_levels,
+         log_config._worker_queue, log_config._worker_listener,
+         root.handlers, level, env) = previous
+        root.setLevel(level)
+        os.environ.clear()
+        os.environ.update(env)
+
+
+def test_queue_logging():
+    """Los registros se escriben desde el hilo del listener con formato perezoso"""
+    print("🧪 Probando logging con cola...")
+
+    def run(tmp):
+        log_file = _configure(tmp, LOG_LEVELS='test_quiet=ERROR')
+        listener_thread = log_config._listener._thread
+        emitted_in = []
+
+        class Tracked:
+            def __str__(self):
+                emitted_in.append(threading.current_thread())
+                return "valor"
+
+        log_config.setup_logger('test_queue_a').info("Progreso %s %.1f%%", Tracked(), 50.0)
+        log_config.setup_logger('test_queue_b').debug("No se formatea %s", Tracked())
+        log_config.setup_logger('test_quiet').warning("Silenciado por LOG_LEVELS")
+        # Un único handler en el raíz, ninguno en los loggers con nombre
+        assert logging.getLogger().handlers == [log_config._queue_handler]
+        assert not logging.getLogger('test_queue_a').handlers
+        log_config.shutdown_logging()
+
+        content = log_file.read_text(encoding='utf-8')
+        assert "Progreso valor 50.0%" in content
+        assert "No se formatea" not in content and "Silenciado" not in content
+        assert emitted_in and set(emitted_in) == {listener_thread}, "El mensaje se formateó fuera del listener"
+
+        # Tras detener el listener los registros se escriben directamente
+        assert log_config._queue_handler not in logging.getLogger().handlers
+        log_config.setup_logger('test_queue_a').info("Registro tardío")
+        assert "Registro tardío" in log_file.read_text(encoding='utf-8')
+
+    _run_isolated(run)
+    print("✅ Logging en segundo plano correcto")
+
+
+def test_json_logging():
+    """Con LOG_FORMAT=json cada registro es una línea JSON"""
+    print("🧪 Probando logging en JSON...")
+
+    def run(tmp):
+        log_file = _configure(tmp, LOG_FORMAT='json')
+        log_config.setup_logger('test_json').info("Hola %s", "mundo")
+        log_config.shutdown_logging()
+
+        record = json.loads(log_file.read_text(encoding='utf-8').splitlines()[-1])
+        assert record['message'] == "Hola mundo"
+        assert record['logger'] == 'test_json' and record['level'] == 'INFO'
+
+    _run_isolated(run)
+    print("✅ Logging en JSON correcto")
+
+
+def _log_from_worker(text):
+    """Escribir un registro desde un proceso hijo"""
+    logging.getLogger('test_worker').info(text)
+    return os.getpid()
+
+
+def test_worker_logging():
+    """Los procesos hijos escriben sus registros en el archivo del proceso principal"""
+    print("🧪 Probando logging desde procesos hijos...")
+
+    def run(tmp):
+        log_file = _configure(tmp)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=context,
+            initializer=log_config.configure_worker_logging,
+            initargs=log_config.worker_logging_args(context)
+        ) as executor:
+            worker_pid = executor.submit(_log_from_worker, "Hola desde el hijo").result(timeout=60)
+        log_config.shutdown_logging()
+
+        assert worker_pid != os.getpid()
+        assert "Hola desde el hijo" in log_file.read_text(encoding='utf-8')
+
+    _run_isolated(run)
+    print("✅ Logging desde procesos hijos correcto")
+
+
+if __name__ == "__main__":
+    test_queue_logging()
+    test_json_logging()
+    test_worker_logging()
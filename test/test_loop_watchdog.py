@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test básico del vigilante del bucle de eventos
+"""
+
+import sys
+import time
+import asyncio
+sys.path.append('.')
+
+from src.utils.loop_watchdog import LoopWatchdog
+from src.utils.metrics import LOOP_STALLS
+
+
+async def handle_incoming_message():
+    """Handler de prueba con una sección síncrona lenta"""
+    await asyncio.sleep(0)
+    time.sleep(0.4)
+
+
+def test_loop_watchdog_captures_blocking_handler():
+    """Un bloqueo síncrono se detecta con la pila del handler y se notifica"""
+    print("🧪 Probando vigilancia del bucle de eventos...")
+    notifications = []
+
+    async def notify(text):
+        notifications.append(text)
+
+    async def run():
+        watchdog = LoopWatchdog(threshold=0.15, interval=0.02, notify=notify)
+        task = asyncio.create_task(watchdog.run())
+        await asyncio.sleep(0.1)
+        # Telethon ejecuta cada handler en su propia tarea
+        await asyncio.create_task(handle_incoming_message())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return watchdog
+
+    before = LOOP_STALLS.value(handler='handle_incoming_message')
+    watchdog = asyncio.run(run())
+
+    assert len(watchdog.incidents) == 1
+    incident = watchdog.incidents[0]
+    assert incident['handler'] == 'handle_incoming_message'
+    assert 'time.sleep(0.4)' in incident['stack']
+    assert incident['lag'] >= 0.3
+    assert LOOP_STALLS.value(handler='handle_incoming_message') == before + 1
+    assert len(notifications) == 1 and 'handle_incoming_message' in notifications[0]
+    print("✅ Bloqueo detectado con la pila del handler")
+
+
+if __name__ == "__main__":
+    test_loop_watchdog_captures_blocking_handler()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test básico de la caché de medios descargados
+"""
+
+import sys
+import os
+import time
+import tempfile
+sys.path.append('.')
+
+from src.database import DatabaseManager
+from src.utils.media_cache import MediaCache
+
+
+def _write(path, size):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * size)
+    return path
+
+
+def test_media_cache():
+    """La eviction respeta los archivos fijados y el orden LRU"""
+    print("🧪 Probando MediaCache...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'data', 'cache.db'))
+        cache = MediaCache(db, max_bytes=250)
+
+        pinned = _write(os.path.join(tmp, 'pinned.mp4'), 100)
+        old = _write(os.path.join(tmp, 'old.jpg'), 100)
+        recent = _write(os.path.join(tmp, 'recent.jpg'), 100)
+
+        cache.register(pinned)
+        cache.register(old)
+        time.sleep(0.01)
+        cache.register(recent)
+        cache.unpin([old, recent])
+
+        # El archivo usado recientemente se conserva frente al antiguo
+        time.sleep(0.01)
+        cache.touch(old)
+        freed = cache.enforce_limits()
+        assert freed == 100, f"Bytes liberados inesperados: {freed}"
+        assert os.path.exists(pinned) and os.path.exists(old)
+        assert not os.path.exists(recent)
+
+        # make_room nunca borra archivos fijados
+        freed = cache.make_room(1000)
+        assert freed == 100 and os.path.exists(pinned) and not os.path.exists(old)
+
+    print("✅ Caché de medios funciona correctamente")
+
+
+def test_stale_partials():
+    """El barrido borra los .part abandonados y conserva los recientes"""
+    print("🧪 Probando limpieza de descargas incompletas...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'data', 'cache.db'))
+        cache = MediaCache(db, partial_dirs=[tmp], partial_max_age_hours=1)
+
+        stale = _write(os.path.join(tmp, 'doc_1.mp4.part'), 100)
+        active = _write(os.path.join(tmp, 'doc_2.mp4.part'), 100)
+        video = _write(os.path.join(tmp, 'video.mp4'), 100)
+        two_hours_ago = time.time() - 2 * 3600
+        os.utime(stale, (two_hours_ago, two_hours_ago))
+        os.utime(video, (two_hours_ago, two_hours_ago))
+
+        assert cache.remove_stale_partials() == 100
+        assert not os.path.exists(stale)
+        assert os.path.exists(active) and os.path.exists(video)
+    print("✅ Descargas incompletas abandonadas eliminadas")
+
+
+if __name__ == "__main__":
+    test_media_cache()
+    test_stale_partials()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test básico del proxy HTTP local de medios
+"""
+
+import sys
+import os
+import shutil
+import asyncio
+import subprocess
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+import pytest
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.file_manager import FileManager
+from src.utils.media_proxy import BLOCK_SIZE, MediaProxy, parse_range
+
+
+class RangeClient:
+    """Cliente mínimo que sirve un documento en memoria por bloques"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        self.calls.append((offset, limit))
+        end = len(self.data) if limit is None else min(len(self.data), offset + limit * request_size)
+        for position in range(offset, end, request_size):
+            yield self.data[position:position + request_size]
+
+
+def _reset_chunk_cache():
+    """Cerrar la caché de bloques compartida para que no pase de un test a otro"""
+    if TelegramMessenger._chunk_cache:
+        TelegramMessenger._chunk_cache.close()
+    TelegramMessenger._chunk_cache = None
+
+
+def _proxy(data, cache_mb=64):
+    _reset_chunk_cache()
+    client = RangeClient(data)
+    config = SimpleNamespace(
+        chat_me=1, chat_target=2, data_dir=tempfile.gettempdir(), temp_dir=tempfile.gettempdir(),
+        downloads_min_free_mb=0, chunk_cache_mb=cache_mb
+    )
+    media = MessageMediaDocument(document=Document(
+        id=77, access_hash=2, file_reference=b'', date=None, mime_type='video/x-matroska',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mkv')]
+    ))
+    proxy = MediaProxy(TelegramMessenger(client, config))
+    return client, proxy, SimpleNamespace(id=10, chat_id=20, media=media)
+
+
+async def fetch(proxy, path, range_header=None, method='GET'):
+    """Petición HTTP mínima: (código, cabeceras, cuerpo)"""
+    reader, writer = await asyncio.open_connection(proxy.host, proxy.port)
+    request = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+    if range_header:
+        request += f"Range: {range_header}\r\n"
+    writer.write((request + "\r\n").encode('latin-1'))
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, body
+
+
+def test_parse_range():
+    """Se entienden los rangos abiertos, cerrados y de sufijo"""
+    print("🧪 Probando cabeceras Range...")
+    assert parse_range(None, 100) is None
+    assert parse_range('bytes=10-19', 100) == (10, 19)
+    assert parse_range('bytes=90-', 100) == (90, 99)
+    assert parse_range('bytes=50-500', 100) == (50, 99)
+    assert parse_range('bytes=-10', 100) == (90, 99)
+    assert parse_range('bytes=0-1,5-6', 100) is None
+    with pytest.raises(ValueError):
+        parse_range('bytes=100-', 100)
+    print("✅ Cabeceras Range correctas")
+
+
+def test_range_requests():
+    """El proxy sirve rangos que cruzan bloques y reutiliza los bloques ya leídos"""
+    print("🧪 Probando peticiones por rango...")
+    data = os.urandom(6 * BLOCK_SIZE + 1234)
+    client, proxy, message = _proxy(data)
+
+    async def run():
+        await proxy.start()
+        try:
+            url = proxy.url_for(message)
+            assert url == f"http://127.0.0.1:{proxy.port}/media/77"
+            path = url.split(str(proxy.port))[1]
+
+            status, headers, body = await fetch(proxy, path, f"bytes={BLOCK_SIZE - 10}-{BLOCK_SIZE + 9}")
+            assert status == 206 and body == data[BLOCK_SIZE - 10:BLOCK_SIZE + 10]
+            assert headers['Content-Range'] == f"bytes {BLOCK_SIZE - 10}-{BLOCK_SIZE + 9}/{len(data)}"
+            calls = len(client.calls)
+
+            # Índice al final del archivo: ffmpeg lo pide varias veces (caché de bloques)
+            for _ in range(2):
+                status, _, body = await fetch(proxy, path, f"bytes={BLOCK_SIZE}-{BLOCK_SIZE + 99}")
+                assert status == 206 and body == data[BLOCK_SIZE:BLOCK_SIZE + 100]
+            assert len(client.calls) == calls
+
+            status, headers, body = await fetch(proxy, path)
+            assert status == 200 and body == data and headers['Accept-Ranges'] == 'bytes'
+
+            status, headers, _ = await fetch(proxy, path, f"bytes={len(data)}-")
+            assert status == 416 and headers['Content-Range'] == f"bytes */{len(data)}"
+            assert (await fetch(proxy, '/media/78'))[0] == 404
+        finally:
+            proxy.close()
+            _reset_chunk_cache()
+
+    asyncio.run(run())
+    print("✅ Peticiones por rango correctas")
+
+
+def test_seek_reads_little():
+    """Si el cliente cierra la conexión tras un salto solo se descarga el comienzo del rango"""
+    print("🧪 Probando saltos con rangos abiertos...")
+    data = os.urandom(40 * BLOCK_SIZE)
+    client, proxy, message = _proxy(data, cache_mb=0)
+
+    async def run():
+        await proxy.start()
+        try:
+            proxy.url_for(message)
+            reader, writer = await asyncio.open_connection(proxy.host, proxy.port)
+            writer.write(f"GET /media/77 HTTP/1.1\r\nRange: bytes={10 * BLOCK_SIZE}-\r\n\r\n".encode())
+            await reader.readexactly(1000)
+            writer.close()
+            await asyncio.sleep(0.2)
+        finally:
+            proxy.close()
+            _reset_chunk_cache()
+
+    asyncio.run(run())
+    fetched = sum(limit for _, limit in client.calls)
+    assert client.calls[0] == (10 * BLOCK_SIZE, 1) and fetched < 40
+    print("✅ Solo se descargan los bloques leídos")
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg no disponible")
+def test_ffprobe_through_proxy():
+    """ffprobe lee la duración de un video con el índice al final a través del proxy"""
+    print("🧪 Probando ffprobe por el proxy...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, 'input.mp4')
+        subprocess.run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=30:size=320x240:rate=25',
+            '-c:v', 'libx264', '-preset', 'ultrafast', video_path
+        ], capture_output=True, check=True)
+        with open(video_path, 'rb') as f:
+            data = f.read()
+        client, proxy, message = _proxy(data)
+
+        async def run():
+            await proxy.start()
+            try:
+                return await FileManager().get_video_duration(proxy.url_for(message))
+            finally:
+                proxy.close()
+                _reset_chunk_cache()
+
+        assert 29 < asyncio.run(run()) < 31
+    print("✅ ffprobe por el proxy correcto")
+
+
+if __name__ == "__main__":
+    test_parse_range()
+    test_range_requests()
+    test_seek_reads_little()
+    test_ffprobe_through_proxy()
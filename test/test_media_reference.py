@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Test básico de las referencias persistentes a documentos
+"""
+
+import sys
+import json
+sys.path.append('.')
+
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.utils.media_reference import document_to_dict, document_from_dict
+
+
+def test_document_roundtrip():
+    """La referencia guardada reconstruye el mismo documento"""
+    print("🧪 Probando referencias de documentos...")
+    document = Document(
+        id=123, access_hash=-456, file_reference=b'\x01\x02\xff', date=None,
+        mime_type='video/mp4', size=50 * 1024 * 1024, dc_id=4,
+        attributes=[DocumentAttributeFilename('video.mp4')]
+    )
+
+    data = json.loads(json.dumps(document_to_dict(MessageMediaDocument(document=document))))
+    media = document_from_dict(data)
+
+    assert isinstance(media, MessageMediaDocument)
+    restored = media.document
+    assert (restored.id, restored.access_hash, restored.file_reference) == (123, -456, b'\x01\x02\xff')
+    assert restored.dc_id == 4 and restored.size == 50 * 1024 * 1024
+    assert restored.attributes[0].file_name == 'video.mp4'
+    assert document_to_dict(None) is None
+    print("✅ Referencia de documento reconstruida correctamente")
+
+
+if __name__ == "__main__":
+    test_document_roundtrip()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test básico de las métricas y su endpoint HTTP
+"""
+
+import sys
+import asyncio
+sys.path.append('.')
+
+from src.utils.metrics import MetricsRegistry, format_summary, start_metrics_server, timed
+
+
+def test_metrics_registry():
+    """Los histogramas miden duración y resultado y se exponen por HTTP"""
+    print("🧪 Probando métricas...")
+    registry = MetricsRegistry()
+    api = registry.histogram('test_api_seconds', 'Llamadas de prueba', ('method', 'outcome'), buckets=(0.1, 1))
+    downloads = registry.counter('test_bytes_total', 'Bytes de prueba', ('method',))
+
+    @timed(api, label='method')
+    async def send_message(ok):
+        return object() if ok else None
+
+    async def run():
+        await send_message(True)
+        await send_message(True)
+        await send_message(False)
+        downloads.inc(1024, method='download')
+
+        server = await start_metrics_server('127.0.0.1', 0, registry)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = (await reader.read()).decode('utf-8')
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    response = asyncio.run(run())
+
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'test_api_seconds_count{method="send_message",outcome="ok"} 2' in response
+    assert 'test_api_seconds_count{method="send_message",outcome="error"} 1' in response
+    assert 'test_api_seconds_bucket{method="send_message",outcome="ok",le="+Inf"} 2' in response
+    assert 'test_bytes_total{method="download"} 1024' in response
+
+    summary = format_summary(registry)
+    assert "`send_message`: 2×" in summary
+    print("✅ Métricas registradas y expuestas correctamente")
+
+
+if __name__ == "__main__":
+    test_metrics_registry()
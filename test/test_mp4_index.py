@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Test básico del índice MP4 y de la descarga por rangos para los clips
+"""
+
+import sys
+import os
+import shutil
+import struct
+import asyncio
+import subprocess
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+import pytest
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.file_manager import FileManager
+from src.utils.mp4_index import Mp4IndexError, load_mp4_index, merge_ranges
+
+# Video sintético: 100 fotogramas de 1000 bytes a 10 fps (clave cada 10) y
+# 50 muestras de audio de 200 bytes, intercalados en chunks de 4 y 2 muestras
+VIDEO_SAMPLES, VIDEO_SIZE, AUDIO_SAMPLES, AUDIO_SIZE = 100, 1000, 50, 200
+
+
+def box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def full_box(box_type, payload):
+    return box(box_type, b'\0\0\0\0' + payload)
+
+
+def trak(kind, timescale, delta, sizes, per_chunk, chunk_offsets, sync=None):
+    tables = [
+        full_box(b'stts', struct.pack('>III', 1, len(sizes), delta)),
+        full_box(b'stsc', struct.pack('>IIII', 1, 1, per_chunk, 1)),
+        full_box(b'stsz', struct.pack(f'>II{len(sizes)}I', 0, len(sizes), *sizes)),
+        full_box(b'stco', struct.pack(f'>I{len(chunk_offsets)}I', len(chunk_offsets), *chunk_offsets)),
+    ]
+    if sync:
+        tables.append(full_box(b'stss', struct.pack(f'>I{len(sync)}I', len(sync), *sync)))
+    mdia = (
+        full_box(b'mdhd', struct.pack('>IIII', 0, 0, timescale, delta * len(sizes)) + b'\0' * 4)
+        + full_box(b'hdlr', b'\0' * 4 + kind + b'\0' * 13)
+        + box(b'minf', box(b'stbl', b''.join(tables)))
+    )
+    return box(b'trak', box(b'mdia', mdia))
+
+
+def build_mp4():
+    """MP4 con ftyp, mdat y moov al final"""
+    ftyp = box(b'ftyp', b'isom\0\0\0\0isom')
+    chunks = VIDEO_SAMPLES // 4
+    chunk_size = 4 * VIDEO_SIZE + 2 * AUDIO_SIZE
+    mdat_start = len(ftyp) + 8
+    video_offsets = [mdat_start + i * chunk_size for i in range(chunks)]
+    audio_offsets = [offset + 4 * VIDEO_SIZE for offset in video_offsets]
+    mdat = box(b'mdat', os.urandom(chunks * chunk_size))
+    moov = box(b'moov', (
+        full_box(b'mvhd', struct.pack('>IIII', 0, 0, 1000, 10000) + b'\0' * 80)
+        + trak(b'vide', 1000, 100, [VIDEO_SIZE] * VIDEO_SAMPLES, 4, video_offsets,
+               sync=list(range(1, VIDEO_SAMPLES + 1, 10)))
+        + trak(b'soun', 1000, 200, [AUDIO_SIZE] * AUDIO_SAMPLES, 2, audio_offsets)
+    ))
+    return ftyp + mdat + moov
+
+
+def reader(data, reads):
+    async def read_range(offset, length):
+        reads.append(length)
+        return data[offset:offset + length]
+    return read_range
+
+
+def test_load_index():
+    """El índice se lee sin descargar mdat y los clips empiezan en un fotograma clave"""
+    print("🧪 Probando lectura del índice MP4...")
+    data = build_mp4()
+    reads = []
+    index = asyncio.run(load_mp4_index(reader(data, reads), len(data)))
+
+    assert index.duration == 10.0
+    video, audio = index.tracks
+    assert (video.kind, audio.kind) == ('vide', 'soun')
+    assert len(video.offsets) == VIDEO_SAMPLES and len(audio.offsets) == AUDIO_SAMPLES
+    assert sum(reads) < len(data) // 10
+
+    # 5.5s cae entre los fotogramas clave 50 y 60: se empieza en el 50
+    assert video.sample_range(5.5, 6.0) == (50, 61)
+    ranges = index.byte_ranges(5.5, 6.0, margin=0)
+    assert ranges[0][0] == video.offsets[50]
+    end = ranges[-1][0] + ranges[-1][1]
+    assert end >= video.offsets[60] + VIDEO_SIZE and end < len(data) - 1000
+
+    # Los clips incluyen las cabeceras (ftyp y moov)
+    clip_ranges = index.clip_ranges([5.0], 1)
+    covered = lambda offset: any(start <= offset < start + length for start, length in clip_ranges)
+    assert covered(0) and covered(len(data) - 1)
+    print("✅ Índice MP4 correcto")
+
+
+def test_merge_ranges():
+    """Los rangos solapados o cercanos se fusionan"""
+    print("🧪 Probando fusión de rangos...")
+    ranges = [(100, 10), (0, 10), (5, 10), (200, 10), (300, 0)]
+    assert merge_ranges(ranges, gap=0) == [(0, 15), (100, 10), (200, 10)]
+    assert merge_ranges(ranges, gap=85) == [(0, 110), (200, 10)]
+    print("✅ Fusión de rangos correcta")
+
+
+def test_unsupported_files():
+    """Los MP4 fragmentados y los archivos que no son MP4 se rechazan"""
+    print("🧪 Probando archivos no admitidos...")
+    fragmented = box(b'ftyp', b'isom\0\0\0\0') + box(b'moof', b'\0' * 16) + box(b'mdat', b'\0' * 64)
+    not_mp4 = b'\x1aE\xdf\xa3' + os.urandom(200)
+    no_moov = box(b'ftyp', b'isom\0\0\0\0') + box(b'mdat', b'\0' * 64)
+    for data in (fragmented, not_mp4, no_moov):
+        with pytest.raises(Mp4IndexError):
+            asyncio.run(load_mp4_index(reader(data, []), len(data)))
+    print("✅ Archivos no admitidos rechazados")
+
+
+class RangeClient:
+    """Cliente mínimo que sirve un documento en memoria por bloques"""
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        assert offset % request_size == 0
+        self.calls.append((offset, limit))
+        end = len(self.data) if limit is None else min(len(self.data), offset + limit * request_size)
+        for position in range(offset, end, request_size):
+            yield self.data[position:position + request_size]
+
+
+def _messenger(data, temp_dir):
+    client = RangeClient(data)
+    config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+    media = MessageMediaDocument(document=Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    ))
+    return client, TelegramMessenger(client, config), SimpleNamespace(id=10, chat_id=20, media=media)
+
+
+def test_download_ranges():
+    """Solo se descargan los bloques de los rangos pedidos, en su posición"""
+    print("🧪 Probando descarga por rangos...")
+    block = DOWNLOAD_REQUEST_SIZE
+    data = os.urandom(10 * block)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        client, messenger, message = _messenger(data, temp_dir)
+
+        # Rango que cruza un límite de bloque
+        chunk = asyncio.run(messenger.download_range(message, block - 5, 10))
+        assert chunk == data[block - 5:block + 5]
+        assert client.calls == [(0, 2)]
+
+        client.calls.clear()
+        sparse_path = os.path.join(temp_dir, 'sparse.mp4')
+        ranges = [(block + 100, 10), (2 * block, 10), (7 * block + 3, 5)]
+        fetched = asyncio.run(messenger.download_ranges(message, sparse_path, ranges))
+
+        assert fetched == 3 * block
+        assert client.calls == [(block, 2), (7 * block, 1)]
+        with open(sparse_path, 'rb') as f:
+            written = f.read()
+        assert len(written) == len(data)
+        assert written[block:3 * block] == data[block:3 * block]
+        assert written[7 * block:8 * block] == data[7 * block:8 * block]
+        assert written[:block] == b'\0' * block
+    print("✅ Descarga por rangos correcta")
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="ffmpeg no disponible")
+def test_clip_from_sparse_file():
+    """ffmpeg corta un clip de un archivo disperso con solo los rangos del índice"""
+    print("🧪 Probando clip desde un archivo disperso...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_path = os.path.join(temp_dir, 'input.mp4')
+        subprocess.run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=60:size=320x240:rate=25',
+            '-f', 'lavfi', '-i', 'sine=duration=60',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '50', '-c:a', 'aac', video_path
+        ], capture_output=True, check=True)
+        with open(video_path, 'rb') as f:
+            data = f.read()
+
+        client, messenger, message = _messenger(data, temp_dir)
+        index = asyncio.run(load_mp4_index(
+            lambda offset, length: messenger.download_range(message, offset, length), len(data)
+        ))
+        assert 59 < index.duration < 61
+
+        sparse_path = os.path.join(temp_dir, 'sparse.mp4')
+        fetched = asyncio.run(messenger.download_ranges(message, sparse_path, index.clip_ranges([30.0], 5)))
+        assert fetched < len(data)
+
+        clip_path = os.path.join(temp_dir, 'clip.mp4')
+        ok, result = asyncio.run(FileManager().create_video_clip(sparse_path, clip_path, 30.0, clip_duration=5))
+        assert ok, result
+        assert os.path.getsize(clip_path) > 0
+    print("✅ Clip creado desde un archivo disperso")
+
+
+if __name__ == "__main__":
+    test_load_index()
+    test_merge_ranges()
+    test_unsupported_files()
+    test_download_ranges()
+    test_clip_from_sparse_file()
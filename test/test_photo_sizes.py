@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Test básico de la selección de variantes de fotos
+"""
+
+import sys
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.tl.types import PhotoSize, PhotoSizeProgressive, PhotoStrippedSize
+
+from src.utils.photo_sizes import TASK_MIN_SIDE, select_photo_size
+
+
+def test_select_photo_size():
+    """Se elige la variante más pequeña que cumple el lado mínimo"""
+    print("🧪 Probando la selección de PhotoSize...")
+    photo = SimpleNamespace(sizes=[
+        PhotoStrippedSize('i', b'\x01\x28\x1e'),
+        PhotoSize('m', 320, 240, 20_000),
+        PhotoSize('s', 90, 68, 2_000),
+        PhotoSizeProgressive('y', 1280, 960, [40_000, 120_000, 250_000])
+    ])
+
+    assert select_photo_size(photo, TASK_MIN_SIDE['hash']).type == 's'
+    assert select_photo_size(photo, TASK_MIN_SIDE['classification']).type == 'm'
+    # Si ninguna llega al mínimo se usa la mayor
+    assert select_photo_size(photo, 4000).type == 'y'
+    assert select_photo_size(SimpleNamespace(sizes=[]), 64) is None
+    print("✅ Variantes seleccionadas correctamente")
+
+
+if __name__ == "__main__":
+    test_select_photo_size()
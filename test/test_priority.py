@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Test básico de los carriles de prioridad
+"""
+
+import sys
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.priority import (
+    BULK, INTERACTIVE, NORMAL, PriorityLimiter, current_lane, priority_lane, run_in_lane
+)
+
+
+def test_lane_shares():
+    """El trabajo masivo no ocupa más de su parte y deja huecos a los botones"""
+    print("🧪 Probando reparto de huecos por carril...")
+    limiter = PriorityLimiter('api', slots=4, shares={BULK: 0.5, NORMAL: 0.75})
+    assert limiter.limits == {INTERACTIVE: 4, NORMAL: 3, BULK: 2}
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(lane):
+            async with limiter.slot(lane):
+                await release.wait()
+
+        bulk = [asyncio.create_task(hold(BULK)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert limiter.in_use(BULK) == 2 and limiter.waiting(BULK) == 2
+
+        # Un botón no espera aunque haya subidas en curso
+        async with limiter.slot(INTERACTIVE):
+            assert limiter.active == 3
+
+        release.set()
+        await asyncio.gather(*bulk)
+        assert limiter.active == 0
+
+    asyncio.run(run())
+    print("✅ Reparto de huecos correcto")
+
+
+def test_interactive_reserve():
+    """Los carriles normal y masivo juntos siempre dejan un hueco a los botones"""
+    print("🧪 Probando hueco reservado al carril interactivo...")
+    limiter = PriorityLimiter('api', slots=4)
+    assert limiter.background_limit == 3
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold(lane):
+            async with limiter.slot(lane):
+                await release.wait()
+
+        holders = [asyncio.create_task(hold(lane)) for lane in (NORMAL, NORMAL, NORMAL, BULK)]
+        await asyncio.sleep(0.01)
+        assert limiter.in_use(NORMAL) == 3 and limiter.waiting(BULK) == 1
+
+        async with limiter.slot(INTERACTIVE):
+            assert limiter.active == 4
+
+        release.set()
+        await asyncio.gather(*holders)
+        assert limiter.active == 0
+
+    asyncio.run(run())
+    print("✅ Hueco reservado correcto")
+
+
+class SlowClient:
+    """Cliente mínimo que sirve un documento en memoria con latencia por bloque"""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        for position in range(offset, len(self.data), request_size):
+            await asyncio.sleep(0.01)
+            yield self.data[position:position + request_size]
+
+
+def test_download_releases_api_slot():
+    """Una descarga larga solo ocupa un hueco de la API mientras pide cada bloque"""
+    print("🧪 Probando huecos de la API durante una descarga...")
+    data = b'\0' * (4 * DOWNLOAD_REQUEST_SIZE)
+    message = SimpleNamespace(id=10, chat_id=20, media=MessageMediaDocument(document=Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    )))
+    active = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+        messenger = TelegramMessenger(SlowClient(data), config)
+
+        async def run():
+            with priority_lane(BULK):
+                return await messenger.download_media_from_message(
+                    message, download_dir=temp_dir, file_name='video.mp4',
+                    progress_callback=lambda current, total: active.append(messenger.api_limiter.active)
+                )
+
+        assert asyncio.run(run())
+    assert active == [0, 0, 0, 0]
+    print("✅ Huecos de la API liberados entre bloques")
+
+
+def test_priority_order():
+    """Los huecos liberados van primero al carril interactivo"""
+    print("🧪 Probando orden de atención...")
+    limiter = PriorityLimiter('ffmpeg', slots=1)
+    order = []
+
+    async def run():
+        async def job(lane):
+            async with limiter.slot(lane):
+                order.append(lane)
+                await asyncio.sleep(0)
+
+        async with limiter.slot(BULK):
+            tasks = [asyncio.create_task(job(lane)) for lane in (BULK, NORMAL, INTERACTIVE)]
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == [INTERACTIVE, NORMAL, BULK]
+    print("✅ Orden de atención correcto")
+
+
+def test_nested_and_cancelled():
+    """Las llamadas anidadas reutilizan el hueco y las esperas canceladas no lo pierden"""
+    print("🧪 Probando llamadas anidadas y cancelación...")
+    limiter = PriorityLimiter('api', slots=1)
+
+    async def run():
+        async with limiter.slot(NORMAL):
+            # Reintento anidado en la misma tarea: no se bloquea
+            async with limiter.slot(NORMAL):
+                assert limiter.active == 1
+
+            waiter = asyncio.create_task(limiter.slot(INTERACTIVE).__aenter__())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+
+        assert limiter.active == 0
+        async with limiter.slot(BULK):
+            assert limiter.in_use(BULK) == 1
+
+    asyncio.run(run())
+    print("✅ Llamadas anidadas y cancelación correctas")
+
+
+class FloodClient:
+    """Cliente falso cuyo primer envío devuelve un FloodWait"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def send_message(self, chat, text, **kwargs):
+        self.calls.append(text)
+        if self.calls == ['a']:
+            raise FloodWaitError(request=None, capture=0)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(id=len(self.calls), chat_id=chat)
+
+
+def test_flood_wait_releases_slot():
+    """La espera de un FloodWait deja el hueco a otras llamadas y lo recupera para el reintento"""
+    print("🧪 Probando el hueco durante un FloodWait...")
+    client = FloodClient()
+    previous = TelegramMessenger._api_limiter
+    TelegramMessenger._api_limiter = PriorityLimiter('telegram_api', slots=1)
+
+    async def run():
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+            messenger = TelegramMessenger(client, config)
+            sent = await asyncio.gather(messenger.send_text_message('a'), messenger.send_text_message('b'))
+            assert all(sent) and messenger.api_limiter.active == 0
+
+            # Si se cancela durante la espera el hueco no se pierde
+            limiter = messenger.api_limiter
+
+            async def cancelled_wait():
+                async with limiter.slot():
+                    async with limiter.released():
+                        await asyncio.sleep(10)
+
+            task = asyncio.create_task(cancelled_wait())
+            await asyncio.sleep(0.01)
+            assert limiter.active == 0
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            assert limiter.active == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        TelegramMessenger._api_limiter = previous
+    # El envío de "b" aprovechó el hueco mientras "a" esperaba el FloodWait
+    assert client.calls == ['a', 'b', 'a'], client.calls
+    print("✅ Hueco liberado durante el FloodWait")
+
+
+def test_lane_propagation():
+    """El carril se hereda en las llamadas y tareas que cuelgan del trabajo"""
+    print("🧪 Probando propagación del carril...")
+
+    async def lane_of_task():
+        return current_lane()
+
+    @run_in_lane(INTERACTIVE)
+    async def handler():
+        child = asyncio.create_task(lane_of_task())
+        with priority_lane(BULK):
+            heavy = current_lane()
+        return current_lane(), await child, heavy
+
+    assert asyncio.run(handler()) == (INTERACTIVE, INTERACTIVE, BULK)
+    assert current_lane() == NORMAL
+    print("✅ Carril propagado correctamente")
+
+
+if __name__ == "__main__":
+    test_lane_shares()
+    test_interactive_reserve()
+    test_download_releases_api_slot()
+    test_priority_order()
+    test_nested_and_cancelled()
+    test_flood_wait_releases_slot()
+    test_lane_propagation()
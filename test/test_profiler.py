@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test básico del perfilador activable en caliente
+"""
+
+import sys
+import os
+import asyncio
+import pstats
+import tempfile
+sys.path.append('.')
+
+from src.utils.profiler import RuntimeProfiler
+
+
+def slow_function():
+    return sum(i * i for i in range(20000))
+
+
+def test_runtime_profiler():
+    """start/stop genera un .pstats y un resumen con las funciones ejecutadas"""
+    print("🧪 Probando perfilador...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        profiler = RuntimeProfiler(temp_dir, top=10)
+
+        async def run():
+            assert await profiler.stop() is None
+            assert profiler.start()
+            assert not profiler.start()
+            slow_function()
+            await asyncio.sleep(0)
+            return await profiler.stop()
+
+        path, summary = asyncio.run(run())
+
+        assert not profiler.running
+        assert os.path.dirname(path) == temp_dir and path.endswith('.pstats')
+        assert 'slow_function' in summary
+        stats = pstats.Stats(path)
+        assert any(func[2] == 'slow_function' for func in stats.stats)
+    print("✅ Perfil guardado y resumido correctamente")
+
+
+if __name__ == "__main__":
+    test_runtime_profiler()
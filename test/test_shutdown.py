@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Test básico del apagado ordenado: trabajos, procesos de ffmpeg y descargas reanudables
+"""
+
+import sys
+import os
+import time
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append('.')
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import Document, DocumentAttributeFilename, MessageMediaDocument
+
+from src.telegram_client import DOWNLOAD_REQUEST_SIZE, TelegramMessenger
+from src.utils.download_admission import DownloadAdmissionController
+from src.utils.file_manager import FileManager
+from src.utils.job_tracker import JobTracker
+
+
+def test_job_tracker_drain():
+    """Los trabajos rápidos terminan y los lentos se cancelan al agotar el plazo"""
+    print("🧪 Probando drenado de trabajos...")
+    tracker = JobTracker()
+    finished = []
+
+    @tracker.wrap
+    async def job(seconds):
+        await asyncio.sleep(seconds)
+        finished.append(seconds)
+
+    async def run():
+        tasks = [asyncio.create_task(job(0.05)), asyncio.create_task(job(10))]
+        await asyncio.sleep(0)
+        assert tracker.active == 2
+        tracker.stop_accepting()
+        cancelled = await tracker.drain(timeout=0.3)
+        return cancelled, tasks
+
+    cancelled, tasks = asyncio.run(run())
+    assert not tracker.accepting
+    assert cancelled == 1 and finished == [0.05]
+    assert tasks[1].cancelled() and tracker.active == 0
+    print("✅ Trabajos drenados correctamente")
+
+
+def test_terminate_processes():
+    """Los procesos hijos en curso se terminan al apagar"""
+    print("🧪 Probando terminación de procesos...")
+    fm = FileManager()
+
+    async def run():
+        task = asyncio.create_task(fm._run([sys.executable, '-c', 'import time; time.sleep(30)']))
+        await asyncio.sleep(0.3)
+        started = time.perf_counter()
+        terminated = await FileManager.terminate_processes(timeout=2)
+        result = await task
+        return terminated, result, time.perf_counter() - started
+
+    terminated, result, elapsed = asyncio.run(run())
+    assert terminated == 1
+    assert result.returncode != 0
+    assert elapsed < 2
+    assert not FileManager._processes
+    print("✅ Procesos terminados correctamente")
+
+
+class ResumableClient:
+    """Cliente mínimo cuya descarga se corta una vez con FloodWait"""
+
+    def __init__(self, data):
+        self.data = data
+        self.offsets = []
+        self.fail_at = 2 * DOWNLOAD_REQUEST_SIZE
+        self.error = lambda: FloodWaitError(request=None, capture=0)
+
+    async def iter_download(self, media, offset=0, request_size=DOWNLOAD_REQUEST_SIZE, limit=None, file_size=None):
+        self.offsets.append(offset)
+        position = offset
+        while position < len(self.data):
+            if self.fail_at is not None and position >= self.fail_at:
+                self.fail_at = None
+                raise self.error()
+            yield self.data[position:position + request_size]
+            position += request_size
+
+
+def test_resumable_download():
+    """Una descarga interrumpida continúa desde su archivo .part"""
+    print("🧪 Probando descarga reanudable...")
+    data = os.urandom(3 * DOWNLOAD_REQUEST_SIZE + 1000)
+    client = ResumableClient(data)
+    media = MessageMediaDocument(document=Document(
+        id=1, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    ))
+    message = SimpleNamespace(id=10, chat_id=20, media=media)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+        messenger = TelegramMessenger(client, config)
+        path = asyncio.run(messenger.download_media_from_message(message, download_dir=temp_dir, file_name='video.mp4'))
+
+        assert path == os.path.join(temp_dir, 'video.mp4')
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert client.offsets == [0, 2 * DOWNLOAD_REQUEST_SIZE]
+        assert not os.path.exists(path + '.part')
+    print("✅ Descarga reanudada desde el archivo parcial")
+
+
+def test_resume_without_file_name():
+    """Los documentos sin nombre usan su ID para encontrar el .part al reintentar"""
+    print("🧪 Probando reanudación de documentos sin nombre...")
+    data = os.urandom(3 * DOWNLOAD_REQUEST_SIZE)
+    client = ResumableClient(data)
+    client.fail_at = None
+    media = MessageMediaDocument(document=Document(
+        id=99, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[]
+    ))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        part_path = os.path.join(temp_dir, 'doc_99.mp4.part')
+        with open(part_path, 'wb') as f:
+            f.write(data[:DOWNLOAD_REQUEST_SIZE])
+        config = SimpleNamespace(chat_me=1, chat_target=2, data_dir=temp_dir, downloads_min_free_mb=0)
+        messenger = TelegramMessenger(client, config)
+        message = SimpleNamespace(id=10, chat_id=20, media=media)
+        path = asyncio.run(messenger.download_media_from_message(message, download_dir=temp_dir))
+
+        assert path == os.path.join(temp_dir, 'doc_99.mp4')
+        assert client.offsets == [DOWNLOAD_REQUEST_SIZE]
+        with open(path, 'rb') as f:
+            assert f.read() == data
+    print("✅ Descarga sin nombre reanudada desde su .part")
+
+
+def test_failed_download_keeps_part():
+    """Un error de red o la falta de espacio no borran el .part: se reanuda después"""
+    print("🧪 Probando que los fallos conservan el .part...")
+    data = os.urandom(3 * DOWNLOAD_REQUEST_SIZE)
+    client = ResumableClient(data)
+    client.error = lambda: ConnectionError("conexión perdida")
+    message = SimpleNamespace(id=10, chat_id=20, media=MessageMediaDocument(document=Document(
+        id=7, access_hash=2, file_reference=b'', date=None, mime_type='video/mp4',
+        size=len(data), dc_id=2, attributes=[DocumentAttributeFilename('video.mp4')]
+    )))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        config = SimpleNamespace(chat_me=None, chat_target=None, data_dir=temp_dir, downloads_min_free_mb=0)
+        messenger = TelegramMessenger(client, config)
+        part_path = os.path.join(temp_dir, 'video.mp4.part')
+
+        def download():
+            return asyncio.run(messenger.download_media_from_message(message, download_dir=temp_dir, file_name='video.mp4'))
+
+        assert download() is None
+        assert os.path.getsize(part_path) == 2 * DOWNLOAD_REQUEST_SIZE
+
+        # Sin espacio la descarga se rechaza, pero lo descargado se conserva
+        previous = TelegramMessenger._admission_controller
+        TelegramMessenger._admission_controller = DownloadAdmissionController(temp_dir, budget_bytes=1)
+        try:
+            assert download() is None
+        finally:
+            TelegramMessenger._admission_controller = previous
+        assert os.path.getsize(part_path) == 2 * DOWNLOAD_REQUEST_SIZE
+
+        path = download()
+        assert client.offsets == [0, 2 * DOWNLOAD_REQUEST_SIZE]
+        with open(path, 'rb') as f:
+            assert f.read() == data
+        assert not os.path.exists(part_path)
+    print("✅ El .part se conserva tras los fallos")
+
+
+if __name__ == "__main__":
+    test_job_tracker_drain()
+    test_terminate_processes()
+    test_resumable_download()
+    test_resume_without_file_name()
+    test_failed_download_keeps_part()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Test básico del simulador de Telegram sin conexión
+"""
+
+import sys
+import asyncio
+import tempfile
+sys.path.append('.')
+
+from fake_telegram import (
+    CHAT_ME, CHAT_TARGET, SOURCE_CHAT, FakeCallbackEvent, FakeNewMessageEvent, FakeTelegramClient,
+    _photo, _video, build_bot, simulate, simulation_config, working_directory
+)
+from src.database import Job
+from src.database.models import Message
+from src.utils.media_reference import document_to_dict
+
+
+def test_simulated_load():
+    """Los handlers reales procesan un flujo sintético con latencia y FloodWait"""
+    print("🧪 Probando simulador de Telegram...")
+
+    async def run():
+        client = FakeTelegramClient(latency=0.001, flood_wait_rate=0.02, flood_wait_seconds=0, seed=7)
+        build_bot(client, simulation_config(temp_dir='temp', long_video_preview_enabled=False))
+
+        # Un comando recibe su respuesta en el mismo chat
+        ping = client._new_message(CHAT_ME, text='/ping', sender_id=42)
+        await client.dispatch(FakeNewMessageEvent(ping))
+        assert any('Pong' in m.text for m in client.messages.values() if m.out)
+
+        return client, await simulate(client, events_count=80, rate=400, seed=7)
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        client, report = asyncio.run(run())
+
+    assert report.events == 80
+    assert sum(len(values) for values in report.latencies.values()) == 80
+    assert {'photo', 'short_video', 'callback'} <= set(report.latencies)
+    assert report.api_calls['send_file'] > 0
+    assert report.handler_errors == 0
+    p50, p99 = report.percentiles([value for values in report.latencies.values() for value in values])
+    assert 0 < p50 <= p99
+    assert "eventos/s" in report.format()
+    print(report.format())
+    print("✅ Simulación completada correctamente")
+
+
+def test_preview_uses_kept_source():
+    """Los botones de una vista previa usan el documento vigente del mensaje original conservado"""
+    print("🧪 Probando el mensaje original conservado de una vista previa...")
+
+    async def run():
+        client = FakeTelegramClient(seed=3)
+        bot = build_bot(client, simulation_config(temp_dir='temp'))
+        source = client._new_message(SOURCE_CHAT, media=_video(100), sender_id=42)
+        preview = client._new_message(CHAT_ME, text='vista previa', buttons=[['send_to_target']], out=True)
+        # La referencia guardada es de otro documento: si se usara, el envío sería incorrecto
+        expired = document_to_dict(_video(100))
+        bot.callback_handler.db_manager.save_message(Message(
+            message_id=preview.id, chat_id=CHAT_ME, user_id=CHAT_ME, message_type='document',
+            media_info={'document': expired, 'source': {'chat_id': SOURCE_CHAT, 'message_id': source.id}}
+        ))
+
+        await client.dispatch(FakeCallbackEvent(client, preview, b'send_to_target', CHAT_ME))
+        sent = [m for (chat_id, _), m in client.messages.items() if chat_id == CHAT_TARGET]
+        assert len(sent) == 1 and sent[0].media is source.media
+        # El original se borra cuando el usuario ya ha decidido
+        assert (SOURCE_CHAT, source.id) not in client.messages
+        assert (CHAT_ME, preview.id) not in client.messages
+
+        # Si el original ya no existe se recurre a la referencia guardada
+        media = await bot.messenger.refresh_media({'chat_id': SOURCE_CHAT, 'message_id': source.id}, expired)
+        assert media.document.id == expired['id']
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Mensaje original conservado usado correctamente")
+
+
+def test_button_download_checks_duplicates():
+    """"Descargar y crear clips" busca casi-duplicados como la descarga automática"""
+    print("🧪 Probando la descarga desde los botones...")
+
+    async def run():
+        client = FakeTelegramClient(seed=4)
+        bot = build_bot(client, simulation_config(temp_dir='temp'))
+        buttons = client._new_message(CHAT_ME, media=_video(100), buttons=[['download_and_create_clips']], out=True)
+        submitted = []
+
+        async def submit(buttons_message, document, reason, **kwargs):
+            submitted.append(kwargs)
+            return object()
+        bot.media_forward_handler.submit_clips_job = submit
+
+        await client.dispatch(FakeCallbackEvent(client, buttons, b'download_and_create_clips', CHAT_ME))
+        assert submitted == [{
+            'check_duplicates': True, 'source': {'chat_id': CHAT_ME, 'message_id': buttons.id}
+        }]
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Descarga desde los botones con búsqueda de duplicados")
+
+
+def test_new_clips_after_eviction():
+    """"Crear nuevos clips" vuelve a descargar el video si la caché ya borró el archivo"""
+    print("🧪 Probando nuevos clips de un archivo ya borrado...")
+
+    async def run():
+        client = FakeTelegramClient(seed=6)
+        bot = build_bot(client, simulation_config(temp_dir='temp'))
+        buttons = client._new_message(CHAT_ME, media=_video(100), buttons=[['create_new_clips']], out=True)
+        document = document_to_dict(buttons.media)
+        source = {'chat_id': CHAT_ME, 'message_id': buttons.id}
+        bot.callback_handler.db_manager.save_message(Message(
+            message_id=buttons.id, chat_id=CHAT_ME, user_id=CHAT_ME, message_type='document',
+            media_info={'document': document, 'source': source, 'file_path': 'evicted/video.mp4'}
+        ))
+        submitted = []
+
+        async def submit(buttons_message, document, reason, **kwargs):
+            submitted.append((buttons_message.id, document, kwargs))
+            return object()
+        bot.media_forward_handler.submit_clips_job = submit
+
+        await client.dispatch(FakeCallbackEvent(client, buttons, b'create_new_clips', CHAT_ME))
+        assert submitted == [(buttons.id, document, {'source': source})]
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Nuevos clips desde la referencia guardada")
+
+
+def test_album_photos_use_variants():
+    """Las fotos de un álbum se analizan con su variante pequeña y el original solo se baja a petición"""
+    print("🧪 Probando variantes de las fotos de un álbum...")
+
+    async def run():
+        client = FakeTelegramClient(seed=8)
+        bot = build_bot(client, simulation_config(temp_dir='temp', duplicate_detection_enabled=True))
+        thumbs = []
+        download_media = client.download_media
+
+        async def download(media, file=None, progress_callback=None, thumb=None, **kwargs):
+            thumbs.append(thumb)
+            return await download_media(media, file=file, progress_callback=progress_callback, thumb=thumb, **kwargs)
+        client.download_media = download
+
+        album = [client._new_message(SOURCE_CHAT, media=_photo(), sender_id=42, grouped_id=9) for _ in range(2)]
+        await bot.media_forward_handler._process_album(album)
+        assert len(thumbs) == 2 and None not in thumbs, thumbs
+
+        buttons = next(m for m in client.messages.values() if m.out and m.text.startswith("📚 Álbum"))
+        await client.dispatch(FakeCallbackEvent(client, buttons, b'album_download_originals', CHAT_ME))
+        assert thumbs[2:] == [None, None], thumbs
+        stored = bot.callback_handler.db_manager.get_message(buttons.id, CHAT_ME)
+        assert len(stored.media_info['file_paths']) == 2
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Fotos del álbum analizadas con su variante")
+
+
+def test_album_long_video_is_own_job():
+    """Un video largo de un álbum se procesa en su propio trabajo sin retrasar el álbum"""
+    print("🧪 Probando videos largos dentro de un álbum...")
+
+    async def run():
+        client = FakeTelegramClient(seed=9)
+        bot = build_bot(client, simulation_config(temp_dir='temp', max_file_size_mb=10))
+        handler = bot.media_forward_handler
+        release, processed = asyncio.Event(), []
+
+        async def process_video(message):
+            await release.wait()
+            processed.append(message.id)
+        handler._process_video = process_video
+
+        video = client._new_message(SOURCE_CHAT, media=_video(100), sender_id=42, grouped_id=11)
+        photos = [client._new_message(SOURCE_CHAT, media=_photo(), sender_id=42, grouped_id=11) for _ in range(2)]
+        await handler._process_album([video] + photos)
+
+        # El álbum ya se entregó y el video sigue como trabajo registrado
+        assert any(m.out and m.text.startswith("📚 Álbum") for m in client.messages.values())
+        assert processed == [] and handler.jobs.active == 1
+        release.set()
+        assert await handler.jobs.drain(timeout=1) == 0
+        assert processed == [video.id] and handler.jobs.active == 0
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Video largo del álbum en su propio trabajo")
+
+
+def test_job_refreshes_document():
+    """Cada intento de un trabajo de clips descarga con el documento vigente del mensaje guardado"""
+    print("🧪 Probando la referencia vigente en los trabajos de clips...")
+
+    async def run():
+        client = FakeTelegramClient(seed=5)
+        handler = build_bot(client, simulation_config(temp_dir='temp')).media_forward_handler
+        source = client._new_message(CHAT_ME, media=_video(100), out=True)
+        downloads = []
+
+        async def download(message, file_info, reason):
+            downloads.append(message.media)
+            return None
+        handler._download_with_progress = download
+
+        job = Job(kind='clips', payload={
+            'chat_id': CHAT_ME, 'message_id': source.id, 'document': document_to_dict(_video(100)),
+            'source': {'chat_id': CHAT_ME, 'message_id': source.id}
+        })
+        assert await handler._run_clips_stages(job) is False
+        assert downloads == [source.media]
+
+        # Sin mensaje ni referencia de reserva el intento falla sin descargar
+        await client.delete_messages(CHAT_ME, [source.id])
+        job.payload['document'] = None
+        assert await handler._run_clips_stages(job) is False
+        assert len(downloads) == 1
+
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        asyncio.run(run())
+    print("✅ Trabajos con la referencia vigente")
+
+
+if __name__ == "__main__":
+    test_simulated_load()
+    test_preview_uses_kept_source()
+    test_button_download_checks_duplicates()
+    test_new_clips_after_eviction()
+    test_album_photos_use_variants()
+    test_album_long_video_is_own_job()
+    test_job_refreshes_document()
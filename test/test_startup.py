@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test del presupuesto de tiempo de importación y de la señal de disponibilidad del bot
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+sys.path.append('.')
+
+# Segundos máximos para importar los handlers (lo que hace main.py al arrancar)
+IMPORT_BUDGET_SECONDS = 2.0
+# Módulos pesados que solo deben cargarse bajo demanda
+HEAVY_MODULES = ('numpy', 'transformers', 'torch')
+# Segundos máximos desde que arranca el bot hasta que atiende comandos
+READY_BUDGET_SECONDS = 1.0
+
+
+def test_import_budget():
+    """Importar los handlers es rápido y no arrastra dependencias pesadas"""
+    print("🧪 Probando el tiempo de importación...")
+    script = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import src.handlers\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', script], capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert not result['heavy'], f"Módulos pesados importados al arrancar: {result['heavy']}"
+    assert result['elapsed'] < IMPORT_BUDGET_SECONDS, (
+        f"Importación demasiado lenta: {result['elapsed']:.2f}s"
+    )
+    print(f"✅ Handlers importados en {result['elapsed']:.2f}s")
+
+
+def test_ready_signal():
+    """pequenoBot activa ``ready`` al terminar el arranque y entonces ya responde a /ping"""
+    print("🧪 Probando la señal de disponibilidad...")
+    import main
+    from fake_telegram import CHAT_ME, FakeNewMessageEvent, FakeTelegramClient, working_directory
+    from src.telegram_client import TelegramMessenger
+
+    client = FakeTelegramClient(seed=1)
+    env = {
+        'API_ID': '1', 'API_HASH': '0' * 32, 'BOT_TOKEN': '1:simulado',
+        'CHAT_ME': str(CHAT_ME), 'CHAT_TARGET': str(CHAT_ME + 1), 'METRICS_PORT': '0'
+    }
+    saved_env = {key: os.environ.get(key) for key in env}
+    saved = (main.TelegramClient, main.shutdown_logging, TelegramMessenger._entity_cache)
+
+    async def run():
+        bot = main.pequenoBot()
+        started = time.perf_counter()
+        task = asyncio.create_task(bot.start())
+        await asyncio.wait_for(bot.ready.wait(), timeout=10)
+        elapsed = time.perf_counter() - started
+
+        ping = client._new_message(CHAT_ME, text='/ping', sender_id=42)
+        await client.dispatch(FakeNewMessageEvent(ping))
+        assert any('Pong' in m.text for m in client.messages.values() if m.out)
+
+        bot.request_shutdown()
+        await asyncio.wait_for(task, timeout=10)
+        return elapsed
+
+    os.environ.update(env)
+    # El bot usa el cliente simulado; el logging sigue activo para el resto de tests
+    main.TelegramClient = lambda *args, **kwargs: client
+    main.shutdown_logging = lambda: None
+    TelegramMessenger._entity_cache = None
+    try:
+        with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+            elapsed = asyncio.run(run())
+    finally:
+        main.TelegramClient, main.shutdown_logging, TelegramMessenger._entity_cache = saved
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    assert elapsed < READY_BUDGET_SECONDS, f"Arranque demasiado lento: {elapsed:.2f}s"
+    print(f"✅ Bot listo en {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    test_import_budget()
+    test_ready_signal()
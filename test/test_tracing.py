@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test básico de las trazas por trabajo
+"""
+
+import sys
+import os
+import json
+import asyncio
+import tempfile
+sys.path.append('.')
+
+from src.utils.tracing import add_to_span, configure_tracing, format_breakdown, span, start_trace, traced
+
+
+@traced()
+async def download_media_from_message(size):
+    await asyncio.sleep(0.01)
+    add_to_span('bytes', size)
+    add_to_span('flood_wait_seconds', 3)
+    return size
+
+
+@traced('transcode')
+async def transcode():
+    with span('clip', index=1):
+        await asyncio.sleep(0.01)
+
+
+def test_tracing_spans_and_export():
+    """Los spans se anidan a través de await/gather y se exportan como JSONL"""
+    print("🧪 Probando trazas...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        export_path = os.path.join(temp_dir, 'traces.jsonl')
+        configure_tracing(export_path)
+
+        async def job():
+            with start_trace('long_video', chat_id=1, message_id=2) as trace:
+                await asyncio.gather(download_media_from_message(2 * 1024 * 1024), transcode())
+            return trace
+
+        try:
+            trace = asyncio.run(job())
+        finally:
+            configure_tracing(None)
+
+        names = [item.name for item in trace.spans]
+        assert names == ['long_video', 'download_media_from_message', 'transcode', 'clip']
+        by_name = {item.name: item for item in trace.spans}
+        assert by_name['download_media_from_message'].parent is trace.root
+        assert by_name['clip'].parent is by_name['transcode']
+        assert all(item.duration is not None for item in trace.spans)
+
+        with open(export_path, encoding='utf-8') as f:
+            exported = [json.loads(line) for line in f]
+        assert len(exported) == 4
+        assert {item['trace_id'] for item in exported} == {trace.trace_id}
+        assert exported[1]['attributes']['bytes'] == 2 * 1024 * 1024
+
+        breakdown = format_breakdown(trace)
+        assert "long_video" in breakdown
+        assert "download_media_from_message" in breakdown
+        assert "2.0MB" in breakdown and "FloodWait 3s" in breakdown
+    print("✅ Trazas anidadas y exportadas correctamente")
+
+
+def test_span_without_trace():
+    """Fuera de una traza los spans no registran nada"""
+    print("🧪 Probando spans sin traza activa...")
+    with span('suelto') as item:
+        assert item is None
+    add_to_span('bytes', 10)
+    print("✅ Spans sin traza ignorados")
+
+
+if __name__ == "__main__":
+    test_tracing_spans_and_export()
+    test_span_without_trace()